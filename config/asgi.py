@@ -5,6 +5,32 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+ASGI deployment profile
+-----------------------
+Serve with any ASGI server, e.g.::
+
+    pip install uvicorn
+    uvicorn config.asgi:application --host 0.0.0.0 --port 8000 --workers 4
+
+- The async endpoints under /api/async/ (dashboard, customer/vendor
+  outstanding, stock alerts) run their independent aggregates
+  concurrently on executor threads (core/async_views.py). Every other
+  endpoint is a regular DRF view that Django runs in its thread-sensitive
+  executor, one at a time per worker, so scale those with --workers.
+- ASGI_THREADS sets the size of the executor the concurrent aggregates use
+  (asgiref default: CPU count + 4). Each busy thread holds its own DB
+  connection, so keep it within what the database allows.
+- CONN_MAX_AGE defaults to 0 here (this module sets DJANGO_ASGI before
+  settings load; WSGI keeps 600). Leave it there: executor threads release
+  their connections after every query batch, and persistent connections
+  are not shared across them.
+- Use a shared CACHE_BACKEND with more than one worker so dashboard and
+  token invalidations reach all of them (TOKEN_AUTH_CACHE=local keeps its
+  entries in-process but checks a revocation version in that cache).
+
+``manage.py bench_asgi`` compares sync WSGI and async ASGI throughput under
+concurrent clients in-process.
 """
 
 import os
@@ -12,5 +38,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+os.environ.setdefault('DJANGO_ASGI', '1')
 
 application = get_asgi_application()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -50,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware', # Outermost, so it times the whole stack
     'corsheaders.middleware.CorsMiddleware', # Add this at the top
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -83,13 +85,136 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite production profile, applied by every new connection:
+# - WAL lets readers run alongside the single writer, and synchronous=NORMAL
+#   is safe under WAL (only the last commits can be lost, on power loss);
+# - cache_size (negative = KiB) and mmap_size keep hot pages in memory.
+#   Pages read through the map count toward RSS (up to SQLITE_MMAP_BYTES
+#   of the file) but are file-backed and reclaimable, so watch anonymous
+#   memory (RssAnon) for leaks, or set SQLITE_MMAP_BYTES=0 where an RSS
+#   limit would kill the worker;
+# - `timeout` is the busy timeout: writers wait this many seconds for the
+#   lock instead of failing with "database is locked";
+# - transactions start with BEGIN IMMEDIATE, so a writer queues for the lock
+#   when it begins rather than failing when a read upgrades to a write
+#   (busy_timeout can't resolve that deadlock).
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    f"PRAGMA cache_size=-{config('SQLITE_CACHE_KB', default=20000, cast=int)}",
+    f"PRAGMA mmap_size={config('SQLITE_MMAP_BYTES', default=268435456, cast=int)}",
+    'PRAGMA temp_store=MEMORY',
+]
+SQLITE_BUSY_TIMEOUT = config('SQLITE_BUSY_TIMEOUT', default=20, cast=int)
+# Persistent connections pay off under WSGI, where each worker thread keeps
+# its own. config/asgi.py sets DJANGO_ASGI: there views run on executor
+# threads that don't get Django's request-end cleanup, so default to 0.
+DB_CONN_MAX_AGE = config('CONN_MAX_AGE', default=0 if config('DJANGO_ASGI', default=False, cast=bool) else 600, cast=int)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+            'timeout': SQLITE_BUSY_TIMEOUT,
+            'transaction_mode': 'IMMEDIATE',
+        },
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        # File-backed test DB: the in-memory shared cache fails concurrent
+        # writers with "table is locked" instead of waiting on busy_timeout.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    },
+    # Same file, read-only: dashboard and report reads (core.db_router)
+    'reads': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRAGMAS + ['PRAGMA query_only=ON']),
+            'timeout': SQLITE_BUSY_TIMEOUT,
+        },
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ['core.db_router.ReportReadRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# locmem is per-process; point CACHE_BACKEND at redis/memcached when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='ebilling'),
     }
 }
 
+# Seconds a dashboard snapshot may live even without any write invalidating it
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=300, cast=int)
+
+
+# Token -> user cache for CachingTokenAuthentication:
+# 'local' = per-process LRU, 'shared' = the default Django cache (all workers).
+# Local entries are checked against a revocation version in the default
+# cache, so with a shared CACHE_BACKEND invalidations reach every worker.
+TOKEN_AUTH_CACHE = config('TOKEN_AUTH_CACHE', default='local')
+TOKEN_AUTH_CACHE_SIZE = config('TOKEN_AUTH_CACHE_SIZE', default=10000, cast=int)
+TOKEN_AUTH_CACHE_TTL = config('TOKEN_AUTH_CACHE_TTL', default=300, cast=int)
+
+# Customer / vendor name autocomplete (core/autocomplete.py): parties kept in
+# the per-process index (roughly 0.8 KB each), and seconds before it reloads
+# to pick up other workers' writes
+AUTOCOMPLETE_MAX_PARTIES = config('AUTOCOMPLETE_MAX_PARTIES', default=50000, cast=int)
+AUTOCOMPLETE_REBUILD_SECONDS = config('AUTOCOMPLETE_REBUILD_SECONDS', default=300, cast=int)
+
+# Low-stock SSE stream (/api/stock-alerts/stream/): seconds one connection
+# stays open before the client reconnects, and seconds between event polls
+STOCK_ALERT_STREAM_SECONDS = config('STOCK_ALERT_STREAM_SECONDS', default=300, cast=int)
+STOCK_ALERT_POLL_SECONDS = config('STOCK_ALERT_POLL_SECONDS', default=2, cast=float)
+
+# Invoice PDFs (/api/invoices/{id}/pdf/): cache directory, and render
+# processes per worker (0 renders inline in the request)
+INVOICE_PDF_DIR = config('INVOICE_PDF_DIR', default=str(BASE_DIR / 'media' / 'invoices'))
+INVOICE_PDF_WORKERS = config('INVOICE_PDF_WORKERS', default=2, cast=int)
+
+# Background jobs (core.jobs, manage.py run_workers): seconds a running job
+# may go without reporting progress before another worker takes it over,
+# attempts per job, base retry delay (doubled per attempt), idle poll
+# interval, and where export jobs write their files
+JOB_LEASE_SECONDS = config('JOB_LEASE_SECONDS', default=600, cast=int)
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=3, cast=int)
+JOB_RETRY_BASE_SECONDS = config('JOB_RETRY_BASE_SECONDS', default=30, cast=int)
+JOB_POLL_SECONDS = config('JOB_POLL_SECONDS', default=1, cast=float)
+JOB_FILES_DIR = config('JOB_FILES_DIR', default=str(BASE_DIR / 'media' / 'jobs'))
+
+# Delta sync (/api/sync/): changes are served once they are this many
+# seconds old (longer than any write transaction), and tombstones of
+# deleted rows are kept this many days (manage.py prune_tombstones)
+SYNC_SETTLE_SECONDS = config('SYNC_SETTLE_SECONDS', default=10, cast=int)
+SYNC_TOMBSTONE_DAYS = config('SYNC_TOMBSTONE_DAYS', default=90, cast=int)
+
+# Batch requests (/api/batch/): sub-requests per batch, and seconds a batch
+# may run (an atomic batch holds the SQLite write lock for all of it)
+BATCH_MAX_REQUESTS = config('BATCH_MAX_REQUESTS', default=20, cast=int)
+BATCH_MAX_SECONDS = config('BATCH_MAX_SECONDS', default=5, cast=float)
+
+# Idempotency-Key on writes (core/idempotency.py): hours a stored response is
+# replayed (manage.py sweep_idempotency_keys deletes older ones), seconds a
+# duplicate waits for the first request, and seconds after which the claim
+# of a request that never answered can be taken over
+IDEMPOTENCY_TTL_HOURS = config('IDEMPOTENCY_TTL_HOURS', default=24, cast=int)
+IDEMPOTENCY_WAIT_SECONDS = config('IDEMPOTENCY_WAIT_SECONDS', default=10, cast=float)
+IDEMPOTENCY_LOCK_SECONDS = config('IDEMPOTENCY_LOCK_SECONDS', default=60, cast=int)
+
+# Request metrics (served at /api/metrics/)
+# Requests slower than this are logged on the 'core.metrics' logger with their slowest queries
+METRICS_SLOW_REQUEST_MS = config('METRICS_SLOW_REQUEST_MS', default=500, cast=int)
+METRICS_SLOW_TOP_QUERIES = config('METRICS_SLOW_TOP_QUERIES', default=5, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -134,6 +259,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Allow mobile app to connect
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 # Use Custom User Model
 AUTH_USER_MODEL = 'core.User'
@@ -141,7 +267,7 @@ AUTH_USER_MODEL = 'core.User'
 # DRF Config
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachingTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -149,8 +275,14 @@ REST_FRAMEWORK = {
     ],
     # Tell DRF to use Spectacular for Schema generation
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Keyset pagination on indexed columns for every list endpoint
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.IdCursorPagination',
+    'PAGE_SIZE': config('API_PAGE_SIZE', default=50, cast=int),
 }
 
+# Upper bound for ?page_size= on list endpoints
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=500, cast=int)
+
 # Add the specific configuration for the documentation
 SPECTACULAR_SETTINGS = {
     'TITLE': 'e-Billing Mobile App API',
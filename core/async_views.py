@@ -0,0 +1,105 @@
+# core/async_views.py
+"""
+Async variants of the read-heavy endpoints for ASGI (/api/async/).
+Independent aggregates run through sync_to_async(thread_sensitive=False),
+each on its own thread and connection, so they really run concurrently.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.http import JsonResponse
+from rest_framework import exceptions
+from rest_framework.utils.encoders import JSONEncoder
+
+from .authentication import CachingTokenAuthentication
+from .middleware import recording_queries
+from .models import Customer, Vendor, Product
+from .serializers import ProductSerializer
+from . import dashboard, db_router, ledger
+
+
+# ==========================================
+# Helpers
+# ==========================================
+
+def _in_worker_thread(query):
+    """Run a sync ORM callable on a pool thread, releasing its connection like a request would."""
+    def run():
+        close_old_connections()
+        try:
+            with recording_queries():
+                return query()
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)
+
+async def run_concurrently(*queries):
+    """Run independent sync ORM callables at the same time; results in argument order."""
+    return await asyncio.gather(*(_in_worker_thread(query)() for query in queries))
+
+def _authenticate(request):
+    try:
+        result = CachingTokenAuthentication().authenticate(request)
+    except exceptions.AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+def async_auth_required(view):
+    """Token (or session) authentication for plain async views, mirroring IsAuthenticated."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = None
+        if request.META.get('HTTP_AUTHORIZATION'):
+            user = await sync_to_async(_authenticate)(request)
+        else:
+            session_user = await request.auser()
+            user = session_user if session_user.is_authenticated else None
+        if user is None or not user.is_active:
+            return _json({'detail': 'Authentication credentials were not provided.'}, status=401)
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+# ==========================================
+# Views
+# ==========================================
+
+@async_auth_required
+async def dashboard_view(request):
+    fresh = request.GET.get('fresh') in ('1', 'true')
+    version = await sync_to_async(dashboard.current_version)()
+    snapshot = None if fresh else await cache.aget(dashboard.SNAPSHOT_KEY, version=version)
+    if snapshot is None:
+        with db_router.reporting():
+            snapshot = dashboard.merge_snapshot(await run_concurrently(*dashboard.SNAPSHOT_QUERIES))
+        await sync_to_async(dashboard.store_snapshot)(snapshot, version)
+    return _json(snapshot)
+
+async def _party_outstanding(model, field, name_field, pk):
+    name, total_due = await run_concurrently(
+        lambda: model.objects.filter(pk=pk).values_list(name_field, flat=True).first(),
+        lambda: ledger.party_outstanding(**{f'{field}_id': pk}),
+    )
+    if name is None:
+        return _json({'detail': 'Not found.'}, status=404)
+    return _json({field: name, 'outstanding_amount': total_due})
+
+@async_auth_required
+async def customer_outstanding_view(request, pk):
+    return await _party_outstanding(Customer, 'customer', 'customer_name', pk)
+
+@async_auth_required
+async def vendor_outstanding_view(request, pk):
+    return await _party_outstanding(Vendor, 'vendor', 'vendor_name', pk)
+
+@async_auth_required
+async def stock_alerts_view(request):
+    products = [product async for product in Product.objects.filter(open_alert__isnull=False)]
+    return _json(ProductSerializer(products, many=True).data)
@@ -0,0 +1,146 @@
+# core/authentication.py
+"""
+TokenAuthentication with a token -> user cache: an in-process LRU
+(TOKEN_AUTH_CACHE='local') or Django's cache ('shared'). Local entries are
+checked against a revocation version in Django's cache, which every
+invalidation (core/signals.py) bumps, so revocations reach all workers.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+REVOCATION_KEY = 'authtoken:revoked'
+
+
+def revocation_version():
+    version = cache.get(REVOCATION_KEY)
+    if version is None:
+        # Time based, like the dashboard version, so an evicted key never
+        # comes back at a value older entries are stamped with
+        cache.add(REVOCATION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(REVOCATION_KEY)
+    return version
+
+def revoke_all():
+    try:
+        cache.incr(REVOCATION_KEY)
+    except ValueError:
+        cache.set(REVOCATION_KEY, time.time_ns(), timeout=None)
+
+
+class LocalTokenCache:
+    """Thread-safe LRU of key -> (expires_at, version, user, token)."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def version(self):
+        return revocation_version()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic() or entry[1] != version:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2], entry[3]
+
+    def set(self, key, user, token, version):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, version, user, token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        revoke_all()
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[2].pk == user_id]:
+                del self._entries[key]
+        revoke_all()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedTokenCache:
+    """Token cache in Django's cache framework, keyed by a hash of the token."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+    @staticmethod
+    def _cache_key(key):
+        return 'authtoken:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def version(self):
+        # Invalidations already delete the shared entries themselves
+        return None
+
+    def get(self, key, version):
+        return cache.get(self._cache_key(key))
+
+    def set(self, key, user, token, version):
+        cache.set(self._cache_key(key), (user, token), timeout=self.ttl)
+
+    def delete(self, key):
+        cache.delete(self._cache_key(key))
+
+    def delete_user(self, user_id):
+        # One token per user; look it up rather than keep a reverse index
+        for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+            self.delete(key)
+
+    def clear(self):
+        pass
+
+
+def _build_cache():
+    if settings.TOKEN_AUTH_CACHE == 'shared':
+        return SharedTokenCache(settings.TOKEN_AUTH_CACHE_TTL)
+    return LocalTokenCache(settings.TOKEN_AUTH_CACHE_SIZE, settings.TOKEN_AUTH_CACHE_TTL)
+
+token_cache = _build_cache()
+
+
+def invalidate_token(key):
+    token_cache.delete(key)
+
+def invalidate_user(user_id):
+    token_cache.delete_user(user_id)
+
+
+class CachingTokenAuthentication(TokenAuthentication):
+    """Drop-in TokenAuthentication that skips the Token+User query on warm requests."""
+
+    def authenticate_credentials(self, key):
+        # Read before the query, so a revocation that lands while it runs
+        # leaves this entry stamped with the old version
+        version = token_cache.version()
+        cached = token_cache.get(key, version)
+        if cached is not None:
+            user, token = cached
+            # A private copy, so a view mutating request.user can't leak into the cache
+            return copy.copy(user), token
+
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token, version)
+        return copy.copy(user), token
@@ -0,0 +1,165 @@
+# core/autocomplete.py
+"""
+In-memory prefix index for customer and vendor name autocomplete, kept
+current by signals in this process and rebuilt after
+AUTOCOMPLETE_REBUILD_SECONDS to pick up other workers' writes. Holds at
+most AUTOCOMPLETE_MAX_PARTIES; lookups top up from the database past that.
+"""
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Customer, Vendor
+
+# Longest key stored per name suffix, and most suffixes per name
+KEY_LENGTH = 32
+MAX_WORDS = 4
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# kind -> (model, name field, secondary name field)
+PARTY_FIELDS = {
+    'customer': (Customer, 'customer_name', 'shop_name'),
+    'vendor': (Vendor, 'vendor_name', 'company_name'),
+}
+
+
+def normalize(text):
+    return ' '.join((text or '').casefold().split())[:KEY_LENGTH]
+
+def name_keys(*names):
+    keys = set()
+    for name in names:
+        words = normalize(name).split()
+        for start in range(min(len(words), MAX_WORDS)):
+            keys.add(' '.join(words[start:]))
+    return tuple(keys)
+
+def party_entry(kind, pk, name, secondary, mobile_number, city):
+    return {
+        'type': kind, 'id': pk, 'name': name, 'secondary': secondary,
+        'mobile_number': mobile_number, 'city': city,
+    }
+
+def party_rows(kind, queryset=None):
+    model, name_field, secondary_field = PARTY_FIELDS[kind]
+    queryset = model.objects.all() if queryset is None else queryset
+    return queryset.values_list('id', name_field, secondary_field, 'mobile_number', 'city')
+
+
+class PartyIndex:
+    def __init__(self, max_parties, rebuild_seconds):
+        self.max_parties = max_parties
+        self.rebuild_seconds = rebuild_seconds
+        self._lock = threading.RLock()
+        self._keys = []                 # sorted (key, kind, id)
+        # (kind, id) -> (name, secondary, mobile_number, city, keys), oldest first
+        self._parties = {}
+        self._built_at = None
+        self.complete = False
+
+    # -- maintenance --------------------------------------------------
+
+    def reset(self):
+        with self._lock:
+            self._keys = []
+            self._parties.clear()
+            self._built_at = None
+            self.complete = False
+
+    def build(self):
+        """Load the newest parties (up to max_parties) from the database."""
+        with self._lock:
+            parties = {}
+            keys = []
+            remaining = self.max_parties
+            complete = True
+            for kind in PARTY_FIELDS:
+                rows = list(party_rows(kind).order_by('-id')[:remaining + 1])
+                if len(rows) > remaining:
+                    rows, complete = rows[:remaining], False
+                remaining -= len(rows)
+                for pk, name, secondary, mobile_number, city in reversed(rows):
+                    entry_keys = name_keys(name, secondary)
+                    parties[(kind, pk)] = (name, secondary, mobile_number, city, entry_keys)
+                    keys.extend((key, kind, pk) for key in entry_keys)
+            keys.sort()
+            self._keys, self._parties, self.complete = keys, parties, complete
+            self._built_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._built_at is None or time.monotonic() - self._built_at > self.rebuild_seconds:
+            self.build()
+
+    def _discard(self, ident):
+        item = self._parties.pop(ident, None)
+        if item is None:
+            return
+        for key in item[-1]:
+            position = bisect.bisect_left(self._keys, (key,) + ident)
+            if position < len(self._keys) and self._keys[position] == (key,) + ident:
+                del self._keys[position]
+
+    def update(self, kind, instance):
+        """Index a saved party (no-op until the index has been built)."""
+        _model, name_field, secondary_field = PARTY_FIELDS[kind]
+        with self._lock:
+            if self._built_at is None:
+                return
+            ident = (kind, instance.pk)
+            self._discard(ident)
+            name, secondary = getattr(instance, name_field), getattr(instance, secondary_field)
+            entry_keys = name_keys(name, secondary)
+            self._parties[ident] = (name, secondary, instance.mobile_number, instance.city, entry_keys)
+            for key in entry_keys:
+                bisect.insort(self._keys, (key,) + ident)
+            while len(self._parties) > self.max_parties:
+                self._discard(next(iter(self._parties)))
+                self.complete = False
+
+    def remove(self, kind, pk):
+        with self._lock:
+            self._discard((kind, pk))
+
+    # -- lookup -------------------------------------------------------
+
+    def search(self, prefix, limit=DEFAULT_LIMIT):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            self._ensure_fresh()
+            found = {}
+            position = bisect.bisect_left(self._keys, (prefix,))
+            while position < len(self._keys) and len(found) < limit:
+                key, kind, pk = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                if (kind, pk) not in found:
+                    found[(kind, pk)] = party_entry(kind, pk, *self._parties[(kind, pk)][:4])
+                position += 1
+            complete = self.complete
+
+        results = list(found.values())
+        if not complete and len(results) < limit:
+            results += self._database_matches(prefix, limit - len(results), found)
+        return results
+
+    @staticmethod
+    def _database_matches(prefix, limit, exclude):
+        """Name-start matches for parties evicted from the index."""
+        results = []
+        for kind, (model, name_field, secondary_field) in PARTY_FIELDS.items():
+            queryset = model.objects.filter(
+                Q(**{f'{name_field}__istartswith': prefix}) | Q(**{f'{secondary_field}__istartswith': prefix})
+            ).exclude(pk__in=[pk for k, pk in exclude if k == kind])
+            results += [party_entry(kind, *row) for row in party_rows(kind, queryset)[:limit - len(results)]]
+            if len(results) >= limit:
+                break
+        return results
+
+
+party_index = PartyIndex(settings.AUTOCOMPLETE_MAX_PARTIES, settings.AUTOCOMPLETE_REBUILD_SECONDS)
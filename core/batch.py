@@ -0,0 +1,122 @@
+# core/batch.py
+"""
+Several API calls in one round trip (POST /api/batch/). Sub-requests go
+straight to their views as the caller, with the batch's transport details
+but none of its other headers, within BATCH_MAX_REQUESTS / BATCH_MAX_SECONDS.
+`atomic` runs them in one transaction, rolled back on the first failure.
+"""
+import copy
+import io
+import json
+import logging
+import time
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import transaction
+from django.http import QueryDict
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+BATCH_PATH = '/api/batch/'
+# Response headers passed back per sub-request
+RESULT_HEADERS = ('Location', 'ETag', 'Last-Modified', 'Retry-After')
+# Request headers a sub-request can't set: auth is the caller's, bodies are JSON
+RESERVED_HEADERS = {'accept', 'authorization', 'content-length', 'content-type', 'cookie', 'host'}
+# Headers of the batch request sub-requests inherit: where it came from, not
+# what it asked for (so no Idempotency-Key, If-None-Match, ...)
+TRANSPORT_HEADERS = {
+    'HTTP_HOST', 'HTTP_X_FORWARDED_FOR', 'HTTP_X_FORWARDED_HOST', 'HTTP_X_FORWARDED_PORT', 'HTTP_X_FORWARDED_PROTO',
+}
+
+
+def _result(status, body, headers=None):
+    return {'status': status, 'headers': headers or {}, 'body': body}
+
+def _error(status, message):
+    return _result(status, {'error': message})
+
+def sub_request(request, method, path, body=None, headers=None):
+    """A copy of the batch's HttpRequest for one sub-request, authenticated as the caller."""
+    parts = urlsplit(path)
+    content = json.dumps(body).encode() if body is not None else b''
+    sub = copy.copy(request._request)
+    # Drop what the batch request itself parsed or cached
+    for name in ('_post', '_files', '_body', 'resolver_match'):
+        sub.__dict__.pop(name, None)
+    sub.method = method
+    sub.path = sub.path_info = parts.path
+    # CGI/server keys (REMOTE_ADDR, SERVER_*, wsgi.*) and transport headers
+    # only; the sub-request's own `headers` are added below
+    sub.META = {
+        **{key: value for key, value in request._request.META.items()
+           if not key.startswith('HTTP_') or key in TRANSPORT_HEADERS},
+        'REQUEST_METHOD': method, 'PATH_INFO': parts.path, 'QUERY_STRING': parts.query,
+        'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(content)),
+        'HTTP_ACCEPT': 'application/json',
+    }
+    for name, value in (headers or {}).items():
+        if name.lower() not in RESERVED_HEADERS:
+            sub.META['HTTP_' + name.upper().replace('-', '_')] = value
+    sub.content_type, sub.content_params = 'application/json', {}
+    sub.GET = QueryDict(parts.query)
+    sub._stream = io.BytesIO(content)
+    sub._read_started = False
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+def _run_one(request, item):
+    path = urlsplit(item['path']).path
+    if path == BATCH_PATH:
+        return _error(400, 'Batches cannot be nested.')
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return _error(404, 'Not found.')
+    if iscoroutinefunction(match.func):
+        return _error(400, 'Async endpoints cannot be batched; use their /api/ equivalents.')
+    sub = sub_request(request, item['method'], item['path'], item.get('body'), item.get('headers'))
+    sub.resolver_match = match
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+        if response.streaming:
+            # Not close(): that sends request_finished, which may close the DB connection mid-batch
+            return _error(400, 'Streaming endpoints (exports, PDFs, event streams) cannot be batched.')
+        if hasattr(response, 'render'):
+            response.render()
+    except Exception:
+        logger.exception("Batched %s %s failed", item['method'], item['path'])
+        return _error(500, 'Internal server error.')
+    body = response.content.decode(response.charset)
+    if body and response.get('Content-Type', '').startswith('application/json'):
+        body = json.loads(body)
+    return _result(response.status_code, body or None,
+                   {name: response[name] for name in RESULT_HEADERS if response.has_header(name)})
+
+def run(request, requests, atomic=False):
+    """Run the sub-requests in order; returns their results, plus `committed` when atomic."""
+    deadline = time.monotonic() + settings.BATCH_MAX_SECONDS
+    results = []
+    if not atomic:
+        for item in requests:
+            if time.monotonic() > deadline:
+                results.append(_error(504, 'Batch time limit reached; not run.'))
+            else:
+                results.append(_run_one(request, item))
+        return {'responses': results}
+
+    with transaction.atomic():
+        for item in requests:
+            if results and results[-1]['status'] >= 400:
+                results.append(_error(424, 'Not run: an earlier request in the atomic batch failed.'))
+            elif time.monotonic() > deadline:
+                results.append(_error(504, 'Batch time limit reached; rolled back.'))
+            else:
+                results.append(_run_one(request, item))
+        committed = all(result['status'] < 400 for result in results)
+        if not committed:
+            transaction.set_rollback(True)
+    return {'responses': results, 'committed': committed}
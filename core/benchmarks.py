@@ -0,0 +1,454 @@
+# core/benchmarks.py
+"""
+Route benchmarks driven by route.txt.
+
+Every GET route listed in route.txt is requested through the Django test
+client with a real token, and p50/p95 latency plus the SQL query count
+are recorded. Results can be saved as a JSON baseline and later runs
+compared against it.
+"""
+import asyncio
+import csv
+import gc
+import io
+import math
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import connection
+from django.urls import resolve
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils.crypto import get_random_string
+from rest_framework.authtoken.models import Token
+
+from .models import *
+from .metrics import MetricsRegistry
+from .middleware import MetricsMiddleware, QueryRecorder
+
+ROUTES_FILE = settings.BASE_DIR / 'route.txt'
+# Benchmark users are named bench-<random>, which no real mobile number matches
+BENCHMARK_USER_PREFIX = 'bench-'
+
+# Which model supplies the sample id for a "{id}" placeholder in a route
+ID_SOURCES = {
+    'vendors': Vendor,
+    'customers': Customer,
+    'employees': Employee,
+    'products': Product,
+    'income': Income,
+    'expenses': Expense,
+    'invoices': Invoice,
+    'bank-accounts': BankAccount,
+}
+
+
+# Query parameter a route requires: (name, model, field), filled with the
+# first word of that field on the smallest-id row
+QUERY_SOURCES = {
+    '/api/products/search/': ('q', Product, 'product_name'),
+    '/api/parties/autocomplete/': ('q', Customer, 'customer_name'),
+    '/api/parties/lookup/': ('mobile_number', Customer, 'mobile_number'),
+}
+
+
+def load_routes(path=ROUTES_FILE):
+    """GET endpoints from route.txt as (feature, path) pairs, in file order."""
+    with open(path, newline='') as routes:
+        for row in csv.DictReader(routes):
+            method, endpoint = row.get('HTTP Method') or '', (row.get('Endpoint') or '').strip()
+            if 'GET' not in method or not endpoint.startswith('/') or '<' in endpoint:
+                continue
+            yield row['Feature'], endpoint
+
+def resolve_placeholders(endpoint):
+    """
+    Fill "{id}" with the smallest id of the matching model and add the
+    parameters of QUERY_SOURCES, or None if there is no row to take them from.
+    """
+    if '{id}' in endpoint:
+        parts = endpoint.strip('/').split('/')
+        resource = parts[parts.index('{id}') - 1]
+        model = ID_SOURCES.get(resource)
+        pk = model.objects.order_by('pk').values_list('pk', flat=True).first() if model else None
+        if pk is None:
+            return None
+        endpoint = endpoint.replace('{id}', str(pk))
+    if endpoint in QUERY_SOURCES:
+        name, model, field = QUERY_SOURCES[endpoint]
+        value = model.objects.order_by('pk').values_list(field, flat=True).first()
+        if not value:
+            return None
+        endpoint += '?' + urlencode({name: value.split()[0]})
+    return endpoint
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an unsorted list."""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+@contextmanager
+def benchmark_token():
+    """
+    Authorization header of a throwaway staff user (staff, so /api/metrics/
+    is measured too), deleted with its token when the benchmark is done.
+    """
+    user = User.objects.create_user(BENCHMARK_USER_PREFIX + get_random_string(9), get_random_string(32), is_staff=True)
+    token = Token.objects.create(user=user)
+    try:
+        yield f'Token {token.key}'
+    finally:
+        user.delete()
+
+def _request(client, path):
+    response = client.get(path)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response.status_code
+
+def run(iterations=50, warmup=3, match=None, exclude=None, routes=None):
+    """Benchmark the selected routes; returns {path: {feature, status, p50_ms, p95_ms, queries}}."""
+    # Event streams end after their first poll instead of holding each request for minutes
+    with benchmark_token() as token_header, override_settings(STOCK_ALERT_STREAM_SECONDS=0):
+        return _run(Client(HTTP_AUTHORIZATION=token_header), iterations, warmup, match, exclude, routes)
+
+def _run(client, iterations, warmup, match, exclude, routes):
+    results = {}
+    for feature, endpoint in routes if routes is not None else load_routes():
+        if (match and not re.search(match, endpoint)) or (exclude and re.search(exclude, endpoint)):
+            continue
+        path = resolve_placeholders(endpoint)
+        if path is None:
+            continue
+
+        for _ in range(warmup):
+            _request(client, path)
+        # Query count from a separate run, so capturing doesn't skew timings
+        with CaptureQueriesContext(connection) as queries:
+            status = _request(client, path)
+        # Read now: the next request_started resets the connection's query log
+        query_count = len(queries)
+
+        # Like timeit: keep collector pauses out of the measured requests
+        timings = []
+        gc.collect()
+        gc.disable()
+        try:
+            for _ in range(iterations):
+                started = time.perf_counter()
+                _request(client, path)
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            gc.enable()
+
+        results[endpoint] = {
+            'feature': feature,
+            'status': status,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'queries': query_count,
+        }
+    return results
+
+def compare(results, baseline, threshold=0.25, min_delta_ms=1.0):
+    """
+    Regressions of `results` against `baseline`: p95 slower by more than
+    `threshold` (fraction, and at least `min_delta_ms` to ignore timer
+    noise on sub-millisecond routes) or any increase in query count.
+    """
+    regressions = []
+    for endpoint, current in results.items():
+        previous = baseline.get(endpoint)
+        if previous is None:
+            continue
+        limit = max(previous['p95_ms'] * (1 + threshold), previous['p95_ms'] + min_delta_ms)
+        if current['p95_ms'] > limit:
+            regressions.append(f"{endpoint}: p95 {current['p95_ms']}ms > {previous['p95_ms']}ms baseline")
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{endpoint}: {current['queries']} queries > {previous['queries']} baseline")
+    return regressions
+
+
+# ==========================================
+# Metrics middleware overhead
+# ==========================================
+
+METRICS_MIDDLEWARE = 'core.middleware.MetricsMiddleware'
+
+def _median_request_ms(client, path, iterations):
+    for _ in range(10):
+        _request(client, path)
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            _request(client, path)
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        gc.enable()
+    return percentile(timings, 50)
+
+def metrics_overhead(path='/api/dashboard/', iterations=2000, rounds=5):
+    """
+    Median latency of `path` with and without MetricsMiddleware (best of
+    `rounds`, alternating), plus the isolated cost of one middleware pass,
+    one registry.observe() and one wrapped query.
+    """
+    without = [name for name in settings.MIDDLEWARE if name != METRICS_MIDDLEWARE]
+    with_metrics = [METRICS_MIDDLEWARE] + without
+
+    best = {'with': float('inf'), 'without': float('inf')}
+    with benchmark_token() as token_header:
+        for _ in range(rounds):
+            for label, middleware in (('without', without), ('with', with_metrics)):
+                # The client builds its handler (and middleware chain) on first use
+                with override_settings(MIDDLEWARE=middleware):
+                    client = Client(HTTP_AUTHORIZATION=token_header)
+                    best[label] = min(best[label], _median_request_ms(client, path, iterations))
+
+    registry = MetricsRegistry()
+    started = time.perf_counter()
+    for n in range(100_000):
+        registry.observe('bench-route', 'GET', 0.003, 2, 0.001)
+    observe_us = (time.perf_counter() - started) * 10
+
+    # One full middleware pass around a no-op view: the fixed per-request cost
+    request = RequestFactory().get(path)
+    request.resolver_match = resolve(path)
+    response = HttpResponse()
+    middleware = MetricsMiddleware(lambda request: response)
+    started = time.perf_counter()
+    for n in range(20_000):
+        middleware(request)
+    middleware_us = (time.perf_counter() - started) * 50
+
+    recorder = QueryRecorder(keep=5)
+    execute = lambda sql, params, many, context: None
+    started = time.perf_counter()
+    for n in range(100_000):
+        recorder(execute, 'SELECT 1', (), False, None)
+    query_us = (time.perf_counter() - started) * 10
+
+    return {
+        'path': path,
+        'median_ms_without': round(best['without'], 4),
+        'median_ms_with': round(best['with'], 4),
+        'overhead_us_per_request': round((best['with'] - best['without']) * 1000, 1),
+        'middleware_us': round(middleware_us, 3),
+        'observe_us': round(observe_us, 3),
+        'wrapped_query_us': round(query_us, 3),
+    }
+
+
+# ==========================================
+# WSGI (sync) vs ASGI (async) throughput
+# ==========================================
+
+def _split(path):
+    path, _, query = path.partition('?')
+    return path, query
+
+def wsgi_throughput(path, clients, requests_per_client, token_header):
+    """Requests/second of `path` through config.wsgi with one thread per concurrent client."""
+    from config.wsgi import application
+
+    path_info, query = _split(path)
+    timings = []
+    lock = threading.Lock()
+
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    def client():
+        local = []
+        for _ in range(requests_per_client):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path_info, 'QUERY_STRING': query,
+                'SCRIPT_NAME': '', 'SERVER_NAME': 'testserver', 'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': 'testserver',
+                'HTTP_AUTHORIZATION': token_header,
+                'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+                'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            started = time.perf_counter()
+            body = application(environ, start_response)
+            try:
+                for _chunk in body:
+                    pass
+            finally:
+                body.close()
+            local.append(time.perf_counter() - started)
+        with lock:
+            timings.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(timings) / (time.perf_counter() - started), timings
+
+def asgi_throughput(path, clients, requests_per_client, token_header):
+    """Requests/second of `path` through config.asgi with one coroutine per concurrent client."""
+    from config.asgi import application
+
+    path_info, query = _split(path)
+    timings = []
+
+    async def one_request():
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path_info, 'raw_path': path_info.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'authorization', token_header.encode())],
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        request_sent = False
+        never = asyncio.get_running_loop().create_future()
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # Django listens for a disconnect while the view runs; never send one
+            return await never
+
+        async def send(message):
+            pass
+
+        started = time.perf_counter()
+        await application(scope, receive, send)
+        timings.append(time.perf_counter() - started)
+
+    async def client():
+        for _ in range(requests_per_client):
+            await one_request()
+
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(main())
+    return len(timings) / elapsed, timings
+
+def compare_servers(sync_path, async_path, clients=20, requests_per_client=25):
+    """Throughput and latency of the sync view under WSGI and the async view under ASGI."""
+    results = {}
+    with benchmark_token() as token_header:
+        for label, runner, path in (
+            ('wsgi', wsgi_throughput, sync_path),
+            ('asgi', asgi_throughput, async_path),
+        ):
+            runner(path, 2, 3, token_header)  # warm up
+            throughput, timings = runner(path, clients, requests_per_client, token_header)
+            results[label] = {
+                'path': path,
+                'requests_per_second': round(throughput, 1),
+                'p50_ms': round(percentile(timings, 50) * 1000, 2),
+                'p95_ms': round(percentile(timings, 95) * 1000, 2),
+            }
+    return results
+
+
+# ==========================================
+# SQLite concurrent writers
+# ==========================================
+
+# Connection options of a bare sqlite3 DATABASES entry, for comparison
+PLAIN_SQLITE_OPTIONS = {}
+
+def _writer_process(token_header, product_id, writes, options, results):
+    """One writer: alternate invoice and income POSTs, report (ok, errors, timings)."""
+    from django.db import connections
+
+    connections['default'].settings_dict['OPTIONS'] = options
+    client = Client(HTTP_AUTHORIZATION=token_header)
+    ok, errors, timings = 0, {}, []
+    invoice = {
+        'invoice_type': 'SALE', 'total_amount': '50.00', 'paid_amount': '50.00',
+        'items': [{'product': product_id, 'quantity': 1, 'price': '50.00'}],
+    }
+    income = {'name': 'Counter sale', 'amount': '5.00', 'payment_type': 'Cash'}
+    for index in range(writes):
+        started = time.perf_counter()
+        try:
+            if index % 2:
+                response = client.post('/api/income/', income)
+            else:
+                response = client.post('/api/invoices/', invoice, content_type='application/json')
+            status = response.status_code
+        except Exception as exc:  # the test client re-raises view errors
+            status = type(exc).__name__ + (': database is locked' if 'locked' in str(exc) else '')
+        timings.append(time.perf_counter() - started)
+        if status == 201:
+            ok += 1
+        else:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    connections.close_all()
+    results.put((ok, errors, timings))
+
+def sqlite_write_stress(processes=8, writes_per_process=50, profile='tuned'):
+    """
+    Run `processes` writer processes against the database with either the
+    configured connection profile ('tuned') or a bare sqlite3 one ('plain':
+    rollback journal, deferred transactions, 5 s busy timeout).
+    """
+    import multiprocessing
+    from django.db import connections
+
+    product = Product.objects.order_by('pk').first() or Product.objects.create(
+        product_name='Benchmark item', category_name='Benchmark', purchase_price=1, sell_price=1, quantity=0,
+    )
+    options = dict(settings.DATABASES['default'].get('OPTIONS', {}))
+    if profile == 'plain':
+        options = PLAIN_SQLITE_OPTIONS
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=DELETE')
+
+    results = multiprocessing.Queue()
+    with benchmark_token() as token_header:
+        # The writers open their own connections
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=_writer_process, args=(token_header, product.pk, writes_per_process, options, results))
+            for _ in range(processes)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        outcomes = [results.get() for _ in workers]
+        elapsed = time.perf_counter() - started
+        for worker in workers:
+            worker.join()
+    if profile == 'plain':
+        # journal_mode is stored in the file; put WAL back
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+
+    errors = {}
+    for _ok, worker_errors, _timings in outcomes:
+        for status, count in worker_errors.items():
+            errors[status] = errors.get(status, 0) + count
+    timings = [timing for _ok, _errors, worker_timings in outcomes for timing in worker_timings]
+    return {
+        'profile': profile,
+        'ok': sum(ok for ok, _errors, _timings in outcomes),
+        'errors': errors,
+        'writes_per_second': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentile(timings, 50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 95) * 1000, 2),
+    }
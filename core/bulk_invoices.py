@@ -0,0 +1,100 @@
+# core/bulk_invoices.py
+"""
+Bulk invoice creation for POS clients replaying queued sales
+(POST /api/invoices/bulk_create/). Valid invoices are written in one
+transaction with set-based stock, balance and rollup updates; each gets
+its own result.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from rest_framework import serializers as drf_serializers
+
+from .models import Invoice, InvoiceItem, Product, Customer, Vendor
+from .serializers import BulkInvoiceSerializer
+from . import dashboard, inventory, ledger, rollups
+
+MAX_INVOICES = 500
+
+
+def _unknown_ids(data, products, customers, vendors):
+    errors = {}
+    for field, known in (('customer', customers), ('vendor', vendors)):
+        if data.get(field) and data[field] not in known:
+            errors[field] = [f'Invalid pk "{data[field]}" - object does not exist.']
+    items = [
+        {'product': [f'Invalid pk "{item["product"]}" - object does not exist.']}
+        if item['product'] and item['product'] not in products else {}
+        for item in data['items']
+    ]
+    if any(items):
+        errors['items'] = items
+    return errors
+
+def create_invoices(rows):
+    """
+    Validate and create invoices from InvoiceSerializer-style payloads.
+    Returns {'created', 'failed', 'results'} with one {index, id} or
+    {index, errors} result per payload, in order.
+    """
+    serializer = BulkInvoiceSerializer()
+    results = [None] * len(rows)
+    valid = []
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, serializer.run_validation(row)))
+        except drf_serializers.ValidationError as exc:
+            results[index] = {'index': index, 'errors': exc.detail}
+
+    created = []
+    with transaction.atomic():
+        # Resolved inside the transaction, so nothing referenced can be deleted before the insert
+        products = Product.objects.only('id').in_bulk(
+            {item['product'] for _, data in valid for item in data['items'] if item['product']}
+        )
+        customers = Customer.objects.only('id').in_bulk({data['customer'] for _, data in valid if data.get('customer')})
+        vendors = Vendor.objects.only('id').in_bulk({data['vendor'] for _, data in valid if data.get('vendor')})
+        for index, data in valid:
+            errors = _unknown_ids(data, products, customers, vendors)
+            if errors:
+                results[index] = {'index': index, 'errors': errors}
+                continue
+            items = data.pop('items')
+            invoice = Invoice(customer_id=data.pop('customer', None), vendor_id=data.pop('vendor', None), **data)
+            created.append((index, invoice, items))
+        if not created:
+            return {'created': 0, 'failed': len(rows), 'results': results}
+
+        Invoice.objects.bulk_create([invoice for _, invoice, _ in created])
+        invoice_items = [
+            (invoice, [InvoiceItem(invoice=invoice, product_id=item['product'], quantity=item['quantity'],
+                                   price=item['price']) for item in items])
+            for _, invoice, items in created
+        ]
+        InvoiceItem.objects.bulk_create([item for _, items in invoice_items for item in items])
+        inventory.apply_invoices_stock(invoice_items)
+
+        # Party balances and rollups summed per party and per (type, day)
+        customer_due, vendor_due = defaultdict(Decimal), defaultdict(Decimal)
+        periods = defaultdict(lambda: [Decimal(0), Decimal(0), 0])
+        for _, invoice, _ in created:
+            if invoice.customer_id:
+                customer_due[invoice.customer_id] += invoice.outstanding_amount
+            if invoice.vendor_id:
+                vendor_due[invoice.vendor_id] += invoice.outstanding_amount
+            period = periods[(invoice.invoice_type, invoice.date)]
+            period[0] += invoice.total_amount
+            period[1] += invoice.paid_amount
+            period[2] += 1
+        for customer_id, due in customer_due.items():
+            ledger.adjust_party_balance(customer_id=customer_id, delta=due)
+        for vendor_id, due in vendor_due.items():
+            ledger.adjust_party_balance(vendor_id=vendor_id, delta=due)
+        for (kind, day), (total, paid, count) in periods.items():
+            rollups.adjust(kind, day, total, paid, count)
+        dashboard.invalidate_on_commit()
+
+    for index, invoice, _ in created:
+        results[index] = {'index': index, 'id': invoice.pk}
+    return {'created': len(created), 'failed': len(rows) - len(created), 'results': results}
@@ -0,0 +1,83 @@
+# core/dashboard.py
+"""
+Cached dashboard snapshot.
+
+The snapshot lives in Django's cache under a version key. Writes to any
+model shown on the dashboard bump the version (see core/signals.py), and
+the next read rebuilds the snapshot lazily.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Vendor, Customer, Employee, Invoice, StockAlert
+from . import ledger
+
+SNAPSHOT_KEY = 'dashboard:snapshot'
+VERSION_KEY = 'dashboard:version'
+
+
+def _new_version():
+    # Time based, so a version key lost to eviction never restarts at a
+    # number that an old snapshot is still cached under.
+    return time.time_ns()
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _new_version(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+def invalidate():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _new_version(), timeout=None)
+
+def invalidate_on_commit():
+    # After the commit, so a concurrent read can't cache pre-commit numbers
+    # under the new version. Also for writes post_save never sees (bulk_create).
+    transaction.on_commit(invalidate)
+
+def _cash_totals():
+    cash = ledger.get_cash_balance()
+    return {
+        'total_income': cash.total_income,
+        'total_expense': cash.total_expense,
+        'net_balance': cash.balance,
+    }
+
+# Independent queries behind the dashboard cards; each returns a dict of fields
+SNAPSHOT_QUERIES = (
+    lambda: {'total_vendors': Vendor.objects.count()},
+    lambda: {'total_customers': Customer.objects.count()},
+    lambda: {'total_employees': Employee.objects.count()},
+    _cash_totals,
+    lambda: {'total_invoices': Invoice.objects.count()},
+    # Products where current quantity is less than or equal to the alert level (open alerts)
+    lambda: {'low_stock_products': StockAlert.objects.count()},
+)
+
+def merge_snapshot(parts):
+    snapshot = {}
+    for part in parts:
+        snapshot.update(part)
+    return snapshot
+
+def compute_snapshot():
+    return merge_snapshot(query() for query in SNAPSHOT_QUERIES)
+
+def store_snapshot(snapshot, version):
+    cache.set(SNAPSHOT_KEY, snapshot, timeout=settings.DASHBOARD_CACHE_TIMEOUT, version=version)
+
+def get_snapshot(fresh=False):
+    """Return the dashboard counters, recomputing only when missing or forced."""
+    version = current_version()
+    snapshot = None if fresh else cache.get(SNAPSHOT_KEY, version=version)
+    if snapshot is None:
+        snapshot = compute_snapshot()
+        store_snapshot(snapshot, version)
+    return snapshot
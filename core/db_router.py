@@ -0,0 +1,45 @@
+# core/db_router.py
+"""
+Routes reads inside `with reporting():` (dashboard, reports) to the
+query_only 'reads' connection, except while 'default' is in a transaction.
+Writes always go to 'default'.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_ALIAS = 'reads'
+
+_reporting = contextvars.ContextVar('reporting', default=False)
+
+
+@contextmanager
+def reporting():
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+class ReportReadRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            _reporting.get()
+            and READ_ALIAS in settings.DATABASES
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return READ_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != READ_ALIAS
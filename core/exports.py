@@ -0,0 +1,75 @@
+# core/exports.py
+"""
+Streaming CSV / NDJSON exports.
+
+Rows are pulled with QuerySet.iterator(chunk_size=...) over values_list()
+tuples and written out one at a time, so memory stays flat no matter how
+many rows an export covers.
+"""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+INVOICE_EXPORT_FIELDS = [
+    ('invoice_id', 'id'),
+    ('invoice_type', 'invoice_type'),
+    ('date', 'date'),
+    ('customer_id', 'customer_id'),
+    ('customer_name', 'customer__customer_name'),
+    ('vendor_id', 'vendor_id'),
+    ('vendor_name', 'vendor__vendor_name'),
+    ('total_amount', 'total_amount'),
+    ('paid_amount', 'paid_amount'),
+    # One line per invoice item; invoices without items export a single line with blanks
+    ('item_id', 'items__id'),
+    ('product_id', 'items__product_id'),
+    ('product_name', 'items__product__product_name'),
+    ('quantity', 'items__quantity'),
+    ('price', 'items__price'),
+]
+
+CASH_EXPORT_FIELDS = [
+    (name, name) for name in ('id', 'date', 'name', 'amount', 'previous_balance', 'payment_type', 'transaction_id')
+]
+EXPENSE_EXPORT_FIELDS = CASH_EXPORT_FIELDS + [('employee_id', 'employee_id')]
+
+
+class _Echo:
+    """File-like object whose write() hands the line straight back to the caller."""
+    def write(self, value):
+        return value
+
+
+def _csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+def _ndjson_lines(header, rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(header, row))) + '\n'
+
+def export_lines(queryset, fields, fmt='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """Generator of encoded lines for `fields` ([(column, lookup), ...]) of the queryset."""
+    header = [column for column, _ in fields]
+    rows = queryset.values_list(*[lookup for _, lookup in fields]).iterator(chunk_size=chunk_size)
+    if fmt == 'ndjson':
+        return _ndjson_lines(header, rows)
+    return _csv_lines(header, rows)
+
+def streaming_export(queryset, fields, fmt, filename):
+    response = StreamingHttpResponse(
+        export_lines(queryset, fields, fmt),
+        content_type=EXPORT_FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
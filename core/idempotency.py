@@ -0,0 +1,122 @@
+# core/idempotency.py
+"""
+Idempotency-Key support for retried writes. The first request with a key
+stores its response in the same transaction as its writes; retries get it
+back (Idempotent-Replayed: true), a duplicate still running waits up to
+IDEMPOTENCY_WAIT_SECONDS (then 409), and reusing a key for a different
+request is a 422. Errors and 5xx answers aren't stored.
+"""
+import hashlib
+import json
+import time
+import zlib
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.05
+
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+def _expiry():
+    return timezone.now() + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS)
+
+def _claim(digest, fingerprint):
+    """Insert the key's row; None when claimed, else the row already there (if it still is)."""
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(digest=digest, fingerprint=fingerprint, expires_at=_expiry())
+        return None
+    except IntegrityError:
+        return IdempotencyKey.objects.filter(pk=digest).first() or _claim(digest, fingerprint)
+
+def _store(digest, response):
+    body = None
+    if response.data is not None:
+        body = zlib.compress(json.dumps(response.data, cls=JSONEncoder, separators=(',', ':')).encode())
+    IdempotencyKey.objects.filter(pk=digest).update(
+        response_status=response.status_code, response_body=body,
+        response_location=response.get('Location', ''), expires_at=_expiry(),
+    )
+
+def _replay(row):
+    headers = {'Idempotent-Replayed': 'true'}
+    if row.response_location:
+        headers['Location'] = row.response_location
+    data = json.loads(zlib.decompress(row.response_body)) if row.response_body is not None else None
+    return Response(data, status=row.response_status, headers=headers)
+
+def sweep():
+    """Delete expired keys; returns how many."""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+def _release(digest):
+    IdempotencyKey.objects.filter(pk=digest, response_status__isnull=True).delete()
+
+def run(request, handler):
+    """Answer `request` with handler(), at most once per Idempotency-Key."""
+    key = request.headers.get(HEADER)
+    if key is None:
+        return handler()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return Response({'error': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters.'}, status=400)
+    digest = _digest(request.user.pk, key)
+    fingerprint = _digest(request.method, request.get_full_path(), request.body)
+
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    # On SQLite the claim waits for the write lock, so a duplicate mostly finds the first one done
+    while (row := _claim(digest, fingerprint)) is not None:
+        now = timezone.now()
+        if row.expires_at <= now:
+            IdempotencyKey.objects.filter(pk=digest, expires_at__lte=now).delete()
+        elif row.fingerprint != fingerprint:
+            return Response({'error': f'{HEADER} was already used for a different request.'}, status=422)
+        elif row.response_status is not None:
+            return _replay(row)
+        elif row.locked_at <= now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS):
+            # The first request died without answering; take over its key
+            IdempotencyKey.objects.filter(
+                pk=digest, response_status__isnull=True, locked_at=row.locked_at,
+            ).delete()
+        elif time.monotonic() >= deadline:
+            return Response(
+                {'error': f'A request with this {HEADER} is still in progress; retry later.'},
+                status=409, headers={'Retry-After': '1'},
+            )
+        else:
+            time.sleep(POLL_SECONDS)
+
+    try:
+        with transaction.atomic():
+            response = handler()
+            if response.status_code < 500 and hasattr(response, 'data'):
+                _store(digest, response)
+                return response
+    except BaseException:
+        _release(digest)
+        raise
+    _release(digest)
+    return response
+
+def idempotent(view_method):
+    """Viewset method decorator: retries sent with the same Idempotency-Key get the first response."""
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        return run(request, lambda: view_method(self, request, *args, **kwargs))
+    return wrapper
@@ -0,0 +1,159 @@
+# core/importers.py
+"""
+Bulk import of master data (products, customers, vendors).
+
+Input is CSV (header row) or JSON Lines, parsed as a stream. Rows are
+validated with the regular model serializers and written in chunks with
+bulk_create(update_conflicts=True): rows carrying an existing `id` update
+that record, rows without one are inserted. A chunk ends early at an id it
+already holds, so a repeated id is applied row by row in file order.
+"""
+import codecs
+import csv
+import json
+
+from django.db import transaction
+from rest_framework import serializers as drf_serializers
+
+from .models import Product, Customer, Vendor
+from .serializers import ProductSerializer, CustomerSerializer, VendorSerializer
+from . import dashboard, autocomplete, inventory
+
+IMPORT_TARGETS = {
+    'products': (Product, ProductSerializer),
+    'customers': (Customer, CustomerSerializer),
+    'vendors': (Vendor, VendorSerializer),
+}
+IMPORT_FORMATS = ('csv', 'jsonl')
+DEFAULT_CHUNK_SIZE = 1000
+# Keep the per-row error report bounded; `failed` still counts every bad row
+MAX_REPORTED_ERRORS = 1000
+# Ids must fit the integer primary key
+ID_FIELD = drf_serializers.IntegerField(min_value=1, max_value=2 ** 63 - 1)
+
+
+def parse_rows(stream, fmt):
+    """
+    Yield (row_number, dict) from a binary stream of CSV or JSON Lines.
+    A row that can't be parsed is yielded as (row_number, exception). So is
+    the point where the file stops being readable (not UTF-8, broken CSV),
+    after which nothing more is yielded.
+    """
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    # Row 1 of a CSV file is the header
+    number = 1 if fmt == 'csv' else 0
+    try:
+        if fmt == 'csv':
+            for number, row in enumerate(csv.DictReader(lines), start=2):
+                yield number, {key: value for key, value in row.items() if key and value != ''}
+            return
+
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, exc
+                continue
+            yield number, row if isinstance(row, dict) else ValueError('Each line must be a JSON object.')
+    except (UnicodeDecodeError, csv.Error) as exc:
+        yield number + 1, ValueError(f'Could not read the file from here on: {exc}')
+
+def _row_pk(row):
+    """The row's id, or None for a new record; raises ValidationError for a bad id."""
+    if row.get('id') in (None, ''):
+        return None
+    return ID_FIELD.run_validation(row['id'])
+
+def _chunks(rows, size):
+    """Chunks of at most `size` rows, each ending early before an id it already holds."""
+    chunk, ids = [], set()
+    for number, row in rows:
+        try:
+            pk = _row_pk(row) if isinstance(row, dict) else None
+        except drf_serializers.ValidationError:
+            pk = None  # Reported when the chunk is validated
+        if len(chunk) == size or pk in ids:
+            yield chunk
+            chunk, ids = [], set()
+        chunk.append((number, row))
+        if pk is not None:
+            ids.add(pk)
+    if chunk:
+        yield chunk
+
+def _upsert(model, instances, fields):
+    writable = [name for name in fields if name != 'id']
+    if not writable:
+        return
+    model.objects.bulk_create(
+        instances,
+        update_conflicts=True,
+        unique_fields=['id'],
+        update_fields=writable,
+    )
+
+def import_rows(target, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Validate and upsert parsed rows into `target` ('products', 'customers'
+    or 'vendors'). Returns {'imported', 'failed', 'errors': [{row, errors}]}.
+    """
+    model, serializer_class = IMPORT_TARGETS[target]
+    # One serializer instance validates every row; building a fresh one
+    # per row would deep-copy all its fields each time.
+    serializer = serializer_class()
+    report = {'imported': 0, 'failed': 0, 'errors': []}
+
+    def fail(number, errors):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': number, 'errors': errors})
+
+    for chunk in _chunks(rows, chunk_size):
+        # Rows with the same set of columns are upserted together, so a row
+        # never overwrites a column it didn't provide.
+        groups = {}
+        for number, row in chunk:
+            if isinstance(row, Exception):
+                fail(number, {'non_field_errors': [str(row)]})
+                continue
+            try:
+                pk = _row_pk(row)
+            except drf_serializers.ValidationError as exc:
+                fail(number, {'id': exc.detail})
+                continue
+            try:
+                data = serializer.run_validation(row)
+            except drf_serializers.ValidationError as exc:
+                fail(number, exc.detail)
+                continue
+            fields = tuple(sorted(data)) + (('id',) if pk else ())
+            groups.setdefault(fields, []).append(model(pk=pk, **data))
+
+        with transaction.atomic():
+            for fields, instances in groups.items():
+                if model is Product and 'quantity' in fields:
+                    # Rows with an id update a product: book the change in the stock ledger
+                    old = dict(
+                        Product.objects.filter(pk__in=[i.pk for i in instances if i.pk])
+                        .values_list('id', 'quantity')
+                    )
+                _upsert(model, instances, fields)
+                report['imported'] += len(instances)
+                if model is Product:
+                    if 'quantity' in fields:
+                        inventory.record_movements(
+                            {i.pk: i.quantity for i in instances if i.pk not in old}, 'OPENING', note='Bulk import',
+                        )
+                        inventory.record_movements(
+                            {i.pk: i.quantity - old[i.pk] for i in instances if i.pk in old},
+                            'ADJUSTMENT', note='Bulk import',
+                        )
+                    inventory.sync_stock_alerts(instance.pk for instance in instances)
+
+    if report['imported']:
+        dashboard.invalidate_on_commit()
+        if target in ('customers', 'vendors'):
+            transaction.on_commit(autocomplete.party_index.reset)
+    return report
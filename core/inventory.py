@@ -0,0 +1,243 @@
+# core/inventory.py
+"""
+Set-based stock updates, the stock movement ledger and low-stock alerts.
+Every quantity change is one UPDATE for all products touched plus one
+StockMovement each, and sync_stock_alerts() records threshold crossings
+for just those products in the same transaction.
+"""
+from collections import defaultdict
+
+from datetime import timedelta
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, IntegerField, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Product, StockAlert, StockAlertEvent, StockMovement, StockSnapshot
+from . import dashboard
+
+# Snapshots only cover movements at least this old, so that transactions
+# still in flight when a snapshot runs have committed their movements.
+SNAPSHOT_SETTLE_SECONDS = 60
+
+
+def invoice_stock_deltas(invoice_type, items):
+    """Signed quantity change per product id; sales remove stock, purchases add it."""
+    sign = -1 if invoice_type == 'SALE' else 1
+    deltas = defaultdict(int)
+    for item in items:
+        if item.product_id:
+            deltas[item.product_id] += sign * item.quantity
+    return deltas
+
+def invoice_item_deltas(invoice):
+    """Stock deltas of an invoice as currently stored."""
+    return invoice_stock_deltas(invoice.invoice_type, invoice.items.only('product_id', 'quantity'))
+
+def _update_quantities(deltas):
+    Product.objects.filter(pk__in=deltas).update(quantity=F('quantity') + Case(
+        *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+
+def apply_stock_deltas(deltas, reason, invoice=None, note=''):
+    """Apply {product_id: delta} in a single UPDATE statement and record the movements."""
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    _update_quantities(deltas)
+    record_movements(deltas, reason, invoice, note)
+    sync_stock_alerts(deltas)
+
+def apply_invoices_stock(invoice_items):
+    """
+    Stock of many new invoices, [(invoice, items)]: one UPDATE with the
+    deltas summed per product, and one movement per invoice and product.
+    """
+    totals = defaultdict(int)
+    movements = []
+    for invoice, items in invoice_items:
+        for pk, delta in invoice_stock_deltas(invoice.invoice_type, items).items():
+            if delta:
+                totals[pk] += delta
+                movements.append(StockMovement(product_id=pk, quantity=delta, reason=invoice.invoice_type, invoice=invoice))
+    changed = {pk: delta for pk, delta in totals.items() if delta}
+    if changed:
+        _update_quantities(changed)
+    StockMovement.objects.bulk_create(movements)
+    sync_stock_alerts(changed)
+
+def reverse_invoice_stock(invoice):
+    """Put back the stock of an invoice that is about to be deleted."""
+    deltas = {pk: -delta for pk, delta in invoice_item_deltas(invoice).items()}
+    apply_stock_deltas(deltas, 'INVOICE_DELETE', note=f'Invoice #{invoice.pk}')
+
+def move_invoice_stock(old_deltas, invoice):
+    """Apply the difference between an edited invoice's old and current stock deltas."""
+    deltas = invoice_item_deltas(invoice)
+    for pk, delta in old_deltas.items():
+        deltas[pk] -= delta
+    apply_stock_deltas(deltas, 'INVOICE_EDIT', invoice=invoice)
+
+
+# ==========================================
+# Stock ledger
+# ==========================================
+
+def record_movements(deltas, reason, invoice=None, note=''):
+    """Append one movement per non-zero {product_id: delta} (the quantity itself is already changed)."""
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=pk, quantity=delta, reason=reason, invoice=invoice, note=note)
+        for pk, delta in deltas.items() if delta
+    ])
+
+def record_opening_stock(chunk_size=2000):
+    """OPENING movements for products that have no movement yet (e.g. after bulk inserts)."""
+    rows = (
+        Product.objects.exclude(quantity=0)
+        .exclude(Exists(StockMovement.objects.filter(product=OuterRef('pk'))))
+        .order_by('id').values_list('id', 'quantity')
+    )
+    created = 0
+    # Each batch drops out of `rows` once it has a movement
+    while chunk := dict(rows[:chunk_size]):
+        record_movements(chunk, 'OPENING')
+        created += len(chunk)
+    return created
+
+def stock_at(product_id, at):
+    """
+    Quantity of a product at datetime `at`: the latest snapshot taken by
+    then plus the movements after it, i.e. two indexed reads.
+    """
+    snapshot = (
+        StockSnapshot.objects.filter(product_id=product_id, taken_at__lte=at)
+        .order_by('-taken_at', '-id').values('quantity', 'last_movement_id', 'taken_at').first()
+    ) or {'quantity': 0, 'last_movement_id': 0, 'taken_at': None}
+    moved = StockMovement.objects.filter(
+        product_id=product_id, id__gt=snapshot['last_movement_id'], created_at__lte=at,
+    ).aggregate(quantity=Sum('quantity'), movements=Count('id'))
+    return {
+        'quantity': snapshot['quantity'] + (moved['quantity'] or 0),
+        'snapshot_at': snapshot['taken_at'],
+        'movements_after_snapshot': moved['movements'],
+    }
+
+def take_snapshots(chunk_size=2000):
+    """
+    Snapshot every product that moved since the previous run (one batch per
+    run, all sharing last_movement_id). Returns the number of snapshots written.
+    """
+    with transaction.atomic():
+        taken_at = timezone.now() - timedelta(seconds=SNAPSHOT_SETTLE_SECONDS)
+        previous = StockSnapshot.objects.aggregate(last=Max('last_movement_id'))['last'] or 0
+        last = StockMovement.objects.filter(id__gt=previous, created_at__lte=taken_at).aggregate(
+            last=Max('id'),
+        )['last']
+        if last is None:
+            return 0
+
+        moved = (
+            StockMovement.objects.filter(id__gt=previous, id__lte=last)
+            .values('product_id').annotate(delta=Sum('quantity')).order_by('product_id')
+            .values_list('product_id', 'delta')
+        )
+        latest = StockSnapshot.objects.filter(product=OuterRef('pk')).order_by('-taken_at', '-id')
+        written = 0
+        rows = moved.iterator(chunk_size=chunk_size)
+        while chunk := dict(islice(rows, chunk_size)):
+            base = dict(
+                Product.objects.filter(pk__in=chunk)
+                .annotate(base=Coalesce(Subquery(latest.values('quantity')[:1]), 0))
+                .values_list('id', 'base')
+            )
+            StockSnapshot.objects.bulk_create([
+                StockSnapshot(product_id=pk, quantity=base[pk] + delta, last_movement_id=last, taken_at=taken_at)
+                for pk, delta in chunk.items() if pk in base
+            ])
+            written += len(chunk)
+        return written
+
+def ledger_drift(chunk_size=2000):
+    """
+    Yield (product_id, quantity, ledger_quantity) for every product whose
+    quantity disagrees with its latest snapshot plus later movements,
+    reading the products in id-ordered chunks.
+    """
+    latest = StockSnapshot.objects.filter(product=OuterRef('pk')).order_by('-taken_at', '-id')
+    after_snapshot = (
+        StockMovement.objects.filter(product=OuterRef('pk'), id__gt=OuterRef('snapshot_last'))
+        .values('product').annotate(total=Sum('quantity')).values('total')
+    )
+    last_id = 0
+    while True:
+        rows = list(
+            Product.objects.filter(pk__gt=last_id).order_by('pk')
+            .annotate(
+                snapshot_quantity=Coalesce(Subquery(latest.values('quantity')[:1]), 0),
+                snapshot_last=Coalesce(Subquery(latest.values('last_movement_id')[:1]), 0),
+            )
+            .annotate(moved=Coalesce(Subquery(after_snapshot), 0))
+            .values_list('pk', 'quantity', 'snapshot_quantity', 'moved')[:chunk_size]
+        )
+        if not rows:
+            return
+        for pk, quantity, snapshot_quantity, moved in rows:
+            if quantity != snapshot_quantity + moved:
+                yield pk, quantity, snapshot_quantity + moved
+        last_id = rows[-1][0]
+
+
+# ==========================================
+# Low-stock alerts
+# ==========================================
+
+def _record_crossings(rows):
+    """Open or clear alerts for (id, name, quantity, stock_alert, is_open) rows that crossed."""
+    opened, cleared, events = [], [], []
+    for pk, name, quantity, stock_alert, is_open in rows:
+        is_low = quantity <= stock_alert
+        if is_low == is_open:
+            continue
+        (opened if is_low else cleared).append(pk)
+        events.append(StockAlertEvent(
+            event_type='LOW' if is_low else 'CLEARED', product_id=pk, product_name=name,
+            quantity=quantity, stock_alert=stock_alert,
+        ))
+    if opened:
+        StockAlert.objects.bulk_create([StockAlert(product_id=pk) for pk in opened])
+    if cleared:
+        StockAlert.objects.filter(product_id__in=cleared).delete()
+    if events:
+        StockAlertEvent.objects.bulk_create(events)
+        # The dashboard's low-stock count reads StockAlert
+        dashboard.invalidate_on_commit()
+    return len(opened), len(cleared)
+
+def _alert_rows(queryset):
+    return queryset.annotate(
+        is_open=Exists(StockAlert.objects.filter(product_id=OuterRef('pk'))),
+    ).values_list('id', 'product_name', 'quantity', 'stock_alert', 'is_open')
+
+def sync_stock_alerts(product_ids):
+    """Record threshold crossings for the given products (one read; writes only on a crossing)."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return 0, 0
+    return _record_crossings(_alert_rows(Product.objects.filter(pk__in=product_ids)))
+
+def clear_stock_alert(product):
+    """Close the alert of a product that is about to be deleted."""
+    deleted, _ = StockAlert.objects.filter(product_id=product.pk).delete()
+    if deleted:
+        StockAlertEvent.objects.create(
+            event_type='CLEARED', product_id=product.pk, product_name=product.product_name,
+            quantity=product.quantity, stock_alert=product.stock_alert,
+        )
+
+def reconcile_stock_alerts():
+    """Full scan: fix any alert missed by writes that bypassed sync_stock_alerts()."""
+    return _record_crossings(_alert_rows(Product.objects.order_by('id')).iterator(chunk_size=2000))
@@ -0,0 +1,179 @@
+# core/invoice_pdf.py
+"""
+Invoice PDFs cached on disk at INVOICE_PDF_DIR/<id // 1000>/<id>/<hash>.pdf,
+keyed by a hash of everything printed on them. Misses render in a pool of
+INVOICE_PDF_WORKERS processes (0 = inline) while the request answers 202.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db.models import Prefetch
+from rest_framework.renderers import BaseRenderer
+
+from .models import Invoice, InvoiceItem
+from . import pdf
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout changes so cached documents are re-rendered
+RENDER_VERSION = 1
+
+_lock = threading.Lock()
+_pool = None
+_pending = {}  # path -> Future of a render queued by this process
+
+
+class PDFRenderer(BaseRenderer):
+    """Lets DRF accept `Accept: application/pdf`; JSON bodies (202, errors) go out as JSON."""
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode()
+
+
+# ==========================================
+# Document content
+# ==========================================
+
+def _money(value):
+    return f'{value:,.2f}'
+
+def document_data(invoice):
+    """Everything printed on the invoice, as a plain dict (reads invoice.items.all(), prefetch it)."""
+    items = [
+        [item.product.product_name if item.product else 'Deleted product',
+         item.quantity, _money(item.price), _money(item.price * item.quantity)]
+        for item in invoice.items.all()
+    ]
+    if invoice.customer:
+        party = invoice.customer
+        label, lines = 'Bill to', [party.customer_name, party.shop_name]
+    elif invoice.vendor:
+        party = invoice.vendor
+        label, lines = 'Supplier', [party.vendor_name, party.company_name]
+    else:
+        party, label, lines = None, '', []
+    if party:
+        lines += [party.city, f'Mobile: {party.mobile_number}']
+    return {
+        'id': invoice.pk,
+        'title': 'Sale Invoice' if invoice.invoice_type == 'SALE' else 'Purchase Invoice',
+        'date': invoice.date.isoformat(),
+        'party_label': label,
+        'party': [line for line in lines if line],
+        'items': items,
+        'totals': [
+            ('Total', _money(invoice.total_amount)),
+            ('Paid', _money(invoice.paid_amount)),
+            ('Outstanding', _money(invoice.outstanding_amount)),
+        ],
+    }
+
+def document_invoices():
+    """Invoices with everything document_data() reads, in a fixed number of queries."""
+    return Invoice.objects.select_related('customer', 'vendor').prefetch_related(
+        Prefetch('items', queryset=InvoiceItem.objects.select_related('product').order_by('id'))
+    )
+
+def content_hash(data):
+    payload = json.dumps([RENDER_VERSION, data], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+def document_dir(invoice_id):
+    return os.path.join(settings.INVOICE_PDF_DIR, str(invoice_id // 1000), str(invoice_id))
+
+def document_path(invoice_id, digest):
+    return os.path.join(document_dir(invoice_id), f'{digest}.pdf')
+
+
+# ==========================================
+# Cache & render pool
+# ==========================================
+
+def _executor():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.INVOICE_PDF_WORKERS)
+    return _pool
+
+def _finished(path, future):
+    with _lock:
+        _pending.pop(path, None)
+    if future.exception() is not None:
+        logger.error("Rendering %s failed", path, exc_info=future.exception())
+
+def _submit(data, path):
+    global _pool
+    with _lock:
+        if path in _pending:
+            return _pending[path]
+        try:
+            future = _executor().submit(pdf.write_invoice, data, path)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool
+            _pool = None
+            future = _executor().submit(pdf.write_invoice, data, path)
+        _pending[path] = future
+    future.add_done_callback(lambda done: _finished(path, done))
+    return future
+
+def open_document(invoice):
+    """
+    The cached PDF of `invoice` as an open binary file, or None after
+    queueing its render. `invoice` should come from document_invoices().
+    """
+    data = document_data(invoice)
+    path = document_path(invoice.pk, content_hash(data))
+    try:
+        return open(path, 'rb')
+    except FileNotFoundError:
+        pass
+    if not settings.INVOICE_PDF_WORKERS:
+        return open(pdf.write_invoice(data, path), 'rb')
+    _submit(data, path)
+    return None
+
+def pending_render(invoice):
+    """The Future of a render of `invoice` queued by this process, if any."""
+    with _lock:
+        return _pending.get(document_path(invoice.pk, content_hash(document_data(invoice))))
+
+def discard(invoice_id):
+    """Remove every cached version of an invoice's document."""
+    shutil.rmtree(document_dir(invoice_id), ignore_errors=True)
+
+def prerender(invoices, workers=None, chunk_size=500):
+    """
+    Render the uncached documents of `invoices` (a document_invoices()
+    queryset), `chunk_size` invoices per read, waiting for each chunk.
+    Yields (cached, rendered) counts per chunk.
+    """
+    workers = settings.INVOICE_PDF_WORKERS if workers is None else workers
+    executor = ProcessPoolExecutor(max_workers=workers) if workers else None
+    try:
+        last_id = 0
+        while chunk := list(invoices.filter(pk__gt=last_id).order_by('pk')[:chunk_size]):
+            last_id = chunk[-1].pk
+            missing = []
+            for invoice in chunk:
+                data = document_data(invoice)
+                path = document_path(invoice.pk, content_hash(data))
+                if not os.path.exists(path):
+                    missing.append((data, path))
+            if executor and missing:
+                list(executor.map(pdf.write_invoice, *zip(*missing), chunksize=32))
+            else:
+                for data, path in missing:
+                    pdf.write_invoice(data, path)
+            yield len(chunk) - len(missing), len(missing)
+    finally:
+        if executor:
+            executor.shutdown()
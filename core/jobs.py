@@ -0,0 +1,233 @@
+# core/jobs.py
+"""
+Database-backed background jobs, run by `manage.py run_workers`.
+
+Workers claim a QUEUED job with one compare-and-set UPDATE and hold a lease
+(JOB_LEASE_SECONDS, renewed by set_progress) that another worker takes over
+if it expires. Failures retry with exponential backoff until max_attempts.
+Job types are the HANDLERS below.
+"""
+import logging
+import os
+import signal
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job, Invoice, Income, Expense
+from .serializers import JOB_PAYLOAD_SERIALIZERS
+from . import exports, inventory, invoice_pdf, ledger, rollups
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY_SECONDS = 3600
+# Due jobs tried per claim before giving up to the other workers
+CLAIM_CANDIDATES = 5
+
+
+def enqueue(kind, payload=None, created_by=None, max_attempts=None, run_after=None):
+    """Queue a job. `payload` must already be valid for the job type."""
+    return Job.objects.create(
+        kind=kind, payload=payload or {}, created_by=created_by,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_after=run_after or timezone.now(),
+    )
+
+def cancel(job):
+    """Cancel a job that hasn't started yet. Returns False when it already has."""
+    return bool(Job.objects.filter(pk=job.pk, status='QUEUED').update(
+        status='CANCELLED', finished_at=timezone.now(),
+    ))
+
+def set_progress(job, done, total, message=''):
+    """
+    Record progress (and renew the lease) from inside a running job. Best
+    effort: on SQLite another process's open read can hold the write off,
+    and the job shouldn't fail over a progress update.
+    """
+    percent = min(99, int(done * 100 / total)) if total else 0
+    try:
+        Job.objects.filter(pk=job.pk, status='RUNNING', worker=job.worker).update(
+            progress=percent, progress_message=message[:200], locked_at=timezone.now(),
+        )
+    except OperationalError:
+        logger.debug("Progress of job #%s not recorded: database busy", job.pk)
+
+
+# ==========================================
+# Claiming & running
+# ==========================================
+
+def _claimable(now):
+    lease_expired = now - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    return Q(status='QUEUED', run_after__lte=now) | Q(status='RUNNING', locked_at__lt=lease_expired)
+
+def claim(worker):
+    """Claim the next due job for `worker`, or return None when there is none."""
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(_claimable(now)).order_by('run_after', 'id')
+        .values_list('pk', flat=True)[:CLAIM_CANDIDATES]
+    )
+    for pk in candidates:
+        # Only one worker's UPDATE can still match the claimable condition
+        claimed = Job.objects.filter(_claimable(now), pk=pk).update(
+            status='RUNNING', worker=worker, locked_at=now, started_at=now, attempts=F('attempts') + 1,
+        )
+        if not claimed:
+            continue
+        job = Job.objects.get(pk=pk)
+        if job.attempts > job.max_attempts:
+            # Reclaimed after its last attempt lost its worker
+            _finish(job, status='FAILED', error=job.error or 'Worker stopped while running the job.')
+            continue
+        return job
+    return None
+
+def _finish(job, **fields):
+    # Matches nothing if the lease expired and another worker took the job
+    return Job.objects.filter(pk=job.pk, status='RUNNING', worker=job.worker).update(
+        locked_at=None, **fields,
+    )
+
+def retry_delay(attempts):
+    return min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS)
+
+def run(job):
+    """Run a claimed job and record its outcome."""
+    try:
+        params = JOB_PAYLOAD_SERIALIZERS[job.kind](data=job.payload)
+        params.is_valid(raise_exception=True)
+        result = HANDLERS[job.kind](job, **params.validated_data)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job #%s (%s) attempt %s failed", job.pk, job.kind, job.attempts, exc_info=True)
+        if job.attempts < job.max_attempts:
+            _finish(job, status='QUEUED', error=error,
+                    run_after=timezone.now() + timedelta(seconds=retry_delay(job.attempts)))
+        else:
+            _finish(job, status='FAILED', error=error, finished_at=timezone.now())
+        return False
+    _finish(job, status='SUCCEEDED', result=result, progress=100, finished_at=timezone.now())
+    return True
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def work(burst=False, poll_seconds=None, max_jobs=None):
+    """
+    Claim and run jobs until SIGTERM / SIGINT (finishing the current job
+    first), until no job is due when `burst`, or after `max_jobs` jobs.
+    Returns the number of jobs run.
+    """
+    poll_seconds = settings.JOB_POLL_SECONDS if poll_seconds is None else poll_seconds
+    worker = worker_name()
+    stopping = []
+    handlers = {sig: signal.signal(sig, lambda *_: stopping.append(True)) for sig in (signal.SIGTERM, signal.SIGINT)}
+    done = 0
+    try:
+        while not stopping and (max_jobs is None or done < max_jobs):
+            close_old_connections()
+            try:
+                job = claim(worker)
+            except OperationalError:
+                # SQLite busy with another writer; try again on the next poll
+                job = None
+            if job is None:
+                if burst:
+                    break
+                time.sleep(poll_seconds)
+                continue
+            try:
+                run(job)
+            except DatabaseError:
+                # The outcome couldn't be recorded; the job is retried once its lease expires
+                logger.exception("Job #%s: recording the outcome failed", job.pk)
+            done += 1
+    finally:
+        for sig, handler in handlers.items():
+            signal.signal(sig, handler)
+    return done
+
+
+# ==========================================
+# Job types
+# ==========================================
+
+def export_job(job, dataset, fmt, date_from=None, date_to=None):
+    """Write an export to JOB_FILES_DIR; GET /api/jobs/{id}/download/ serves it."""
+    queryset, fields = {
+        'invoices': (Invoice.objects.order_by('id', 'items__id'), exports.INVOICE_EXPORT_FIELDS),
+        'income': (Income.objects.order_by('id'), exports.CASH_EXPORT_FIELDS),
+        'expenses': (Expense.objects.order_by('id'), exports.EXPENSE_EXPORT_FIELDS),
+    }[dataset]
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+
+    # Over the exported columns, so invoices count once per item like the lines do
+    total = queryset.values_list(*[lookup for _, lookup in fields]).count()
+    filename = f'{dataset}-{job.pk}.{fmt}'
+    os.makedirs(settings.JOB_FILES_DIR, exist_ok=True)
+    path = os.path.join(settings.JOB_FILES_DIR, filename)
+    lines = exports.export_lines(queryset, fields, fmt)
+    rows = 0
+    with open(path, 'w', encoding='utf-8', newline='') as handle:
+        if fmt == 'csv':
+            handle.write(next(lines))  # header
+        for line in lines:
+            handle.write(line)
+            rows += 1
+            if rows % exports.EXPORT_CHUNK_SIZE == 0:
+                set_progress(job, rows, total, f'{rows} of {total} rows')
+    return {'file': filename, 'rows': rows}
+
+def rebuild_rollups_job(job, date_from=None, date_to=None):
+    if date_from is None or date_to is None:
+        bounds = rollups.data_range()
+        if bounds is None:
+            return {'months': 0}
+        date_from, date_to = date_from or bounds[0], date_to or bounds[1]
+    total = (date_to.year - date_from.year) * 12 + date_to.month - date_from.month + 1
+    months = 0
+    for first_month, last_month in rollups.rebuild(date_from, date_to):
+        months += 1
+        set_progress(job, months, total, f'Rebuilt {last_month:%Y-%m}')
+    return {'date_from': date_from.isoformat(), 'date_to': date_to.isoformat(), 'months': months}
+
+def rebuild_balances_job(job):
+    with transaction.atomic():
+        ledger.lock_cash_balance()
+        ledger.rebuild_cash_balance()
+        ledger.rebuild_party_balances()
+    return {'rebuilt': True}
+
+def reconcile_stock_alerts_job(job):
+    opened, cleared = inventory.reconcile_stock_alerts()
+    return {'opened': opened, 'cleared': cleared}
+
+def prerender_invoice_pdfs_job(job, date_from, date_to):
+    invoices = invoice_pdf.document_invoices().filter(date__range=(date_from, date_to))
+    total = invoices.count()
+    cached = rendered = 0
+    for chunk_cached, chunk_rendered in invoice_pdf.prerender(invoices):
+        cached += chunk_cached
+        rendered += chunk_rendered
+        set_progress(job, cached + rendered, total)
+    return {'rendered': rendered, 'cached': cached}
+
+
+HANDLERS = {
+    'export': export_job,
+    'rebuild_rollups': rebuild_rollups_job,
+    'rebuild_balances': rebuild_balances_job,
+    'reconcile_stock_alerts': reconcile_stock_alerts_job,
+    'prerender_invoice_pdfs': prerender_invoice_pdfs_job,
+}
@@ -0,0 +1,117 @@
+# core/ledger.py
+"""
+Running balances kept in step with the rows they summarise.
+
+Every helper that changes a balance must be called inside the same
+transaction.atomic() block as the write it accounts for.
+"""
+from decimal import Decimal
+
+from django.db.models import F, Sum, DecimalField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import CashBalance, Income, Expense, Invoice, Customer, Vendor
+
+CASH_BALANCE_ID = 1
+
+
+# ==========================================
+# Cash balance (Income - Expense)
+# ==========================================
+
+def get_cash_balance():
+    """Read-only access to the cash ledger row (created on first use)."""
+    balance, _ = CashBalance.objects.get_or_create(pk=CASH_BALANCE_ID)
+    return balance
+
+def lock_cash_balance():
+    """
+    Lock the cash ledger row for the rest of the current transaction.
+    Concurrent writers queue up here, so the balance they read is the
+    balance their own row will be recorded against.
+    """
+    balance, _ = CashBalance.objects.select_for_update().get_or_create(pk=CASH_BALANCE_ID)
+    return balance
+
+def adjust_cash_balance(income=0, expense=0):
+    """Apply signed deltas to the running totals."""
+    if not income and not expense:
+        return
+    CashBalance.objects.filter(pk=CASH_BALANCE_ID).update(
+        total_income=F('total_income') + Decimal(income),
+        total_expense=F('total_expense') + Decimal(expense),
+    )
+
+def compute_cash_totals():
+    """Full-table aggregates; only used to rebuild or verify the ledger."""
+    total_income = Income.objects.aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+    total_expense = Expense.objects.aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+    return total_income, total_expense
+
+def rebuild_cash_balance():
+    balance = lock_cash_balance()
+    balance.total_income, balance.total_expense = compute_cash_totals()
+    balance.save()
+    return balance
+
+
+# ==========================================
+# Party balances (Customer/Vendor outstanding)
+# ==========================================
+
+def party_outstanding(**invoice_filter):
+    """Outstanding (total - paid) over the matching invoices, summed in SQL."""
+    total = Invoice.objects.filter(**invoice_filter).aggregate(
+        due=Sum(F('total_amount') - F('paid_amount'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    )['due']
+    return total or Decimal('0')
+
+def adjust_party_balance(customer_id=None, vendor_id=None, delta=0):
+    """Apply a signed outstanding delta to the invoice's customer and/or vendor."""
+    if not delta:
+        return
+    if customer_id:
+        Customer.objects.filter(pk=customer_id).update(outstanding_balance=F('outstanding_balance') + Decimal(delta))
+    if vendor_id:
+        Vendor.objects.filter(pk=vendor_id).update(outstanding_balance=F('outstanding_balance') + Decimal(delta))
+
+def record_invoice(invoice, sign=1):
+    """Add (sign=1) or remove (sign=-1) an invoice's outstanding from its parties."""
+    adjust_party_balance(invoice.customer_id, invoice.vendor_id, sign * invoice.outstanding_amount)
+
+def move_invoice(old, new):
+    """Re-book an edited invoice; `old` is a values() dict captured before the edit."""
+    old_due = old['total_amount'] - old['paid_amount']
+    if old['customer_id'] == new.customer_id and old['vendor_id'] == new.vendor_id:
+        adjust_party_balance(new.customer_id, new.vendor_id, new.outstanding_amount - old_due)
+    else:
+        adjust_party_balance(old['customer_id'], old['vendor_id'], -old_due)
+        record_invoice(new)
+
+def _party_outstanding_subquery(field):
+    due = (
+        Invoice.objects.filter(**{field: OuterRef('pk')})
+        .values(field)
+        .annotate(due=Sum(F('total_amount') - F('paid_amount')))
+        .values('due')
+    )
+    return Coalesce(
+        Subquery(due), Value(Decimal('0')),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+def party_balance_drift(model):
+    """Yield (pk, stored, actual) for every party whose stored balance is wrong."""
+    field = 'customer' if model is Customer else 'vendor'
+    rows = (
+        model.objects.annotate(actual=_party_outstanding_subquery(field))
+        .values_list('pk', 'outstanding_balance', 'actual')
+    )
+    for pk, stored, actual in rows.iterator(chunk_size=2000):
+        if stored != actual:
+            yield pk, stored, actual
+
+def rebuild_party_balances():
+    """Recompute every party balance in one UPDATE per model."""
+    Customer.objects.update(outstanding_balance=_party_outstanding_subquery('customer'))
+    Vendor.objects.update(outstanding_balance=_party_outstanding_subquery('vendor'))
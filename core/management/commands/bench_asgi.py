@@ -0,0 +1,25 @@
+# core/management/commands/bench_asgi.py
+from django.core.management.base import BaseCommand
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Compare sync WSGI and async ASGI throughput of the dashboard under concurrent clients."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync-path', default='/api/dashboard/?fresh=1')
+        parser.add_argument('--async-path', default='/api/async/dashboard/?fresh=1')
+        parser.add_argument('--clients', type=int, default=20, help="Concurrent clients.")
+        parser.add_argument('--requests', type=int, default=25, help="Requests per client.")
+
+    def handle(self, *args, **options):
+        results = benchmarks.compare_servers(
+            options['sync_path'], options['async_path'],
+            clients=options['clients'], requests_per_client=options['requests'],
+        )
+        for label, row in results.items():
+            self.stdout.write(
+                f"{label.upper()}  {row['requests_per_second']:>8} req/s  "
+                f"p50 {row['p50_ms']} ms  p95 {row['p95_ms']} ms  {row['path']}"
+            )
@@ -0,0 +1,26 @@
+# core/management/commands/bench_sqlite_writers.py
+from django.core.management.base import BaseCommand
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress the database with concurrent writer processes (invoices and income) and report "
+        "throughput, latency and errors for the plain and the tuned SQLite profile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8, help="Concurrent writer processes.")
+        parser.add_argument('--writes', type=int, default=50, help="Writes per process.")
+        parser.add_argument('--profile', choices=['plain', 'tuned', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        profiles = ['plain', 'tuned'] if options['profile'] == 'both' else [options['profile']]
+        for profile in profiles:
+            row = benchmarks.sqlite_write_stress(options['processes'], options['writes'], profile)
+            errors = ', '.join(f'{status} x{count}' for status, count in row['errors'].items()) or 'none'
+            self.stdout.write(
+                f"{profile.upper():<6} {row['ok']:>5} ok  {row['writes_per_second']:>8} writes/s  "
+                f"p50 {row['p50_ms']} ms  p95 {row['p95_ms']} ms  errors: {errors}"
+            )
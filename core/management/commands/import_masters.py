@@ -0,0 +1,47 @@
+# core/management/commands/import_masters.py
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import importers
+
+
+class Command(BaseCommand):
+    help = "Bulk upsert products, customers or vendors from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=sorted(importers.IMPORT_TARGETS))
+        parser.add_argument('path', help="CSV (with header row) or JSON Lines file.")
+        parser.add_argument(
+            '--format', choices=importers.IMPORT_FORMATS,
+            help="Input format (default: guessed from the file extension).",
+        )
+        parser.add_argument('--chunk-size', type=int, default=importers.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--errors', help="Write the per-row error report to this JSON file.")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or ('jsonl' if options['path'].endswith(('.jsonl', '.ndjson')) else 'csv')
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be a positive integer.")
+
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as stream:
+                report = importers.import_rows(
+                    options['target'], importers.parse_rows(stream, fmt), chunk_size=options['chunk_size'],
+                )
+        except OSError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        if options['errors']:
+            with open(options['errors'], 'w') as out:
+                json.dump(report['errors'], out, indent=2, default=str)
+        else:
+            for error in report['errors']:
+                self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'], default=str)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['imported']} {options['target']} in {elapsed:.1f}s; {report['failed']} rows failed."
+        ))
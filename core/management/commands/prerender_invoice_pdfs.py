@@ -0,0 +1,44 @@
+# core/management/commands/prerender_invoice_pdfs.py
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core import invoice_pdf
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the PDFs of every invoice dated in a range into the on-disk cache, "
+        "skipping documents that are already cached."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', required=True, help="YYYY-MM-DD.")
+        parser.add_argument('--date-to', required=True, help="YYYY-MM-DD.")
+        parser.add_argument('--workers', type=int, help="Render processes (default: INVOICE_PDF_WORKERS).")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Invoices read per query.")
+
+    @staticmethod
+    def parse(value, option):
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"{option} must be YYYY-MM-DD.")
+        return day
+
+    def handle(self, *args, **options):
+        date_from = self.parse(options['date_from'], '--date-from')
+        date_to = self.parse(options['date_to'], '--date-to')
+        if date_from > date_to:
+            raise CommandError("--date-from must not be after --date-to.")
+
+        invoices = invoice_pdf.document_invoices().filter(date__range=(date_from, date_to))
+        cached = rendered = 0
+        for chunk_cached, chunk_rendered in invoice_pdf.prerender(
+            invoices, workers=options['workers'], chunk_size=options['chunk_size'],
+        ):
+            cached += chunk_cached
+            rendered += chunk_rendered
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  {cached + rendered} invoices done")
+        self.stdout.write(self.style.SUCCESS(
+            f"Invoice PDFs for {date_from} .. {date_to}: {rendered} rendered, {cached} already cached."
+        ))
@@ -0,0 +1,15 @@
+# core/management/commands/prune_tombstones.py
+from django.core.management.base import BaseCommand
+
+from core import sync
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete tombstones of rows deleted more than SYNC_TOMBSTONE_DAYS ago. "
+        "Sync cursors older than that are refused, so those clients start over."
+    )
+
+    def handle(self, *args, **options):
+        deleted = sync.prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"Tombstones deleted: {deleted}."))
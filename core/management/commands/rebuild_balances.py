@@ -0,0 +1,45 @@
+# core/management/commands/rebuild_balances.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import ledger
+from core.models import Customer, Vendor
+
+
+class Command(BaseCommand):
+    help = "Rebuild the running balance ledgers from full-table aggregates (or just verify them with --check)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only compare the ledgers against the aggregates; exit non-zero on drift.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            cash = ledger.lock_cash_balance()
+            total_income, total_expense = ledger.compute_cash_totals()
+            drift = (cash.total_income != total_income or cash.total_expense != total_expense)
+
+            if drift:
+                self.stdout.write(
+                    f"Cash ledger drift: income {cash.total_income} != {total_income} "
+                    f"or expense {cash.total_expense} != {total_expense}"
+                )
+
+            for model in (Customer, Vendor):
+                for pk, stored, actual in ledger.party_balance_drift(model):
+                    drift = True
+                    self.stdout.write(f"{model.__name__} #{pk} outstanding drift: {stored} != {actual}")
+
+            if options['check']:
+                if drift:
+                    raise CommandError("Balance ledgers do not match the aggregates.")
+                self.stdout.write(self.style.SUCCESS("Balance ledgers OK."))
+                return
+
+            ledger.rebuild_cash_balance()
+            ledger.rebuild_party_balances()
+        self.stdout.write(self.style.SUCCESS(
+            f"Balance ledgers rebuilt: income {total_income}, expense {total_expense}, party balances recomputed."
+        ))
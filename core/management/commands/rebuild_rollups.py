@@ -0,0 +1,47 @@
+# core/management/commands/rebuild_rollups.py
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the day/month rollups from the invoice, income and expense tables, "
+        "a few whole months per transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', help="YYYY-MM-DD (default: earliest data).")
+        parser.add_argument('--date-to', help="YYYY-MM-DD (default: latest data).")
+        parser.add_argument('--chunk-months', type=int, default=1, help="Months rebuilt per transaction.")
+
+    @staticmethod
+    def parse(value, option):
+        if value is None:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"{option} must be YYYY-MM-DD.")
+        return day
+
+    def handle(self, *args, **options):
+        if options['chunk_months'] < 1:
+            raise CommandError("--chunk-months must be at least 1.")
+        date_from = self.parse(options['date_from'], '--date-from')
+        date_to = self.parse(options['date_to'], '--date-to')
+        if date_from is None or date_to is None:
+            bounds = rollups.data_range()
+            if bounds is None:
+                self.stdout.write("No invoices, income or expenses; nothing to rebuild.")
+                return
+            date_from, date_to = date_from or bounds[0], date_to or bounds[1]
+
+        chunks = 0
+        for first_month, last_month in rollups.rebuild(date_from, date_to, options['chunk_months']):
+            chunks += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  rebuilt {first_month:%Y-%m} .. {last_month:%Y-%m}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Rollups rebuilt for {date_from} .. {date_to} in {chunks} chunk(s)."
+        ))
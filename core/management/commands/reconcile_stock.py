@@ -0,0 +1,34 @@
+# core/management/commands/reconcile_stock.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import inventory
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify Product.quantity against the stock ledger (latest snapshot plus later movements), "
+        "reading products in chunks. --fix books each difference as a RECONCILE movement."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Products read per query.")
+        parser.add_argument(
+            '--fix', action='store_true',
+            help="Record RECONCILE movements so the ledger matches Product.quantity.",
+        )
+
+    def handle(self, *args, **options):
+        drift = {}
+        for pk, quantity, ledger_quantity in inventory.ledger_drift(chunk_size=options['chunk_size']):
+            drift[pk] = quantity - ledger_quantity
+            self.stdout.write(f"Product #{pk}: quantity {quantity} != ledger {ledger_quantity}")
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Stock ledger OK."))
+            return
+        if not options['fix']:
+            raise CommandError(f"{len(drift)} product(s) disagree with the stock ledger.")
+        with transaction.atomic():
+            inventory.record_movements(drift, 'RECONCILE')
+        self.stdout.write(self.style.SUCCESS(f"Recorded {len(drift)} reconcile movement(s)."))
@@ -0,0 +1,17 @@
+# core/management/commands/reconcile_stock_alerts.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import inventory
+
+
+class Command(BaseCommand):
+    help = (
+        "Scan every product and open or clear the low-stock alerts that writes bypassing "
+        "the stock update path missed. Meant to run periodically (e.g. from cron)."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            opened, cleared = inventory.reconcile_stock_alerts()
+        self.stdout.write(self.style.SUCCESS(f"Stock alerts reconciled: {opened} opened, {cleared} cleared."))
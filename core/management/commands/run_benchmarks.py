@@ -0,0 +1,70 @@
+# core/management/commands/run_benchmarks.py
+import json
+import os
+import platform
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmarks
+from core.models import Invoice, Product
+
+
+class Command(BaseCommand):
+    help = "Benchmark the GET routes in route.txt (p50/p95 latency, query count) and compare with a JSON baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--match', help="Only routes whose path matches this regex.")
+        parser.add_argument('--exclude', default='/export/', help="Skip routes matching this regex (default: exports).")
+        parser.add_argument('--baseline', default='benchmarks/baseline.json', help="Baseline JSON file.")
+        parser.add_argument('--save', action='store_true', help="Write this run as the new baseline.")
+        parser.add_argument('--threshold', type=float, default=0.25, help="Allowed p95 slowdown as a fraction.")
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=1.0,
+            help="Ignore p95 slowdowns smaller than this many ms (timer noise on fast routes).",
+        )
+
+    def handle(self, *args, **options):
+        results = benchmarks.run(
+            iterations=options['iterations'], warmup=options['warmup'],
+            match=options['match'], exclude=options['exclude'] or None,
+        )
+        for endpoint, row in results.items():
+            self.stdout.write(
+                f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} ms  {row['queries']:>3} q  "
+                f"{row['status']}  {endpoint}"
+            )
+
+        if options['save']:
+            report = {
+                'meta': {
+                    'created': datetime.now(timezone.utc).isoformat(),
+                    'python': platform.python_version(),
+                    'products': Product.objects.count(),
+                    'invoices': Invoice.objects.count(),
+                },
+                'routes': results,
+            }
+            os.makedirs(os.path.dirname(options['baseline']) or '.', exist_ok=True)
+            with open(options['baseline'], 'w') as out:
+                json.dump(report, out, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}."))
+            return
+
+        try:
+            with open(options['baseline']) as stored:
+                baseline = json.load(stored)['routes']
+        except FileNotFoundError:
+            self.stdout.write(f"No baseline at {options['baseline']}; run with --save to create one.")
+            return
+
+        regressions = benchmarks.compare(
+            results, baseline, threshold=options['threshold'], min_delta_ms=options['min_delta_ms'],
+        )
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmark regression(s) beyond the threshold.")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,55 @@
+# core/management/commands/run_workers.py
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import jobs
+
+
+def _worker_main(burst, poll_seconds):
+    jobs.work(burst=burst, poll_seconds=poll_seconds)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background job workers (core.jobs). Each worker is a process that claims due jobs "
+        "from the database; SIGTERM / Ctrl-C lets running jobs finish before exiting."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help="Worker processes.")
+        parser.add_argument('--poll', type=float, help="Seconds between polls when idle (default: JOB_POLL_SECONDS).")
+        parser.add_argument('--burst', action='store_true', help="Exit once no job is due (e.g. from cron).")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1.")
+        if options['workers'] == 1:
+            done = jobs.work(burst=options['burst'], poll_seconds=options['poll'])
+            self.stdout.write(self.style.SUCCESS(f"Worker stopped after {done} job(s)."))
+            return
+
+        # Children must open their own database connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_worker_main, args=(options['burst'], options['poll']), daemon=False)
+            for _ in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+
+        def stop(*_):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()  # SIGTERM: finish the current job, then exit
+
+        previous = {sig: signal.signal(sig, stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            for process in processes:
+                process.join()
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+        self.stdout.write(self.style.SUCCESS(f"{len(processes)} workers stopped."))
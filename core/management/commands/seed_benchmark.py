@@ -0,0 +1,201 @@
+# core/management/commands/seed_benchmark.py
+import random
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import ledger, dashboard, inventory, rollups
+from core.models import *
+
+CATEGORIES = ['Grocery', 'Dairy', 'Snacks', 'Beverages', 'Personal Care', 'Household', 'Stationery', 'Spices']
+CITIES = ['Pune', 'Mumbai', 'Nashik', 'Nagpur', 'Surat', 'Indore', 'Jaipur', 'Bhopal']
+PAYMENT_TYPES = ['Cash', 'Online', 'UPI', 'Cheque']
+
+# Default volumes; --scale multiplies all of them
+VOLUMES = {
+    'products': 50_000,
+    'customers': 20_000,
+    'vendors': 2_000,
+    'employees': 50,
+    'invoices': 1_000_000,
+    'income': 500_000,
+    'expenses': 500_000,
+}
+
+
+@contextmanager
+def explicit_dates(*models):
+    """
+    Let bulk_create write the generated `date` values: the dated models use
+    auto_now_add, which would otherwise stamp every seeded row with today.
+    """
+    fields = [model._meta.get_field('date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = "Seed a deterministic, realistic data volume for benchmarking (run on an empty database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--scale', type=float, default=1.0, help="Multiply every default volume, e.g. 0.01.")
+        for name, default in VOLUMES.items():
+            parser.add_argument(f'--{name}', type=int, help=f"Row count (default {default} x scale).")
+        parser.add_argument('--items-per-invoice', type=int, default=3, help="Average items per invoice.")
+        parser.add_argument(
+            '--start', type=date.fromisoformat, default=date(2022, 1, 1),
+            help="First seeded date (YYYY-MM-DD, default 2022-01-01); fixed so every run seeds the same data.",
+        )
+        parser.add_argument('--days', type=int, default=3 * 365, help="History length the dates are spread over.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--force', action='store_true', help="Seed even if the database already has data.")
+
+    def handle(self, *args, **options):
+        if not options['force'] and (Product.objects.exists() or Invoice.objects.exists()):
+            raise CommandError("Database is not empty; use --force to add benchmark data anyway.")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.start = options['start']
+        self.days = options['days']
+        counts = {
+            name: options[name] if options[name] is not None else max(1, int(default * options['scale']))
+            for name, default in VOLUMES.items()
+        }
+
+        product_ids = self.seed_masters(Product, counts['products'], self.make_product)
+        customer_ids = self.seed_masters(Customer, counts['customers'], self.make_customer)
+        vendor_ids = self.seed_masters(Vendor, counts['vendors'], self.make_vendor)
+        employee_ids = self.seed_masters(Employee, counts['employees'], self.make_employee)
+
+        with explicit_dates(Invoice, Income, Expense):
+            self.seed_invoices(counts['invoices'], options['items_per_invoice'], product_ids, customer_ids, vendor_ids)
+            self.seed_cash(Income, counts['income'])
+            self.seed_cash(Expense, counts['expenses'], employee_ids)
+
+        # bulk_create bypasses every incremental ledger, so rebuild them all
+        with transaction.atomic():
+            ledger.rebuild_cash_balance()
+            ledger.rebuild_party_balances()
+            inventory.reconcile_stock_alerts()
+            inventory.record_opening_stock()
+        bounds = rollups.data_range()
+        if bounds:
+            for _chunk in rollups.rebuild(*bounds, chunk_months=12):
+                pass
+        dashboard.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            "Seeded " + ", ".join(f"{count} {name}" for name, count in counts.items()) + "."
+        ))
+
+    # --- helpers -------------------------------------------------------
+
+    def date_at(self, position, total):
+        # Ascending with position, so id order matches date order like real data
+        return self.start + timedelta(days=self.days * position // max(total, 1))
+
+    def money(self, low, high):
+        return Decimal(self.rng.randrange(low * 100, high * 100)) / 100
+
+    def mobile(self):
+        return str(self.rng.randrange(7_000_000_000, 9_999_999_999))
+
+    def seed_masters(self, model, count, factory):
+        for start in range(0, count, self.batch_size):
+            model.objects.bulk_create(
+                [factory(n) for n in range(start, min(start + self.batch_size, count))],
+                batch_size=self.batch_size,
+            )
+        self.stdout.write(f"  {model.__name__}: {count}")
+        return list(model.objects.order_by('id').values_list('id', flat=True))
+
+    def make_product(self, n):
+        price = self.money(5, 2000)
+        return Product(
+            product_name=f"Product {n:06d}",
+            category_name=self.rng.choice(CATEGORIES),
+            purchase_price=price,
+            sell_price=(price * Decimal('1.2')).quantize(Decimal('0.01')),
+            quantity=self.rng.randrange(0, 500),
+            stock_alert=self.rng.choice([5, 10, 20]),
+            weight=self.rng.choice(['', '250g', '500g', '1kg', '5kg']),
+        )
+
+    def make_customer(self, n):
+        return Customer(
+            customer_name=f"Customer {n:06d}",
+            shop_name=f"Shop {n:06d}" if n % 3 else None,
+            mobile_number=self.mobile(),
+            city=self.rng.choice(CITIES),
+        )
+
+    def make_vendor(self, n):
+        return Vendor(
+            vendor_name=f"Vendor {n:05d}",
+            company_name=f"Traders {n:05d}",
+            mobile_number=self.mobile(),
+            city=self.rng.choice(CITIES),
+        )
+
+    def make_employee(self, n):
+        return Employee(
+            employee_name=f"Employee {n:03d}",
+            mobile_number=self.mobile(),
+            city=self.rng.choice(CITIES),
+        )
+
+    def seed_invoices(self, count, items_per_invoice, product_ids, customer_ids, vendor_ids):
+        for start in range(0, count, self.batch_size):
+            stop = min(start + self.batch_size, count)
+            invoices, lines = [], []
+            for n in range(start, stop):
+                is_sale = self.rng.random() < 0.8
+                items = [
+                    (self.rng.choice(product_ids), self.rng.randrange(1, 10), self.money(5, 2000))
+                    for _ in range(self.rng.randrange(1, 2 * items_per_invoice))
+                ]
+                total = sum(quantity * price for _, quantity, price in items)
+                invoices.append(Invoice(
+                    invoice_type='SALE' if is_sale else 'PURCHASE',
+                    customer_id=self.rng.choice(customer_ids) if is_sale else None,
+                    vendor_id=None if is_sale else self.rng.choice(vendor_ids),
+                    date=self.date_at(n, count),
+                    total_amount=total,
+                    paid_amount=total if self.rng.random() < 0.7 else (total / 2).quantize(Decimal('0.01')),
+                ))
+                lines.append(items)
+
+            with transaction.atomic():
+                Invoice.objects.bulk_create(invoices, batch_size=self.batch_size)
+                InvoiceItem.objects.bulk_create([
+                    InvoiceItem(invoice_id=invoice.id, product_id=product_id, quantity=quantity, price=price)
+                    for invoice, items in zip(invoices, lines)
+                    for product_id, quantity, price in items
+                ], batch_size=self.batch_size)
+        self.stdout.write(f"  Invoice: {count}")
+
+    def seed_cash(self, model, count, employee_ids=None):
+        for start in range(0, count, self.batch_size):
+            rows = []
+            for n in range(start, min(start + self.batch_size, count)):
+                row = model(
+                    name=f"{model.__name__} {n}",
+                    date=self.date_at(n, count),
+                    amount=self.money(10, 50_000),
+                    payment_type=self.rng.choice(PAYMENT_TYPES),
+                )
+                if employee_ids and n % 20 == 0:
+                    row.employee_id = self.rng.choice(employee_ids)
+                    row.payment_type = 'Salary'
+                rows.append(row)
+            model.objects.bulk_create(rows, batch_size=self.batch_size)
+        self.stdout.write(f"  {model.__name__}: {count}")
@@ -0,0 +1,18 @@
+# core/management/commands/snapshot_stock.py
+from django.core.management.base import BaseCommand
+
+from core import inventory
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot the quantity of every product that moved since the last run. "
+        "Run periodically (e.g. nightly) to bound point-in-time stock reads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Products written per batch.")
+
+    def handle(self, *args, **options):
+        written = inventory.take_snapshots(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Stock snapshots written: {written}."))
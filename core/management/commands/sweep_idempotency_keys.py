@@ -0,0 +1,15 @@
+# core/management/commands/sweep_idempotency_keys.py
+from django.core.management.base import BaseCommand
+
+from core import idempotency
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored Idempotency-Key responses older than IDEMPOTENCY_TTL_HOURS. "
+        "Expired keys are never replayed, so this only keeps the table small."
+    )
+
+    def handle(self, *args, **options):
+        deleted = idempotency.sweep()
+        self.stdout.write(self.style.SUCCESS(f"Idempotency keys deleted: {deleted}."))
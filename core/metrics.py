@@ -0,0 +1,103 @@
+# core/metrics.py
+"""
+In-process request and SQL metrics, rendered in Prometheus text format.
+
+Counters live in this worker's memory; every worker exposes its own
+numbers at /api/metrics/ and the scraper sums them.
+"""
+import bisect
+import threading
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class RouteStats:
+    __slots__ = ('count', 'latency_sum', 'buckets', 'queries', 'query_time')
+
+    def __init__(self):
+        self.count = 0
+        self.latency_sum = 0.0
+        # One slot per bucket plus +Inf; made cumulative only when rendered
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.queries = 0
+        self.query_time = 0.0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, route, method, latency, queries, query_time):
+        key = (route, method)
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = RouteStats()
+            stats.count += 1
+            stats.latency_sum += latency
+            stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            stats.queries += queries
+            stats.query_time += query_time
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: (s.count, s.latency_sum, list(s.buckets), s.queries, s.query_time)
+                for key, s in self._routes.items()
+            }
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        snapshot = sorted(self.snapshot().items())
+        lines = [
+            '# HELP ebilling_http_requests_total Requests handled, by route and method.',
+            '# TYPE ebilling_http_requests_total counter',
+        ]
+        for (route, method), (count, *_rest) in snapshot:
+            lines.append(f'ebilling_http_requests_total{_labels(route, method)} {count}')
+
+        lines += [
+            '# HELP ebilling_http_request_duration_seconds Request latency, by route and method.',
+            '# TYPE ebilling_http_request_duration_seconds histogram',
+        ]
+        for (route, method), (count, latency_sum, buckets, _queries, _query_time) in snapshot:
+            cumulative = 0
+            for bound, hits in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+                cumulative += hits
+                lines.append(
+                    f'ebilling_http_request_duration_seconds_bucket{_labels(route, method, le=bound)} {cumulative}'
+                )
+            lines.append(f'ebilling_http_request_duration_seconds_sum{_labels(route, method)} {latency_sum:.6f}')
+            lines.append(f'ebilling_http_request_duration_seconds_count{_labels(route, method)} {count}')
+
+        lines += [
+            '# HELP ebilling_db_queries_total SQL queries executed, by route and method.',
+            '# TYPE ebilling_db_queries_total counter',
+        ]
+        for (route, method), (_count, _sum, _buckets, queries, _query_time) in snapshot:
+            lines.append(f'ebilling_db_queries_total{_labels(route, method)} {queries}')
+
+        lines += [
+            '# HELP ebilling_db_query_seconds_total Time spent in SQL, by route and method.',
+            '# TYPE ebilling_db_query_seconds_total counter',
+        ]
+        for (route, method), (_count, _sum, _buckets, _queries, query_time) in snapshot:
+            lines.append(f'ebilling_db_query_seconds_total{_labels(route, method)} {query_time:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(route, method, **extra):
+    pairs = [('route', route), ('method', method)] + list(extra.items())
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+registry = MetricsRegistry()
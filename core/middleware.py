@@ -0,0 +1,162 @@
+# core/middleware.py
+import heapq
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .metrics import registry
+
+logger = logging.getLogger('core.metrics')
+
+# The recorder of the request being handled, for code that runs its queries
+# on other threads (sync_to_async copies it along)
+current_recorder = ContextVar('current_recorder', default=None)
+_merge_lock = threading.Lock()
+
+
+class QueryRecorder:
+    """execute_wrapper that counts and times queries, keeping only the slowest few."""
+    __slots__ = ('count', 'duration', 'slowest', 'keep')
+
+    def __init__(self, keep):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+        self.keep = keep
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, (elapsed, sql))
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (elapsed, sql))
+
+    def merge(self, other):
+        with _merge_lock:
+            self.count += other.count
+            self.duration += other.duration
+            self.slowest = heapq.nlargest(self.keep, self.slowest + other.slowest)
+            heapq.heapify(self.slowest)
+
+
+def _attach(recorder):
+    for alias in connections:
+        connections[alias].execute_wrappers.append(recorder)
+
+def _detach(recorder):
+    # By identity, as other wrappers may come and go
+    for alias in connections:
+        connections[alias].execute_wrappers.remove(recorder)
+
+@contextmanager
+def recording_queries():
+    """Count this thread's queries into the current request's metrics."""
+    parent = current_recorder.get()
+    if parent is None:
+        yield
+        return
+    recorder = QueryRecorder(parent.keep)
+    _attach(recorder)
+    try:
+        yield
+    finally:
+        _detach(recorder)
+        parent.merge(recorder)
+
+
+class MetricsMiddleware:
+    """
+    Per-route request count, latency histogram, SQL query count and SQL time
+    (served by /api/metrics/), plus a warning log for requests slower than
+    METRICS_SLOW_REQUEST_MS with their slowest queries.
+
+    A streaming response (exports, PDFs, event streams) is recorded once its
+    body has been sent, with the queries run while producing it.
+
+    Under ASGI the recorder is attached in the request's thread-sensitive
+    executor thread, where Django runs sync views. Async views that fan out
+    to other threads wrap those queries in recording_queries().
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_seconds = settings.METRICS_SLOW_REQUEST_MS / 1000
+        self.top_queries = settings.METRICS_SLOW_TOP_QUERIES
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        recorder = QueryRecorder(self.top_queries)
+        started = time.perf_counter()
+        token = current_recorder.set(recorder)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.stream(request, response.streaming_content, started, recorder)
+            return response
+        self.record(request, time.perf_counter() - started, recorder)
+        return response
+
+    def stream(self, request, content, started, recorder):
+        # Attached for the whole body rather than per chunk (exports yield one
+        # row at a time), in whichever thread consumes it
+        _attach(recorder)
+        try:
+            yield from content
+        finally:
+            _detach(recorder)
+            self.record(request, time.perf_counter() - started, recorder)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder(self.top_queries)
+        started = time.perf_counter()
+        await sync_to_async(_attach)(recorder)
+        token = current_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+            await sync_to_async(_detach)(recorder)
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.stream(request, response.streaming_content, started, recorder)
+            return response
+        self.record(request, time.perf_counter() - started, recorder)
+        return response
+
+    def record(self, request, elapsed, recorder):
+        match = request.resolver_match
+        route = match.view_name if match is not None and match.view_name else 'unmatched'
+        registry.observe(route, request.method, elapsed, recorder.count, recorder.duration)
+
+        if elapsed >= self.slow_seconds:
+            top = ''.join(
+                f'\n  {duration * 1000:8.2f} ms  {sql[:500]}'
+                for duration, sql in sorted(recorder.slowest, reverse=True)
+            )
+            logger.warning(
+                'Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms%s',
+                request.method, request.path, route, elapsed * 1000,
+                recorder.count, recorder.duration * 1000, top,
+            )
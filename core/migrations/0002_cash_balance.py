@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:21
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def seed_cash_balance(apps, schema_editor):
+    Income = apps.get_model('core', 'Income')
+    Expense = apps.get_model('core', 'Expense')
+    CashBalance = apps.get_model('core', 'CashBalance')
+    CashBalance.objects.update_or_create(pk=1, defaults={
+        'total_income': Income.objects.aggregate(Sum('amount'))['amount__sum'] or 0,
+        'total_expense': Expense.objects.aggregate(Sum('amount'))['amount__sum'] or 0,
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_income', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_expense', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_cash_balance, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:23
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Sum, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def seed_party_balances(apps, schema_editor):
+    Invoice = apps.get_model('core', 'Invoice')
+    for model_name, field in (('Customer', 'customer'), ('Vendor', 'vendor')):
+        due = (
+            Invoice.objects.filter(**{field: OuterRef('pk')})
+            .values(field)
+            .annotate(due=Sum(F('total_amount') - F('paid_amount')))
+            .values('due')
+        )
+        apps.get_model('core', model_name).objects.update(outstanding_balance=Coalesce(
+            Subquery(due), Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=14, decimal_places=2),
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_cash_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='outstanding_balance',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='outstanding_balance',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunPython(seed_party_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.9 on 2026-10-16 23:05
+
+from django.db import migrations
+
+# External-content FTS5 index over core_product. The update trigger only
+# fires for the indexed columns, so stock movements don't touch the index.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE core_product_fts USING fts5(
+        product_name, category_name,
+        content='core_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER core_product_fts_insert AFTER INSERT ON core_product BEGIN
+        INSERT INTO core_product_fts(rowid, product_name, category_name)
+        VALUES (new.id, new.product_name, new.category_name);
+    END
+    """,
+    """
+    CREATE TRIGGER core_product_fts_delete AFTER DELETE ON core_product BEGIN
+        INSERT INTO core_product_fts(core_product_fts, rowid, product_name, category_name)
+        VALUES ('delete', old.id, old.product_name, old.category_name);
+    END
+    """,
+    """
+    CREATE TRIGGER core_product_fts_update AFTER UPDATE OF product_name, category_name ON core_product BEGIN
+        INSERT INTO core_product_fts(core_product_fts, rowid, product_name, category_name)
+        VALUES ('delete', old.id, old.product_name, old.category_name);
+        INSERT INTO core_product_fts(rowid, product_name, category_name)
+        VALUES (new.id, new.product_name, new.category_name);
+    END
+    """,
+    "INSERT INTO core_product_fts(core_product_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS core_product_fts_insert',
+    'DROP TRIGGER IF EXISTS core_product_fts_delete',
+    'DROP TRIGGER IF EXISTS core_product_fts_update',
+    'DROP TABLE IF EXISTS core_product_fts',
+]
+
+
+def has_fts5(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_product_fts(apps, schema_editor):
+    # Other backends use the icontains fallback in core/search.py
+    if has_fts5(schema_editor):
+        for sql in CREATE_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_product_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_product_fts, drop_product_fts),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-16 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_product_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['mobile_number'], name='customer_mobile_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['mobile_number'], name='vendor_mobile_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.9 on 2026-10-16 23:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def open_existing_alerts(apps, schema_editor):
+    # Start the feed from the current state: one LOW event per low product
+    Product = apps.get_model('core', 'Product')
+    StockAlert = apps.get_model('core', 'StockAlert')
+    StockAlertEvent = apps.get_model('core', 'StockAlertEvent')
+    low = Product.objects.filter(quantity__lte=F('stock_alert')).order_by('id')
+    rows = list(low.values_list('id', 'product_name', 'quantity', 'stock_alert'))
+    StockAlert.objects.bulk_create([StockAlert(product_id=pk) for pk, *_rest in rows], batch_size=1000)
+    StockAlertEvent.objects.bulk_create([
+        StockAlertEvent(event_type='LOW', product_id=pk, product_name=name, quantity=quantity, stock_alert=alert)
+        for pk, name, quantity, alert in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_party_mobile_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='open_alert', serialize=False, to='core.product')),
+                ('opened_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockAlertEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('LOW', 'Low stock'), ('CLEARED', 'Cleared')], max_length=10)),
+                ('product_name', models.CharField(max_length=100)),
+                ('quantity', models.IntegerField()),
+                ('stock_alert', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.product')),
+            ],
+        ),
+        migrations.RunPython(open_existing_alerts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.9 on 2026-10-16 23:48
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    Invoice = apps.get_model('core', 'Invoice')
+    Income = apps.get_model('core', 'Income')
+    Expense = apps.get_model('core', 'Expense')
+    PeriodRollup = apps.get_model('core', 'PeriodRollup')
+
+    days = {}
+    for row in Invoice.objects.values('date', 'invoice_type').annotate(
+        total=Sum('total_amount'), paid=Sum('paid_amount'), count=Count('id'),
+    ):
+        days[(row['date'], row['invoice_type'])] = (row['total'], row['paid'], row['count'])
+    for kind, model in (('INCOME', Income), ('EXPENSE', Expense)):
+        for row in model.objects.values('date').annotate(total=Sum('amount'), count=Count('id')):
+            days[(row['date'], kind)] = (row['total'], Decimal('0'), row['count'])
+
+    months = defaultdict(lambda: [Decimal('0'), Decimal('0'), 0])
+    for (day, kind), (total, paid, count) in days.items():
+        month = months[(day.replace(day=1), kind)]
+        month[0] += total
+        month[1] += paid
+        month[2] += count
+
+    PeriodRollup.objects.bulk_create([
+        PeriodRollup(period='DAY', period_start=day, kind=kind, total=total, paid=paid, count=count)
+        for (day, kind), (total, paid, count) in days.items()
+    ] + [
+        PeriodRollup(period='MONTH', period_start=start, kind=kind, total=total, paid=paid, count=count)
+        for (start, kind), (total, paid, count) in months.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('DAY', 'Day'), ('MONTH', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('kind', models.CharField(choices=[('SALE', 'Sale'), ('PURCHASE', 'Purchase'), ('INCOME', 'Income'), ('EXPENSE', 'Expense')], max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('paid', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('period', 'period_start', 'kind'), name='period_rollup_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
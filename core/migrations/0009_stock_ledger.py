@@ -0,0 +1,54 @@
+# Generated by Django 5.2.9 on 2026-10-17 00:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def record_opening_stock(apps, schema_editor):
+    # Start the ledger at the current quantities
+    Product = apps.get_model('core', 'Product')
+    StockMovement = apps.get_model('core', 'StockMovement')
+    rows = Product.objects.exclude(quantity=0).order_by('id').values_list('id', 'quantity')
+    StockMovement.objects.bulk_create(
+        (StockMovement(product_id=pk, quantity=quantity, reason='OPENING') for pk, quantity in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_period_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('reason', models.CharField(choices=[('OPENING', 'Opening stock'), ('SALE', 'Sale'), ('PURCHASE', 'Purchase'), ('INVOICE_EDIT', 'Invoice edited'), ('INVOICE_DELETE', 'Invoice deleted'), ('ADJUSTMENT', 'Manual adjustment'), ('RECONCILE', 'Reconciliation')], max_length=20)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.invoice')),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='core.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'id'], name='stockmove_product_id_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('last_movement_id', models.BigIntegerField()),
+                ('taken_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='core.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'taken_at'], name='stocksnap_product_time_idx')],
+            },
+        ),
+        migrations.RunPython(record_opening_stock, migrations.RunPython.noop),
+    ]
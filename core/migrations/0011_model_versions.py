@@ -0,0 +1,71 @@
+# Generated by Django 5.2.9 on 2026-10-17 01:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# Tables whose writes bump a ModelVersion row (conditional GETs, core/versions.py)
+TRACKED_TABLES = [
+    'core_vendor', 'core_customer', 'core_employee', 'core_product', 'core_income',
+    'core_expense', 'core_invoice', 'core_invoiceitem', 'core_bankaccount',
+]
+EVENTS = ['INSERT', 'UPDATE', 'DELETE']
+
+
+def trigger_name(table, event):
+    return f'{table}_version_{event.lower()}'
+
+
+def create_sql(table):
+    # An upsert, so a missing counter row (e.g. after a flush) comes back on the next write
+    return [
+        f"""
+        CREATE TRIGGER {trigger_name(table, event)} AFTER {event} ON {table} BEGIN
+            INSERT INTO core_modelversion(name, version, updated_at)
+            VALUES ('{table}', 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+            ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at;
+        END
+        """
+        for event in EVENTS
+    ]
+
+
+def drop_sql(table):
+    return [f'DROP TRIGGER IF EXISTS {trigger_name(table, event)}' for event in EVENTS]
+
+
+def create_version_triggers(apps, schema_editor):
+    ModelVersion = apps.get_model('core', 'ModelVersion')
+    ModelVersion.objects.using(schema_editor.connection.alias).bulk_create(
+        [ModelVersion(name=table) for table in TRACKED_TABLES], ignore_conflicts=True,
+    )
+    # Other backends have no counters; conditional GETs are then skipped
+    if schema_editor.connection.vendor == 'sqlite':
+        for table in TRACKED_TABLES:
+            for sql in create_sql(table):
+                schema_editor.execute(sql)
+
+
+def drop_version_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for table in TRACKED_TABLES:
+            for sql in drop_sql(table):
+                schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelVersion',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(create_version_triggers, drop_version_triggers),
+    ]
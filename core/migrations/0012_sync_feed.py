@@ -0,0 +1,148 @@
+# Generated by Django 5.2.9 on 2026-10-17 02:08
+
+import importlib
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# Synced tables -> model name in the feed and in core_tombstone
+SYNCED_TABLES = {
+    'core_vendor': 'vendor', 'core_customer': 'customer', 'core_employee': 'employee',
+    'core_product': 'product', 'core_invoice': 'invoice', 'core_income': 'income', 'core_expense': 'expense',
+}
+
+# Database time in the text form Django stores datetimes in (microseconds
+# only when non-zero), so stamps compare correctly with query parameters
+STAMP = (
+    "CASE WHEN strftime('%f', 'now') LIKE '%.000' THEN strftime('%Y-%m-%d %H:%M:%S', 'now') "
+    "ELSE strftime('%Y-%m-%d %H:%M:%f', 'now') || '000' END"
+)
+
+
+def create_sql(table, model):
+    # The touch triggers' own UPDATE doesn't re-fire them (recursive_triggers is off)
+    return [
+        f"""
+        CREATE TRIGGER {table}_touch_insert AFTER INSERT ON {table} BEGIN
+            UPDATE {table} SET updated_at = {STAMP} WHERE id = new.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER {table}_touch_update AFTER UPDATE ON {table} BEGIN
+            UPDATE {table} SET updated_at = {STAMP} WHERE id = new.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER {table}_tombstone AFTER DELETE ON {table} BEGIN
+            INSERT INTO core_tombstone(model, object_id, deleted_at) VALUES ('{model}', old.id, {STAMP});
+        END
+        """,
+    ]
+
+
+# Item changes show up as a change of their invoice
+INVOICE_ITEM_SQL = [
+    f"""
+    CREATE TRIGGER core_invoiceitem_touch_insert AFTER INSERT ON core_invoiceitem BEGIN
+        UPDATE core_invoice SET updated_at = {STAMP} WHERE id = new.invoice_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER core_invoiceitem_touch_update AFTER UPDATE ON core_invoiceitem BEGIN
+        UPDATE core_invoice SET updated_at = {STAMP} WHERE id IN (old.invoice_id, new.invoice_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER core_invoiceitem_touch_delete AFTER DELETE ON core_invoiceitem BEGIN
+        UPDATE core_invoice SET updated_at = {STAMP} WHERE id = old.invoice_id;
+    END
+    """,
+]
+
+DROP_SQL = [
+    f'DROP TRIGGER IF EXISTS {table}_{suffix}'
+    for table in SYNCED_TABLES for suffix in ('touch_insert', 'touch_update', 'tombstone')
+] + [
+    f'DROP TRIGGER IF EXISTS core_invoiceitem_touch_{event}' for event in ('insert', 'update', 'delete')
+]
+
+
+def create_sync_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # Adding updated_at rebuilt these tables, which dropped their
+    # product search and version triggers: put those back first
+    product_search = importlib.import_module('core.migrations.0005_product_search')
+    model_versions = importlib.import_module('core.migrations.0011_model_versions')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'core_product_fts'")
+        has_product_fts = cursor.fetchone() is not None
+    if has_product_fts:
+        for sql in product_search.DROP_SQL[:3] + product_search.CREATE_SQL[1:4]:
+            schema_editor.execute(sql)
+    for table, model in SYNCED_TABLES.items():
+        for sql in model_versions.drop_sql(table) + model_versions.create_sql(table) + create_sql(table, model):
+            schema_editor.execute(sql)
+    for sql in INVOICE_ITEM_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_sync_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_model_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='income',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(create_sync_triggers, drop_sync_triggers),
+    ]
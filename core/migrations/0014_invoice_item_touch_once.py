@@ -0,0 +1,57 @@
+# Generated by Django 5.2.9 on 2026-10-17 09:12
+
+import importlib
+
+from django.db import migrations
+
+sync_feed = importlib.import_module('core.migrations.0012_sync_feed')
+STAMP = sync_feed.STAMP
+
+# As in 0012, but an invoice already stamped in this statement isn't written
+# again: 'now' is fixed for the whole statement, so a bulk insert of its items
+# touches the invoice (and fires its version and touch triggers) once, not per item
+INVOICE_ITEM_SQL = [
+    f"""
+    CREATE TRIGGER core_invoiceitem_touch_insert AFTER INSERT ON core_invoiceitem BEGIN
+        UPDATE core_invoice SET updated_at = {STAMP}
+        WHERE id = new.invoice_id AND updated_at IS NOT {STAMP};
+    END
+    """,
+    f"""
+    CREATE TRIGGER core_invoiceitem_touch_update AFTER UPDATE ON core_invoiceitem BEGIN
+        UPDATE core_invoice SET updated_at = {STAMP}
+        WHERE id IN (old.invoice_id, new.invoice_id) AND updated_at IS NOT {STAMP};
+    END
+    """,
+    f"""
+    CREATE TRIGGER core_invoiceitem_touch_delete AFTER DELETE ON core_invoiceitem BEGIN
+        UPDATE core_invoice SET updated_at = {STAMP}
+        WHERE id = old.invoice_id AND updated_at IS NOT {STAMP};
+    END
+    """,
+]
+
+DROP_SQL = [f'DROP TRIGGER IF EXISTS core_invoiceitem_touch_{event}' for event in ('insert', 'update', 'delete')]
+
+
+def guard_item_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SQL + INVOICE_ITEM_SQL:
+            schema_editor.execute(sql)
+
+
+def unguard_item_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SQL + sync_feed.INVOICE_ITEM_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(guard_item_triggers, unguard_item_triggers),
+    ]
@@ -1,5 +1,6 @@
 # core/models.py
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 
 # 1. Custom User Manager to handle Mobile Number Login
@@ -33,6 +34,13 @@ class Vendor(models.Model):
     company_name = models.CharField(max_length=100)
     mobile_number = models.CharField(max_length=15)
     city = models.CharField(max_length=50)
+    # Denormalized sum of invoice outstanding amounts, maintained by core.ledger
+    outstanding_balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Also stamped by SQLite triggers on update() / bulk writes; the sync feed's cursor (core.sync)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['mobile_number'], name='vendor_mobile_idx')]
     
     def __str__(self):
         return self.company_name
@@ -42,6 +50,12 @@ class Customer(models.Model):
     shop_name = models.CharField(max_length=100, blank=True, null=True)
     mobile_number = models.CharField(max_length=15)
     city = models.CharField(max_length=50)
+    # Denormalized sum of invoice outstanding amounts, maintained by core.ledger
+    outstanding_balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['mobile_number'], name='customer_mobile_idx')]
 
     def __str__(self):
         return self.customer_name
@@ -51,6 +65,7 @@ class Employee(models.Model):
     mobile_number = models.CharField(max_length=15)
     city = models.CharField(max_length=50)
     salary_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.employee_name
@@ -64,6 +79,7 @@ class Product(models.Model):
     quantity = models.IntegerField(default=0)
     stock_alert = models.IntegerField(default=10) # Minimum stock alert
     weight = models.CharField(max_length=20, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.product_name
@@ -84,6 +100,10 @@ class Income(models.Model):
     previous_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     payment_type = models.CharField(max_length=50) # Cash/Online
     transaction_id = models.CharField(max_length=100, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['date', 'id'], name='income_date_id_idx')]
 
 class Expense(models.Model):
     name = models.CharField(max_length=100) # Expense reason
@@ -94,6 +114,10 @@ class Expense(models.Model):
     transaction_id = models.CharField(max_length=100, blank=True)
     # Optional link to employee for salary payments
     employee = models.ForeignKey(Employee, on_delete=models.SET_NULL, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['date', 'id'], name='expense_date_id_idx')]
 
 # 5. Invoicing
 class Invoice(models.Model):
@@ -107,7 +131,18 @@ class Invoice(models.Model):
     date = models.DateField(auto_now_add=True)
     total_amount = models.DecimalField(max_digits=12, decimal_places=2)
     paid_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Also bumped when the invoice's items change
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
+    class Meta:
+        # Back the date-range/type/party list filters
+        indexes = [
+            models.Index(fields=['date', 'id'], name='invoice_date_id_idx'),
+            models.Index(fields=['invoice_type', 'date'], name='invoice_type_date_idx'),
+            models.Index(fields=['customer', 'date'], name='invoice_customer_date_idx'),
+            models.Index(fields=['vendor', 'date'], name='invoice_vendor_date_idx'),
+        ]
+
     @property
     def outstanding_amount(self):
         return self.total_amount - self.paid_amount
@@ -116,4 +151,138 @@ class InvoiceItem(models.Model):
     invoice = models.ForeignKey(Invoice, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
     quantity = models.IntegerField()
-    price = models.DecimalField(max_digits=10, decimal_places=2)
\ No newline at end of file
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+# 6. Ledgers
+class CashBalance(models.Model):
+    """Single-row running Income/Expense totals, maintained by core.ledger."""
+    total_income = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_expense = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def balance(self):
+        return self.total_income - self.total_expense
+
+class PeriodRollup(models.Model):
+    """Day and month totals per kind, maintained by core.rollups."""
+    PERIODS = (('DAY', 'Day'), ('MONTH', 'Month'))
+    KINDS = (('SALE', 'Sale'), ('PURCHASE', 'Purchase'), ('INCOME', 'Income'), ('EXPENSE', 'Expense'))
+    period = models.CharField(max_length=5, choices=PERIODS)
+    period_start = models.DateField()
+    kind = models.CharField(max_length=10, choices=KINDS)
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    # Invoices only: amount paid against the invoices of the period
+    paid = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'period_start', 'kind'], name='period_rollup_uniq'),
+        ]
+
+# 7. Stock alerts
+class StockAlert(models.Model):
+    """A product at or below its stock_alert level, kept by core.inventory."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='open_alert')
+    opened_at = models.DateTimeField(auto_now_add=True)
+
+class StockAlertEvent(models.Model):
+    """Append-only feed of threshold crossings, read incrementally by id."""
+    EVENT_TYPES = (('LOW', 'Low stock'), ('CLEARED', 'Cleared'))
+    event_type = models.CharField(max_length=10, choices=EVENT_TYPES)
+    # No FK constraint: the event outlives a deleted product
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    product_name = models.CharField(max_length=100)
+    quantity = models.IntegerField()
+    stock_alert = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+# 8. Stock ledger
+class StockMovement(models.Model):
+    """Append-only record of every change to Product.quantity; see core.inventory."""
+    REASONS = (
+        ('OPENING', 'Opening stock'),
+        ('SALE', 'Sale'),
+        ('PURCHASE', 'Purchase'),
+        ('INVOICE_EDIT', 'Invoice edited'),
+        ('INVOICE_DELETE', 'Invoice deleted'),
+        ('ADJUSTMENT', 'Manual adjustment'),
+        ('RECONCILE', 'Reconciliation'),
+    )
+    # Indexed together with id below
+    product = models.ForeignKey(Product, related_name='stock_movements', on_delete=models.CASCADE, db_index=False)
+    quantity = models.IntegerField() # Signed change
+    reason = models.CharField(max_length=20, choices=REASONS)
+    invoice = models.ForeignKey(Invoice, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Point-in-time reads scan one product's movements after a snapshot's last_movement_id
+        indexes = [models.Index(fields=['product', 'id'], name='stockmove_product_id_idx')]
+
+class StockSnapshot(models.Model):
+    """Quantity of a product including every movement up to last_movement_id."""
+    product = models.ForeignKey(Product, related_name='stock_snapshots', on_delete=models.CASCADE)
+    quantity = models.IntegerField()
+    last_movement_id = models.BigIntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['product', 'taken_at'], name='stocksnap_product_time_idx')]
+
+# 9. Background jobs
+class Job(models.Model):
+    """Background work run by `manage.py run_workers`; see core.jobs."""
+    STATUSES = (
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+        ('CANCELLED', 'Cancelled'),
+    )
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='QUEUED')
+    progress = models.PositiveSmallIntegerField(default=0) # Percent
+    progress_message = models.CharField(max_length=200, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # Claiming reads the next due queued job
+        indexes = [models.Index(fields=['status', 'run_after', 'id'], name='job_claim_idx')]
+
+# 10. Change tracking
+class ModelVersion(models.Model):
+    """Write counter of one table, bumped by SQLite triggers; see core.versions."""
+    name = models.CharField(max_length=64, primary_key=True) # Table name
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+class Tombstone(models.Model):
+    """A deleted row of a synced model, written by a trigger; see core.sync."""
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+# 11. Idempotency keys
+class IdempotencyKey(models.Model):
+    """Stored response of an Idempotency-Key write; see core.idempotency."""
+    digest = models.CharField(max_length=32, primary_key=True) # Hash of user id + key
+    fingerprint = models.CharField(max_length=32) # Hash of method, path and body
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True) # Null while the first request runs
+    response_body = models.BinaryField(null=True, blank=True) # zlib-compressed JSON
+    response_location = models.CharField(max_length=200, blank=True)
+    locked_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
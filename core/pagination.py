@@ -0,0 +1,23 @@
+# core/pagination.py
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Default keyset pagination: each page is an indexed range scan on the
+    primary key, so deep pages cost the same as the first one.
+    Page size comes from REST_FRAMEWORK['PAGE_SIZE'] and can be overridden
+    per request with ?page_size= up to API_MAX_PAGE_SIZE.
+    """
+    # Invoice/Income/Expense dates are auto_now_add, so newest-id-first is
+    # also newest-date-first. Ordering on the date itself would make DRF
+    # fall back to offsets within a day.
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+class PartyBalancePagination(IdCursorPagination):
+    # Walks the party tables by primary key, so each page is one indexed range query
+    ordering = 'id'
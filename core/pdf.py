@@ -0,0 +1,125 @@
+# core/pdf.py
+"""
+Minimal PDF writer for invoice documents.
+
+Pages are plain text in the standard Helvetica and Courier fonts, which
+every PDF viewer has built in, so nothing is embedded and no third-party
+library is needed. The module has no Django imports: it runs in the
+render processes of core.invoice_pdf, which hand it a plain dict.
+"""
+import os
+import tempfile
+import zlib
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4, in points
+MARGIN = 50
+LINE_HEIGHT = 13
+ROWS_PER_PAGE = 45
+
+# Item table in 9pt Courier: 89 characters fit between the margins
+TABLE_HEADER = f"{'#':>3} {'Item':<44} {'Qty':>8} {'Price':>14} {'Amount':>16}"
+
+
+def _escape(text):
+    # Characters outside the fonts' WinAnsi encoding print as '?'
+    text = str(text).encode('cp1252', 'replace').decode('latin-1')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def _text(x, y, text, font='F1', size=10):
+    return f'BT /{font} {size} Tf {x} {y} Td ({_escape(text)}) Tj ET'
+
+def _rule(y):
+    return f'0.5 w {MARGIN} {y} m {PAGE_WIDTH - MARGIN} {y} l S'
+
+def _table_row(number, name, quantity, price, amount):
+    return f'{number:>3} {name:<44.44} {quantity:>8} {price:>14} {amount:>16}'
+
+
+def invoice_pages(data):
+    """Content streams of an invoice, one per page."""
+    rows = [_table_row(number, *item) for number, item in enumerate(data['items'], 1)]
+    chunks = [rows[start:start + ROWS_PER_PAGE] for start in range(0, len(rows), ROWS_PER_PAGE)] or [[]]
+    pages = []
+    for page_number, chunk in enumerate(chunks, 1):
+        y = PAGE_HEIGHT - MARGIN
+        ops = [
+            _text(MARGIN, y - 18, data['title'], 'F2', 18),
+            _text(PAGE_WIDTH - MARGIN - 150, y - 10, f"Invoice #{data['id']}", 'F2', 11),
+            _text(PAGE_WIDTH - MARGIN - 150, y - 24, f"Date: {data['date']}"),
+        ]
+        y -= 50
+        if page_number == 1 and data['party']:
+            ops.append(_text(MARGIN, y, data['party_label'], 'F2', 10))
+            for line in data['party']:
+                y -= LINE_HEIGHT
+                ops.append(_text(MARGIN, y, line))
+            y -= LINE_HEIGHT * 2
+        ops += [_text(MARGIN, y, TABLE_HEADER, 'F3', 9), _rule(y - 4)]
+        y -= LINE_HEIGHT + 4
+        for row in chunk:
+            ops.append(_text(MARGIN, y, row, 'F3', 9))
+            y -= LINE_HEIGHT
+        if page_number == len(chunks):
+            ops.append(_rule(y + 8))
+            y -= 6
+            for label, value in data['totals']:
+                ops.append(_text(MARGIN, y, f'{label:>70} {value:>18}', 'F3', 9))
+                y -= LINE_HEIGHT
+        ops.append(_text(MARGIN, MARGIN - 20, f'Page {page_number} of {len(chunks)}', 'F1', 8))
+        pages.append('\n'.join(ops))
+    return pages
+
+def build_pdf(pages):
+    """PDF file bytes for a list of page content streams."""
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # page tree, filled in once the page objects are numbered
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+    ]
+    kids = []
+    for page in pages:
+        stream = zlib.compress(page.encode('latin-1'))
+        objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R /F3 5 0 R >> >> /Contents %d 0 R >>'
+            % (PAGE_WIDTH, PAGE_HEIGHT, len(objects))
+        )
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), len(kids))
+
+    out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+def write_invoice(data, path):
+    """
+    Render an invoice to `path` atomically, then remove the other versions
+    of the document (the other PDFs in the same directory).
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(build_pdf(invoice_pages(data)))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    for name in os.listdir(directory):
+        if name.endswith('.pdf') and name != os.path.basename(path):
+            try:
+                os.unlink(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+    return path
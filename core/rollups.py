@@ -0,0 +1,187 @@
+# core/rollups.py
+"""
+Day and month totals of sales, purchases, income and expenses, adjusted
+in the same transaction as every write so reports never scan the raw
+tables. rebuild() recomputes them (manage.py rebuild_rollups).
+"""
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+
+from .models import PeriodRollup, Invoice, Income, Expense
+
+KINDS = ('SALE', 'PURCHASE', 'INCOME', 'EXPENSE')
+ZERO = Decimal('0')
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+def month_end(day):
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+# ==========================================
+# Incremental updates
+# ==========================================
+
+def adjust(kind, day, total=0, paid=0, count=0):
+    """Add signed deltas to the day and month rows of `kind` containing `day`."""
+    if not (total or paid or count):
+        return
+    changes = {'total': Decimal(total), 'paid': Decimal(paid), 'count': count}
+    for period, start in (('DAY', day), ('MONTH', month_start(day))):
+        rows = PeriodRollup.objects.filter(period=period, period_start=start, kind=kind)
+        if rows.update(**{field: F(field) + value for field, value in changes.items()}):
+            continue
+        try:
+            with transaction.atomic():
+                PeriodRollup.objects.create(period=period, period_start=start, kind=kind, **changes)
+        except IntegrityError:
+            # A concurrent writer created the row first
+            rows.update(**{field: F(field) + value for field, value in changes.items()})
+
+def record_invoice(invoice, sign=1):
+    """Add (sign=1) or remove (sign=-1) an invoice."""
+    adjust(invoice.invoice_type, invoice.date, sign * invoice.total_amount, sign * invoice.paid_amount, sign)
+
+def move_invoice(old, new):
+    """Re-book an edited invoice; `old` is a values() dict captured before the edit."""
+    if old['invoice_type'] == new.invoice_type and old['date'] == new.date:
+        adjust(new.invoice_type, new.date,
+               new.total_amount - old['total_amount'], new.paid_amount - old['paid_amount'])
+    else:
+        adjust(old['invoice_type'], old['date'], -old['total_amount'], -old['paid_amount'], -1)
+        record_invoice(new)
+
+def record_cash(kind, entry, sign=1):
+    """Add (sign=1) or remove (sign=-1) an Income ('INCOME') or Expense ('EXPENSE') row."""
+    adjust(kind, entry.date, sign * entry.amount, count=sign)
+
+
+# ==========================================
+# Reports
+# ==========================================
+
+def _rows_query(date_from, date_to, period):
+    if period == 'DAY':
+        return Q(period='DAY', period_start__range=(date_from, date_to))
+    # Whole months come from month rows, partial months at either end from day rows
+    first_full = date_from if date_from.day == 1 else month_end(date_from) + timedelta(days=1)
+    last_full_end = date_to if date_to == month_end(date_to) else month_start(date_to) - timedelta(days=1)
+    if first_full > last_full_end:
+        return Q(period='DAY', period_start__range=(date_from, date_to))
+    query = Q(period='MONTH', period_start__range=(first_full, month_start(last_full_end)))
+    if date_from < first_full:
+        query |= Q(period='DAY', period_start__range=(date_from, first_full - timedelta(days=1)))
+    if last_full_end < date_to:
+        query |= Q(period='DAY', period_start__range=(last_full_end + timedelta(days=1), date_to))
+    return query
+
+def _empty_bucket():
+    return {f'{kind.lower()}_{field}': ZERO if field != 'count' else 0
+            for kind in KINDS for field in ('total', 'paid', 'count')}
+
+def report(date_from, date_to, period='MONTH'):
+    """
+    Totals per day or month between two dates (inclusive), plus the range
+    total, read from rollup rows only: a 3-year monthly report is ~36 month
+    rows per kind plus the day rows of any partial month at either end.
+    """
+    buckets = defaultdict(_empty_bucket)
+    rows = PeriodRollup.objects.filter(_rows_query(date_from, date_to, period)).values_list(
+        'period_start', 'kind', 'total', 'paid', 'count',
+    )
+    for start, kind, total, paid, count in rows:
+        bucket = buckets[start if period == 'DAY' else month_start(start)]
+        prefix = kind.lower()
+        bucket[f'{prefix}_total'] += total
+        bucket[f'{prefix}_paid'] += paid
+        bucket[f'{prefix}_count'] += count
+
+    totals = _empty_bucket()
+    result = []
+    for start in sorted(buckets):
+        bucket = buckets[start]
+        for key, value in bucket.items():
+            totals[key] += value
+        result.append({'period_start': start, **bucket, 'net': _net(bucket)})
+    return {'rows': result, 'totals': {**totals, 'net': _net(totals)}}
+
+def _net(bucket):
+    return bucket['sale_total'] + bucket['income_total'] - bucket['purchase_total'] - bucket['expense_total']
+
+
+# ==========================================
+# Rebuild
+# ==========================================
+
+def _day_totals(date_from, date_to):
+    """{(day, kind): (total, paid, count)} from the raw tables."""
+    totals = {}
+    invoices = (
+        Invoice.objects.filter(date__range=(date_from, date_to))
+        .values('date', 'invoice_type')
+        .annotate(total=Sum('total_amount'), paid=Sum('paid_amount'), count=Count('id'))
+    )
+    for row in invoices:
+        totals[(row['date'], row['invoice_type'])] = (row['total'], row['paid'], row['count'])
+    for kind, model in (('INCOME', Income), ('EXPENSE', Expense)):
+        rows = (
+            model.objects.filter(date__range=(date_from, date_to))
+            .values('date').annotate(total=Sum('amount'), count=Count('id'))
+        )
+        for row in rows:
+            totals[(row['date'], kind)] = (row['total'], ZERO, row['count'])
+    return totals
+
+def rebuild_chunk(first_month, last_month):
+    """Recompute the day and month rows of the whole months first_month..last_month."""
+    date_from, date_to = month_start(first_month), month_end(last_month)
+    with transaction.atomic():
+        # Delete first: on SQLite that takes the write lock before the raw tables are read
+        PeriodRollup.objects.filter(period_start__range=(date_from, date_to)).delete()
+        day_totals = _day_totals(date_from, date_to)
+        months = defaultdict(lambda: [ZERO, ZERO, 0])
+        for (day, kind), (total, paid, count) in day_totals.items():
+            month = months[(month_start(day), kind)]
+            month[0] += total
+            month[1] += paid
+            month[2] += count
+        PeriodRollup.objects.bulk_create([
+            PeriodRollup(period='DAY', period_start=day, kind=kind, total=total, paid=paid, count=count)
+            for (day, kind), (total, paid, count) in day_totals.items()
+        ] + [
+            PeriodRollup(period='MONTH', period_start=start, kind=kind, total=total, paid=paid, count=count)
+            for (start, kind), (total, paid, count) in months.items()
+        ], batch_size=1000)
+
+def data_range():
+    """(first, last) date in any of the raw tables, or None when they are empty."""
+    firsts, lasts = [], []
+    for model in (Invoice, Income, Expense):
+        bounds = model.objects.aggregate(first=Min('date'), last=Max('date'))
+        if bounds['first']:
+            firsts.append(bounds['first'])
+            lasts.append(bounds['last'])
+    return (min(firsts), max(lasts)) if firsts else None
+
+def rebuild(date_from, date_to, chunk_months=1):
+    """
+    Rebuild the whole months covering date_from..date_to, `chunk_months` at
+    a time, each chunk in its own transaction so a multi-year rebuild never
+    holds one long write lock. Yields (first_month, last_month) per chunk.
+    """
+    start = month_start(date_from)
+    while start <= date_to:
+        end = start
+        for _ in range(chunk_months - 1):
+            end = month_end(end) + timedelta(days=1)
+        end = min(end, month_start(date_to))
+        rebuild_chunk(start, end)
+        yield start, end
+        start = month_end(end) + timedelta(days=1)
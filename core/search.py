@@ -0,0 +1,77 @@
+# core/search.py
+"""
+Product typeahead search: an FTS5 index on SQLite (migration
+0005_product_search), icontains elsewhere. A migration that rebuilds
+core_product must re-run that migration's trigger SQL.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import Product
+
+FTS_TABLE = 'core_product_fts'
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_TERMS = 8
+# bm25 is computed per matching row, so a one- or two-letter prefix that
+# matches most of the catalogue would rank all of it. Only the first
+# RANK_CANDIDATES matches (in id order) are ranked; narrower queries,
+# which is what typing quickly produces, are ranked in full.
+RANK_CANDIDATES = 2000
+
+# bm25() column weights: product_name, category_name
+NAME_WEIGHT = 10.0
+CATEGORY_WEIGHT = 2.0
+
+_fts_databases = {}
+
+
+def search_terms(query):
+    """Lowercased words of the query; punctuation is ignored so it can't reach MATCH syntax."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+def fts_available():
+    """True when the FTS5 index exists on the default database (checked once per database)."""
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts_databases:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_databases[name] = cursor.fetchone() is not None
+    return _fts_databases[name]
+
+def _fts_search(terms, limit):
+    match = ' '.join(f'"{term}"*' for term in terms)
+    return list(Product.objects.raw(
+        f'SELECT p.* FROM ('
+        f'  SELECT rowid, bm25({FTS_TABLE}, %s, %s) AS score FROM {FTS_TABLE}'
+        f'  WHERE {FTS_TABLE} MATCH %s LIMIT %s'
+        f') hits JOIN core_product p ON p.id = hits.rowid '
+        f'ORDER BY hits.score, p.id LIMIT %s',
+        [NAME_WEIGHT, CATEGORY_WEIGHT, match, RANK_CANDIDATES, limit],
+    ))
+
+def _fallback_search(terms, limit):
+    queryset = Product.objects.all()
+    for term in terms:
+        queryset = queryset.filter(Q(product_name__icontains=term) | Q(category_name__icontains=term))
+    first = terms[0]
+    rank = Case(
+        When(product_name__istartswith=first, then=Value(0)),
+        When(product_name__icontains=first, then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+    return list(queryset.annotate(search_rank=rank).order_by('search_rank', 'product_name', 'id')[:limit])
+
+def search_products(query, limit=DEFAULT_LIMIT, use_fts=None):
+    """Best `limit` products for the typed `query`, best match first."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if use_fts is None:
+        use_fts = fts_available()
+    return _fts_search(terms, limit) if use_fts else _fallback_search(terms, limit)
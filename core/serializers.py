@@ -1,7 +1,12 @@
 # core/serializers.py
+from decimal import Decimal
+
 from rest_framework import serializers
 from .models import *
+from . import ledger, inventory, rollups
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.db import transaction
 
 class UserLoginSerializer(serializers.Serializer):
     mobile_number = serializers.CharField()
@@ -59,11 +64,13 @@ class VendorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Vendor
         fields = '__all__'
+        read_only_fields = ['outstanding_balance']
 
 class CustomerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Customer
         fields = '__all__'
+        read_only_fields = ['outstanding_balance']
 
 class EmployeeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -85,6 +92,13 @@ class ExpenseSerializer(serializers.ModelSerializer):
         model = Expense
         fields = '__all__'
 
+class PaymentSerializer(serializers.Serializer):
+    # Positive and finite: DecimalField rejects NaN and Infinity
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+
+class SalaryPaymentSerializer(PaymentSerializer):
+    employee_id = serializers.IntegerField()
+
 class BankAccountSerializer(serializers.ModelSerializer):
     class Meta:
         model = BankAccount
@@ -106,21 +120,146 @@ class InvoiceSerializer(serializers.ModelSerializer):
         model = Invoice
         fields = '__all__'
 
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         invoice = Invoice.objects.create(**validated_data)
         
-        # Logic to update stock
-        is_sale = invoice.invoice_type == 'SALE'
-        
-        for item_data in items_data:
-            InvoiceItem.objects.create(invoice=invoice, **item_data)
-            product = item_data['product']
-            if product:
-                if is_sale:
-                    product.quantity -= item_data['quantity']
-                else: # Purchase
-                    product.quantity += item_data['quantity']
-                product.save()
+        # One INSERT for all items, one set-based UPDATE for all stock changes
+        items = InvoiceItem.objects.bulk_create(
+            [InvoiceItem(invoice=invoice, **item_data) for item_data in items_data]
+        )
+        inventory.apply_stock_deltas(
+            inventory.invoice_stock_deltas(invoice.invoice_type, items), invoice.invoice_type, invoice=invoice,
+        )
+
+        # Keep the party's denormalized outstanding balance and the period rollups in step
+        ledger.record_invoice(invoice)
+        rollups.record_invoice(invoice)
                 
-        return invoice
\ No newline at end of file
+        return invoice
+
+    def update(self, instance, validated_data):
+        items_data = validated_data.pop('items', None)
+        with transaction.atomic():
+            old = (
+                Invoice.objects.select_for_update()
+                .values('invoice_type', 'date', 'customer_id', 'vendor_id', 'total_amount', 'paid_amount')
+                .get(pk=instance.pk)
+            )
+            old_deltas = inventory.invoice_item_deltas(instance)
+            invoice = super().update(instance, validated_data)
+            if items_data is not None:
+                # Replace the items wholesale
+                invoice.items.all().delete()
+                InvoiceItem.objects.bulk_create(
+                    [InvoiceItem(invoice=invoice, **item_data) for item_data in items_data]
+                )
+            # Stock follows changed items and a changed invoice_type alike
+            inventory.move_invoice_stock(old_deltas, invoice)
+            ledger.move_invoice(old, invoice)
+            rollups.move_invoice(old, invoice)
+        return invoice
+
+class InvoiceSummarySerializer(serializers.ModelSerializer):
+    """Lean list representation: totals only, no nested items."""
+    outstanding = serializers.ReadOnlyField(source='outstanding_amount')
+    customer_name = serializers.ReadOnlyField(source='customer.customer_name')
+    vendor_name = serializers.ReadOnlyField(source='vendor.vendor_name')
+    item_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Invoice
+        fields = [
+            'id', 'invoice_type', 'date', 'customer', 'customer_name', 'vendor', 'vendor_name',
+            'total_amount', 'paid_amount', 'outstanding', 'item_count',
+        ]
+
+class BulkInvoiceItemSerializer(serializers.ModelSerializer):
+    # Ids are checked for the whole batch at once, see core.bulk_invoices
+    product = serializers.IntegerField(allow_null=True)
+
+    class Meta:
+        model = InvoiceItem
+        fields = ['product', 'quantity', 'price']
+
+class BulkInvoiceSerializer(serializers.ModelSerializer):
+    """Validates one invoice of a bulk upload without any query."""
+    customer = serializers.IntegerField(required=False, allow_null=True)
+    vendor = serializers.IntegerField(required=False, allow_null=True)
+    items = BulkInvoiceItemSerializer(many=True)
+
+    class Meta:
+        model = Invoice
+        fields = ['invoice_type', 'customer', 'vendor', 'total_amount', 'paid_amount', 'items']
+
+# ==========================================
+# Background jobs
+# ==========================================
+
+class DateRangeJobSerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if data.get('date_from') and data.get('date_to') and data['date_from'] > data['date_to']:
+            raise serializers.ValidationError({'date_to': 'Must not be before date_from.'})
+        return data
+
+class ExportJobSerializer(DateRangeJobSerializer):
+    dataset = serializers.ChoiceField(choices=['invoices', 'income', 'expenses'])
+    fmt = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
+
+class InvoicePdfJobSerializer(DateRangeJobSerializer):
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+
+class EmptyJobSerializer(serializers.Serializer):
+    pass
+
+# Payload accepted by each job type (core.jobs.HANDLERS)
+JOB_PAYLOAD_SERIALIZERS = {
+    'export': ExportJobSerializer,
+    'rebuild_rollups': DateRangeJobSerializer,
+    'rebuild_balances': EmptyJobSerializer,
+    'reconcile_stock_alerts': EmptyJobSerializer,
+    'prerender_invoice_pdfs': InvoicePdfJobSerializer,
+}
+
+class JobSerializer(serializers.ModelSerializer):
+    kind = serializers.ChoiceField(choices=list(JOB_PAYLOAD_SERIALIZERS))
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'payload', 'status', 'progress', 'progress_message', 'result', 'error',
+            'attempts', 'max_attempts', 'run_after', 'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = [
+            'status', 'progress', 'progress_message', 'result', 'error',
+            'attempts', 'max_attempts', 'run_after', 'created_at', 'started_at', 'finished_at',
+        ]
+
+    def validate(self, data):
+        payload = JOB_PAYLOAD_SERIALIZERS[data['kind']](data=data.get('payload') or {})
+        if not payload.is_valid():
+            raise serializers.ValidationError({'payload': payload.errors})
+        # Stored in its JSON form; workers validate it again into Python values
+        data['payload'] = payload.data
+        return data
+
+# ==========================================
+# Batch requests
+# ==========================================
+
+class BatchItemSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'], default='GET')
+    path = serializers.RegexField(r'^/api/', max_length=2000) # May carry a query string
+    body = serializers.JSONField(required=False)
+    headers = serializers.DictField(child=serializers.CharField(), required=False)
+
+class BatchSerializer(serializers.Serializer):
+    requests = serializers.ListField(
+        child=BatchItemSerializer(), min_length=1, max_length=settings.BATCH_MAX_REQUESTS,
+    )
+    atomic = serializers.BooleanField(default=False)
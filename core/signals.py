@@ -0,0 +1,76 @@
+# core/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+
+from rest_framework.authtoken.models import Token
+
+from .models import User, Vendor, Customer, Employee, Income, Expense, Invoice, Product
+from . import dashboard, authentication, autocomplete, inventory
+
+
+# ==========================================
+# Dashboard snapshot invalidation
+# ==========================================
+
+DASHBOARD_MODELS = (Vendor, Customer, Employee, Income, Expense, Invoice, Product)
+
+def invalidate_dashboard(sender, **kwargs):
+    dashboard.invalidate_on_commit()
+
+for model in DASHBOARD_MODELS:
+    post_save.connect(invalidate_dashboard, sender=model, dispatch_uid=f'dashboard-save-{model.__name__}')
+    post_delete.connect(invalidate_dashboard, sender=model, dispatch_uid=f'dashboard-delete-{model.__name__}')
+
+
+# ==========================================
+# Token authentication cache invalidation
+# ==========================================
+# Dropped right away and again after commit, so a request racing the
+# transaction can't re-cache the old row (e.g. a still-active user).
+
+def invalidate_user_tokens(sender, instance, **kwargs):
+    authentication.invalidate_user(instance.pk)
+    transaction.on_commit(lambda: authentication.invalidate_user(instance.pk))
+
+def invalidate_token(sender, instance, **kwargs):
+    authentication.invalidate_token(instance.key)
+    transaction.on_commit(lambda: authentication.invalidate_token(instance.key))
+
+post_save.connect(invalidate_user_tokens, sender=User, dispatch_uid='authcache-user-save')
+post_delete.connect(invalidate_user_tokens, sender=User, dispatch_uid='authcache-user-delete')
+post_delete.connect(invalidate_token, sender=Token, dispatch_uid='authcache-token-delete')
+
+
+# ==========================================
+# Party autocomplete index
+# ==========================================
+
+PARTY_KINDS = {Customer: 'customer', Vendor: 'vendor'}
+
+def index_party(sender, instance, **kwargs):
+    transaction.on_commit(lambda: autocomplete.party_index.update(PARTY_KINDS[sender], instance))
+
+def unindex_party(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.party_index.remove(PARTY_KINDS[sender], pk))
+
+for model in PARTY_KINDS:
+    post_save.connect(index_party, sender=model, dispatch_uid=f'autocomplete-save-{model.__name__}')
+    post_delete.connect(unindex_party, sender=model, dispatch_uid=f'autocomplete-delete-{model.__name__}')
+
+
+# ==========================================
+# Low-stock alerts on product saves
+# ==========================================
+# Invoice stock changes are queryset updates and sync in core.inventory;
+# these cover products edited through the API, the admin or the ORM.
+
+def sync_product_alert(sender, instance, raw=False, **kwargs):
+    if not raw:
+        inventory.sync_stock_alerts([instance.pk])
+
+def clear_product_alert(sender, instance, **kwargs):
+    inventory.clear_stock_alert(instance)
+
+post_save.connect(sync_product_alert, sender=Product, dispatch_uid='stockalert-product-save')
+pre_delete.connect(clear_product_alert, sender=Product, dispatch_uid='stockalert-product-delete')
@@ -0,0 +1,59 @@
+# core/stock_feed.py
+"""
+Low-stock event feed: GET /api/stock-alerts/events/?since=<id> and an SSE
+stream that polls by id and ends after STOCK_ALERT_STREAM_SECONDS.
+"""
+import json
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+from .models import StockAlertEvent
+
+EVENT_FIELDS = ('id', 'event_type', 'product_id', 'product_name', 'quantity', 'stock_alert', 'created_at')
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+HEARTBEAT_SECONDS = 15
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets DRF accept `Accept: text/event-stream`; errors go out as one JSON body."""
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+def events_since(last_id, limit=DEFAULT_LIMIT):
+    return list(StockAlertEvent.objects.filter(id__gt=last_id).order_by('id').values(*EVENT_FIELDS)[:limit])
+
+def sse_message(event):
+    data = json.dumps(event, cls=DjangoJSONEncoder)
+    return f"id: {event['id']}\nevent: {event['event_type'].lower()}\ndata: {data}\n\n"
+
+def event_stream(last_id, duration=None, poll_seconds=None):
+    """Yield SSE messages for events after `last_id` until `duration` seconds have passed."""
+    duration = settings.STOCK_ALERT_STREAM_SECONDS if duration is None else duration
+    poll_seconds = settings.STOCK_ALERT_POLL_SECONDS if poll_seconds is None else poll_seconds
+    deadline = time.monotonic() + duration
+    last_sent = time.monotonic()
+    yield f'retry: {int(poll_seconds * 1000)}\n\n'
+    while True:
+        events = events_since(last_id)
+        for event in events:
+            last_id = event['id']
+            yield sse_message(event)
+        now = time.monotonic()
+        if events:
+            last_sent = now
+            if len(events) == DEFAULT_LIMIT:
+                continue
+        if now >= deadline:
+            return
+        if now - last_sent >= HEARTBEAT_SECONDS:
+            last_sent = now
+            yield ': keep-alive\n\n'
+        time.sleep(poll_seconds)
@@ -0,0 +1,129 @@
+# core/sync.py
+"""
+Delta-sync feed for offline clients (GET /api/sync/?since=<cursor>).
+Triggers stamp updated_at and write Tombstones (migration 0012_sync_feed);
+pages run in (updated_at, model, id) order. Only changes older than
+SYNC_SETTLE_SECONDS are served, so none can commit behind a cursor.
+"""
+import base64
+import heapq
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Vendor, Customer, Employee, Product, Invoice, InvoiceItem, Income, Expense, Tombstone
+from .serializers import (
+    VendorSerializer, CustomerSerializer, EmployeeSerializer, ProductSerializer,
+    InvoiceSerializer, IncomeSerializer, ExpenseSerializer,
+)
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+
+# Feed order; cursors store positions in it, so add new models at the end
+SYNCED_MODELS = (
+    ('vendor', Vendor, VendorSerializer),
+    ('customer', Customer, CustomerSerializer),
+    ('employee', Employee, EmployeeSerializer),
+    ('product', Product, ProductSerializer),
+    ('invoice', Invoice, InvoiceSerializer),
+    ('income', Income, IncomeSerializer),
+    ('expense', Expense, ExpenseSerializer),
+)
+# Deletions sort after the changes made at the same instant
+TOMBSTONE_RANK = len(SYNCED_MODELS)
+
+
+def encode_cursor(cursor):
+    stamp, rank, pk = cursor
+    return base64.urlsafe_b64encode(f'{stamp.isoformat()}|{rank}|{pk}'.encode()).decode()
+
+def decode_cursor(value):
+    """(updated_at, rank, pk) of a cursor from encode_cursor(), or None when it isn't one."""
+    try:
+        stamp, rank, pk = base64.urlsafe_b64decode(value.encode()).decode().split('|')
+        stamp, rank, pk = parse_datetime(stamp), int(rank), int(pk)
+    except ValueError:
+        return None
+    if stamp is None or timezone.is_naive(stamp) or not 0 <= rank <= TOMBSTONE_RANK:
+        return None
+    return stamp, rank, pk
+
+def cursor_expired(cursor):
+    """True when tombstones after `cursor` may already have been pruned."""
+    return cursor[0] < timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+
+def prune_tombstones():
+    """Delete the tombstones that only expired cursors could still need."""
+    deleted, _ = Tombstone.objects.filter(
+        deleted_at__lt=timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS),
+    ).delete()
+    return deleted
+
+
+def _after(queryset, field, rank, cursor):
+    """Rows of the model at `rank` that sort after `cursor`."""
+    if cursor is None:
+        return queryset
+    stamp, cursor_rank, cursor_pk = cursor
+    if rank < cursor_rank:
+        return queryset.filter(**{f'{field}__gt': stamp})
+    if rank > cursor_rank:
+        return queryset.filter(**{f'{field}__gte': stamp})
+    return queryset.filter(Q(**{f'{field}__gt': stamp}) | Q(**{field: stamp, 'pk__gt': cursor_pk}))
+
+def _rows(model, ids):
+    if model is Invoice:
+        queryset = Invoice.objects.select_related('customer', 'vendor').prefetch_related(
+            Prefetch('items', queryset=InvoiceItem.objects.select_related('product'))
+        )
+    else:
+        queryset = model.objects.all()
+    return queryset.filter(pk__in=ids).order_by('updated_at', 'pk')
+
+def changes_since(cursor=None, limit=DEFAULT_LIMIT):
+    """
+    The next `limit` changes after `cursor` (None: from the beginning):
+    changed rows per model, deleted ids per model, the new cursor and
+    whether more changes are waiting.
+    """
+    horizon = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    # Stamps are in milliseconds: stop short of the current one, which later writes could still get
+    horizon = horizon.replace(microsecond=horizon.microsecond // 1000 * 1000)
+    # First the positions only, from the updated_at indexes
+    sources = [
+        [(stamp, rank, pk) for stamp, pk in _after(
+            model.objects.filter(updated_at__lt=horizon), 'updated_at', rank, cursor,
+        ).order_by('updated_at', 'pk').values_list('updated_at', 'pk')[:limit + 1]]
+        for rank, (name, model, serializer_class) in enumerate(SYNCED_MODELS)
+    ]
+    tombstones = {}
+    for pk, stamp, model_name, object_id in _after(
+        Tombstone.objects.filter(deleted_at__lt=horizon), 'deleted_at', TOMBSTONE_RANK, cursor,
+    ).order_by('deleted_at', 'pk').values_list('pk', 'deleted_at', 'model', 'object_id')[:limit + 1]:
+        tombstones[(stamp, TOMBSTONE_RANK, pk)] = (model_name, object_id)
+    page = list(islice(heapq.merge(*sources, list(tombstones)), limit + 1))
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    changed = {name: [] for name, _, _ in SYNCED_MODELS}
+    deleted = {name: [] for name, _, _ in SYNCED_MODELS}
+    for rank, (name, model, serializer_class) in enumerate(SYNCED_MODELS):
+        ids = [pk for _, key_rank, pk in page if key_rank == rank]
+        if ids:
+            # A row deleted since the first read is left out; its tombstone comes in a later page
+            changed[name] = serializer_class(_rows(model, ids), many=True).data
+    for key in page:
+        if key[1] == TOMBSTONE_RANK:
+            model_name, object_id = tombstones[key]
+            deleted[model_name].append(object_id)
+    return {
+        'changed': changed,
+        'deleted': deleted,
+        'cursor': encode_cursor(page[-1]) if page else (encode_cursor(cursor) if cursor else None),
+        'has_more': has_more,
+    }
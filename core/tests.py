@@ -1,3 +1,1932 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .models import *
+from . import authentication, benchmarks, bulk_invoices, dashboard, db_router, idempotency, importers, inventory, invoice_pdf, jobs, ledger, metrics, rollups, sync, versions
+
+
+# Slow-request warnings are asserted in MetricsTests rather than printed for every slow test
+_quiet_metrics = override_settings(METRICS_SLOW_REQUEST_MS=3_600_000)
+
+def setUpModule():
+    _quiet_metrics.enable()
+
+def tearDownModule():
+    _quiet_metrics.disable()
+
+def make_product(**kwargs):
+    defaults = {
+        'product_name': 'Rice 1kg', 'category_name': 'Grocery',
+        'purchase_price': 40, 'sell_price': 50, 'quantity': 100,
+    }
+    defaults.update(kwargs)
+    return Product.objects.create(**defaults)
+
+def sale_payload(product, quantity=1, **kwargs):
+    payload = {
+        'invoice_type': 'SALE', 'total_amount': '50.00', 'paid_amount': '50.00',
+        'items': [{'product': product.id, 'quantity': quantity, 'price': '50.00'}],
+    }
+    payload.update(kwargs)
+    return payload
+
+
+# ==========================================
+# Invoice creation & stock
+# ==========================================
+
+class InvoiceCreateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000001', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_duplicate_products_on_one_invoice_are_grouped(self):
+        rice = make_product(quantity=100)
+        oil = make_product(product_name='Oil 1L', quantity=20)
+        payload = sale_payload(rice, items=[
+            {'product': rice.id, 'quantity': 3, 'price': '50.00'},
+            {'product': oil.id, 'quantity': 2, 'price': '120.00'},
+            {'product': rice.id, 'quantity': 4, 'price': '50.00'},
+        ])
+        response = self.client.post('/api/invoices/', payload, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data['items']), 3)
+        rice.refresh_from_db()
+        oil.refresh_from_db()
+        self.assertEqual(rice.quantity, 93)
+        self.assertEqual(oil.quantity, 18)
+
+    def test_purchase_adds_stock(self):
+        rice = make_product(quantity=5)
+        payload = sale_payload(rice, quantity=10, invoice_type='PURCHASE')
+        self.client.post('/api/invoices/', payload, format='json')
+        rice.refresh_from_db()
+        self.assertEqual(rice.quantity, 15)
+
+    def test_large_invoice_writes_are_constant(self):
+        products = [make_product(product_name=f'Item {i}') for i in range(50)]
+        payload = sale_payload(products[0], items=[
+            {'product': p.id, 'quantity': 1, 'price': '50.00'} for p in products
+        ])
+        # The first sale of the day creates its rollup rows; later ones only update them
+        self.client.post('/api/invoices/', sale_payload(products[0]), format='json')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/invoices/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        writes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE'))]
+        # invoice row, all items, all stock changes, their stock movements, day and month rollups
+        self.assertEqual(len(writes), 6, writes)
+
+
+class InvoiceQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000003', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(customer_name='Ravi', mobile_number='9800000000', city='Pune')
+        self.vendor = Vendor.objects.create(vendor_name='Anil', company_name='AK Traders', mobile_number='9700000000', city='Pune')
+        self.products = [make_product(product_name=f'Item {i}') for i in range(3)]
+
+    def create_invoices(self, count):
+        for n in range(count):
+            party = {'customer': self.customer} if n % 2 else {'vendor': self.vendor}
+            invoice = Invoice.objects.create(invoice_type='SALE', total_amount=150, **party)
+            InvoiceItem.objects.bulk_create([
+                InvoiceItem(invoice=invoice, product=p, quantity=1, price=50) for p in self.products
+            ])
+
+    def list_queries(self, url, count):
+        Invoice.objects.all().delete()
+        self.create_invoices(count)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_is_independent_of_size(self):
+        self.assertEqual(self.list_queries('/api/invoices/', 2), self.list_queries('/api/invoices/', 20))
+
+    def test_summary_list_query_count_is_independent_of_size(self):
+        url = '/api/invoices/?view=summary'
+        self.assertEqual(self.list_queries(url, 2), self.list_queries(url, 20))
+
+    def test_summary_list_has_totals_only(self):
+        self.create_invoices(1)
+        response = self.client.get('/api/invoices/?view=summary')
+        row = response.data['results'][0]
+        self.assertNotIn('items', row)
+        self.assertEqual(row['item_count'], 3)
+        self.assertEqual(row['vendor_name'], 'Anil')
+
+    def test_detail_query_count(self):
+        self.create_invoices(1)
+        invoice = Invoice.objects.get()
+        versions.versions_available(['core_invoice'])  # Checked once per process
+        # The ETag's version read, the invoice with its parties, the items with their products
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/invoices/{invoice.id}/')
+        self.assertEqual(len(response.data['items']), 3)
+
+
+class ConcurrentSaleTests(TransactionTestCase):
+    threads = 8
+    sales_per_thread = 5
+
+    def test_parallel_sales_do_not_lose_stock_updates(self):
+        user = User.objects.create_user('9000000002', 'secret123')
+        product = make_product(quantity=1000)
+        errors = []
+
+        def sell():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                for _ in range(self.sales_per_thread):
+                    response = client.post('/api/invoices/', sale_payload(product, quantity=2), format='json')
+                    if response.status_code != 201:
+                        errors.append(response.status_code)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=sell) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 1000 - 2 * self.threads * self.sales_per_thread)
+        self.assertEqual(Invoice.objects.count(), self.threads * self.sales_per_thread)
+
+
+class SqliteProfileTests(TransactionTestCase):
+    databases = {'default', 'reads'}
+
+    def pragma(self, name, alias='default'):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connections_are_tuned(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('busy_timeout'), settings.SQLITE_BUSY_TIMEOUT * 1000)
+        self.assertEqual(self.pragma('query_only'), 0)
+        self.assertEqual(self.pragma('query_only', 'reads'), 1)
+        with self.assertRaises(OperationalError):
+            Vendor.objects.using('reads').create(vendor_name='x', mobile_number='9000000099')
+
+    def test_report_reads_use_the_read_connection(self):
+        with db_router.reporting():
+            self.assertEqual(Invoice.objects.all().db, 'reads')
+            with transaction.atomic():
+                self.assertEqual(Invoice.objects.all().db, 'default')
+        self.assertEqual(Invoice.objects.all().db, 'default')
+
+        user = User.objects.create_user('9000000015', 'secret123')
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connections['reads']) as reads:
+            self.assertEqual(client.get('/api/dashboard/', {'fresh': 1}).status_code, 200)
+            self.assertEqual(client.get('/api/reports/').status_code, 200)
+        self.assertGreater(len(reads), 0)
+
+    def test_concurrent_invoice_and_income_writers(self):
+        user = User.objects.create_user('9000000016', 'secret123')
+        product = make_product(quantity=1000)
+        errors = []
+
+        def write(index):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                for _ in range(5):
+                    if index % 2:
+                        response = client.post('/api/invoices/', sale_payload(product), format='json')
+                    else:
+                        response = client.post('/api/income/', {'name': 'Sale', 'amount': '5.00', 'payment_type': 'Cash'})
+                    if response.status_code != 201:
+                        errors.append(response.status_code)
+                    client.get('/api/dashboard/', {'fresh': 1})
+            except Exception as exc:
+                errors.append(repr(exc))
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=write, args=(index,)) for index in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Invoice.objects.count(), 20)
+        self.assertEqual(Income.objects.count(), 20)
+        self.assertEqual(ledger.get_cash_balance().total_income, Decimal('100.00'))
+
+
+# ==========================================
+# Pagination & invoice filters
+# ==========================================
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000089', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.ids = [
+            Income.objects.create(name=f'Sale {n}', amount=n, payment_type='Cash').pk for n in range(7)
+        ]
+
+    def walk(self, url):
+        """ids of every page from `url` on, following the next links."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            url = response.data['next']
+        return pages
+
+    def test_pages_cover_every_row_once_newest_first(self):
+        pages = self.walk('/api/income/?page_size=3')
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([pk for page in pages for pk in page], sorted(self.ids, reverse=True))
+
+    def test_new_rows_do_not_shift_later_pages(self):
+        first = self.client.get('/api/income/?page_size=3').data
+        Income.objects.create(name='Late sale', amount=1, payment_type='Cash')
+        rest = self.walk(first['next'])
+        seen = [row['id'] for row in first['results']] + [pk for page in rest for pk in page]
+        self.assertEqual(seen, sorted(self.ids, reverse=True))
+
+        # Going back from the second page returns the first one as it was served
+        previous = self.client.get(self.client.get(first['next']).data['previous']).data
+        self.assertEqual([row['id'] for row in previous['results']], [row['id'] for row in first['results']])
+
+    def test_page_size_defaults_and_limits(self):
+        response = self.client.get('/api/income/')
+        self.assertEqual(len(response.data['results']), 7)
+        self.assertIsNone(response.data['next'])
+        with mock.patch('core.pagination.IdCursorPagination.max_page_size', 2):
+            self.assertEqual(len(self.client.get('/api/income/?page_size=500').data['results']), 2)
+
+    def test_malformed_cursor_is_rejected(self):
+        self.assertEqual(self.client.get('/api/income/?cursor=bogus').status_code, 404)
+
+
+class InvoiceFilterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000090', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(customer_name='Asha', mobile_number='9000000091', city='Pune')
+        self.vendor = Vendor.objects.create(vendor_name='Mills', mobile_number='9000000092')
+        self.invoices = {
+            'old_sale': Invoice.objects.create(invoice_type='SALE', customer=self.customer, total_amount=50),
+            'new_sale': Invoice.objects.create(invoice_type='SALE', customer=self.customer, total_amount=50,
+                                               paid_amount=50),
+            'purchase': Invoice.objects.create(invoice_type='PURCHASE', vendor=self.vendor, total_amount=80,
+                                               paid_amount=20),
+        }
+        Invoice.objects.filter(pk=self.invoices['old_sale'].pk).update(date=date(2024, 1, 15))
+
+    def ids(self, query):
+        response = self.client.get(f'/api/invoices/?view=summary&{query}')
+        self.assertEqual(response.status_code, 200)
+        names = {invoice.pk: name for name, invoice in self.invoices.items()}
+        return sorted(names[row['id']] for row in response.data['results'])
+
+    def test_filters(self):
+        today = timezone.localdate()
+        self.assertEqual(self.ids('invoice_type=sale'), ['new_sale', 'old_sale'])
+        self.assertEqual(self.ids(f'customer={self.customer.id}'), ['new_sale', 'old_sale'])
+        self.assertEqual(self.ids(f'vendor={self.vendor.id}'), ['purchase'])
+        self.assertEqual(self.ids('date_from=2024-01-01&date_to=2024-01-31'), ['old_sale'])
+        self.assertEqual(self.ids(f'date_from={today}'), ['new_sale', 'purchase'])
+        self.assertEqual(self.ids('outstanding=1'), ['old_sale', 'purchase'])
+        self.assertEqual(self.ids(f'invoice_type=SALE&customer={self.customer.id}&outstanding=1'), ['old_sale'])
+
+    def test_bad_filter_values_are_rejected(self):
+        for query in ('customer=abc', 'vendor=1.5', 'date_from=15-01-2024', 'date_to=2024-02-30'):
+            self.assertEqual(self.client.get(f'/api/invoices/?{query}').status_code, 400, query)
+
+    def test_filters_use_the_composite_indexes(self):
+        plans = {
+            'invoice_type_date_idx': Invoice.objects.filter(invoice_type='SALE', date__gte=date(2024, 1, 1)),
+            'invoice_customer_date_idx': Invoice.objects.filter(customer=self.customer, date__gte=date(2024, 1, 1)),
+            'invoice_vendor_date_idx': Invoice.objects.filter(vendor=self.vendor, date__gte=date(2024, 1, 1)),
+        }
+        for index, queryset in plans.items():
+            self.assertIn(index, queryset.explain(), index)
+
+
+# ==========================================
+# Party balances
+# ==========================================
+
+class PartyBalanceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000086', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.asha = Customer.objects.create(customer_name='Asha', mobile_number='9000000087', city='Pune')
+        self.ravi = Customer.objects.create(customer_name='Ravi', mobile_number='9000000088', city='Pune')
+        self.product = make_product(quantity=100)
+
+    def assert_outstanding(self, customer, amount):
+        """The stored balance, the SQL sum and the endpoint all agree, and nothing drifts."""
+        customer.refresh_from_db()
+        self.assertEqual(customer.outstanding_balance, Decimal(amount))
+        self.assertEqual(ledger.party_outstanding(customer=customer), Decimal(amount))
+        response = self.client.get(f'/api/customers/{customer.id}/outstanding/')
+        self.assertEqual(response.data['outstanding_amount'], Decimal(amount))
+        self.assertEqual(list(ledger.party_balance_drift(Customer)), [])
+
+    def pay(self, invoice_id, amount):
+        return self.client.post(f'/api/invoices/{invoice_id}/pay/', {'amount': amount}, format='json')
+
+    def test_invoice_writes_keep_the_balance_in_step(self):
+        invoice_id = self.client.post(
+            '/api/invoices/', sale_payload(self.product, 2, customer=self.asha.id, total_amount='100.00',
+                                           paid_amount='30.00'), format='json',
+        ).data['id']
+        self.assert_outstanding(self.asha, '70.00')
+
+        self.client.patch(f'/api/invoices/{invoice_id}/', {'total_amount': '120.00'}, format='json')
+        self.assert_outstanding(self.asha, '90.00')
+        self.client.patch(f'/api/invoices/{invoice_id}/', {'customer': self.ravi.id}, format='json')
+        self.assert_outstanding(self.asha, '0.00')
+        self.assert_outstanding(self.ravi, '90.00')
+
+        self.assertEqual(self.pay(invoice_id, '40.00').status_code, 200)
+        self.assert_outstanding(self.ravi, '50.00')
+
+        self.client.delete(f'/api/invoices/{invoice_id}/')
+        self.assert_outstanding(self.ravi, '0.00')
+
+    def test_payments_must_be_positive_and_within_the_outstanding(self):
+        invoice_id = self.client.post(
+            '/api/invoices/', sale_payload(self.product, customer=self.asha.id, paid_amount='20.00'), format='json',
+        ).data['id']
+        for amount in ('0', '-5', 'NaN', 'Infinity', '-Infinity', 'abc', '30.01'):
+            response = self.pay(invoice_id, amount)
+            self.assertEqual(response.status_code, 400, amount)
+            self.assertIn('amount', response.data)
+        self.assert_outstanding(self.asha, '30.00')
+
+        self.assertEqual(self.pay(invoice_id, '30.00').data['outstanding'], Decimal('0.00'))
+        self.assertEqual(self.pay(invoice_id, '0.01').status_code, 400)
+        self.assert_outstanding(self.asha, '0.00')
+
+    def test_drift_is_reported_and_rebuilt(self):
+        self.client.post('/api/invoices/', sale_payload(self.product, customer=self.asha.id, paid_amount='10.00'),
+                         format='json')
+        Customer.objects.filter(pk=self.asha.pk).update(outstanding_balance=5)
+        Customer.objects.filter(pk=self.ravi.pk).update(outstanding_balance=1)
+        self.assertEqual(
+            sorted(ledger.party_balance_drift(Customer)),
+            [(self.asha.pk, Decimal('5.00'), Decimal('40.00')), (self.ravi.pk, Decimal('1.00'), Decimal('0'))],
+        )
+        ledger.rebuild_party_balances()
+        self.assert_outstanding(self.asha, '40.00')
+        self.assert_outstanding(self.ravi, '0.00')
+
+
+# ==========================================
+# Cash ledger
+# ==========================================
+
+class CashLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000080', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def totals(self):
+        cash = ledger.get_cash_balance()
+        return cash.total_income, cash.total_expense
+
+    def test_income_and_expense_writes_keep_the_ledger_in_step(self):
+        lock = mock.patch('core.views.ledger.lock_cash_balance', wraps=ledger.lock_cash_balance)
+        with lock as locked:
+            income = self.client.post('/api/income/', {'name': 'Sale', 'amount': '100.00', 'payment_type': 'Cash'}).data
+            expense = self.client.post('/api/expenses/', {'name': 'Tea', 'amount': '30.00', 'payment_type': 'Cash'}).data
+            self.assertEqual(expense['previous_balance'], '100.00')
+            self.client.patch(f"/api/income/{income['id']}/", {'amount': '150.00'}, format='json')
+            self.client.patch(f"/api/expenses/{expense['id']}/", {'amount': '50.00'}, format='json')
+            self.assertEqual(self.totals(), (Decimal('150.00'), Decimal('50.00')))
+            self.client.delete(f"/api/expenses/{expense['id']}/")
+            self.client.delete(f"/api/income/{income['id']}/")
+        # Every write read and moved the balance under the ledger lock
+        self.assertEqual(locked.call_count, 6)
+        self.assertEqual(self.totals(), (Decimal('0.00'), Decimal('0.00')))
+
+    def test_salary_payments_need_a_positive_amount(self):
+        employee = Employee.objects.create(employee_name='Ravi', mobile_number='9000000081', city='Pune')
+        for amount in ('0', '-500', 'NaN', 'Infinity', 'abc', ''):
+            response = self.client.post('/api/expenses/pay_salary/', {'employee_id': employee.id, 'amount': amount})
+            self.assertEqual(response.status_code, 400, amount)
+            self.assertIn('amount', response.data)
+        self.assertEqual(self.client.post('/api/expenses/pay_salary/', {'amount': '500'}).status_code, 400)
+        response = self.client.post('/api/expenses/pay_salary/', {'employee_id': 999999, 'amount': '500'})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Expense.objects.exists())
+
+        response = self.client.post('/api/expenses/pay_salary/', {'employee_id': employee.id, 'amount': '500'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['employee'], employee.id)
+        self.assertEqual(self.totals(), (Decimal('0'), Decimal('500.00')))
+
+    def test_rebuild_balances_detects_and_repairs_drift(self):
+        Income.objects.create(name='Sale', amount=100, payment_type='Cash')
+        Expense.objects.create(name='Tea', amount=30, payment_type='Cash')
+        # Written without the views, so the ledger hasn't seen them
+        with self.assertRaises(CommandError):
+            call_command('rebuild_balances', '--check', stdout=io.StringIO())
+
+        out = io.StringIO()
+        call_command('rebuild_balances', stdout=out)
+        self.assertIn('Cash ledger drift', out.getvalue())
+        self.assertIn('Balance ledgers rebuilt', out.getvalue())
+        self.assertEqual(self.totals(), (Decimal('100.00'), Decimal('30.00')))
+        out = io.StringIO()
+        call_command('rebuild_balances', '--check', stdout=out)
+        self.assertIn('Balance ledgers OK.', out.getvalue())
+
+
+class ConcurrentCashTests(TransactionTestCase):
+    threads = 6
+    writes_per_thread = 5
+
+    def test_parallel_income_records_consecutive_previous_balances(self):
+        user = User.objects.create_user('9000000082', 'secret123')
+        errors = []
+
+        def write():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                for _ in range(self.writes_per_thread):
+                    response = client.post('/api/income/', {'name': 'Sale', 'amount': '10.00', 'payment_type': 'Cash'})
+                    if response.status_code != 201:
+                        errors.append(response.status_code)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=write) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        count = self.threads * self.writes_per_thread
+        # Each write saw every earlier one: no two share a previous balance
+        self.assertEqual(
+            sorted(Income.objects.values_list('previous_balance', flat=True)),
+            [Decimal(10 * n) for n in range(count)],
+        )
+        self.assertEqual(ledger.get_cash_balance().total_income, Decimal(10 * count))
+
+
+# ==========================================
+# Dashboard snapshot
+# ==========================================
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('9000000083', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        ledger.get_cash_balance()
+
+    def dashboard(self, **params):
+        response = self.client.get('/api/dashboard/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_warm_dashboard_runs_no_queries(self):
+        with self.assertNumQueries(len(dashboard.SNAPSHOT_QUERIES)):
+            self.dashboard()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.dashboard()['total_customers'], 0)
+
+    def test_fresh_bypasses_the_snapshot(self):
+        self.dashboard()
+        # Written without signals, so only a recompute can see it
+        Customer.objects.bulk_create([Customer(customer_name='Asha', mobile_number='9000000084', city='Pune')])
+        self.assertEqual(self.dashboard()['total_customers'], 0)
+        with self.assertNumQueries(len(dashboard.SNAPSHOT_QUERIES)):
+            self.assertEqual(self.dashboard(fresh=1)['total_customers'], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.dashboard()['total_customers'], 1)
+
+    def test_writes_invalidate_the_snapshot(self):
+        self.dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/income/', {'name': 'Sale', 'amount': '40.00', 'payment_type': 'Cash'})
+        with self.assertNumQueries(len(dashboard.SNAPSHOT_QUERIES)):
+            self.assertEqual(self.dashboard()['total_income'], Decimal('40.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            customer = Customer.objects.create(customer_name='Asha', mobile_number='9000000085', city='Pune')
+        self.assertEqual(self.dashboard()['total_customers'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            customer.delete()
+        self.assertEqual(self.dashboard()['total_customers'], 0)
+
+
+# ==========================================
+# Streaming exports
+# ==========================================
+
+def anonymous_rss():
+    """Resident anonymous memory in bytes (Linux), or None where /proc is unavailable.
+
+    Leaves out file-backed pages, i.e. the database file SQLite reads
+    through mmap (SQLITE_MMAP_BYTES), which would otherwise count as growth.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000004', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_invoice_export_flattens_items(self):
+        rice = make_product()
+        oil = make_product(product_name='Oil 1L')
+        invoice = Invoice.objects.create(invoice_type='SALE', total_amount=170)
+        InvoiceItem.objects.create(invoice=invoice, product=rice, quantity=1, price=50)
+        InvoiceItem.objects.create(invoice=invoice, product=oil, quantity=1, price=120)
+        Invoice.objects.create(invoice_type='PURCHASE', total_amount=10)
+
+        response = self.client.get('/api/invoices/export/')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertTrue(lines[0].startswith('invoice_id,invoice_type,date'))
+        self.assertEqual(len(lines), 4)
+        self.assertIn('Oil 1L', lines[2])
+
+    def test_ndjson_export(self):
+        Income.objects.create(name='Shop sale', amount=500, payment_type='Cash')
+        response = self.client.get('/api/income/export/?fmt=ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(rows[0]['amount'], '500.00')
+
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.client.get('/api/expenses/export/?fmt=xlsx').status_code, 400)
+
+
+class ExportMemoryTests(TransactionTestCase):
+    # Opt-in, seeding takes minutes: EXPORT_TEST_ROWS=1000000 manage.py test core
+    rows = int(os.environ.get('EXPORT_TEST_ROWS', 0))
+    max_rss_growth = 64 * 1024 * 1024
+
+    def test_export_memory_is_constant(self):
+        if not self.rows or anonymous_rss() is None:
+            self.skipTest('set EXPORT_TEST_ROWS (e.g. 1000000) to run; needs /proc')
+        batch = 10_000
+        for start in range(0, self.rows, batch):
+            Income.objects.bulk_create(
+                Income(name=f'Sale {n}', amount=n % 1000, payment_type='Cash')
+                for n in range(start, min(start + batch, self.rows))
+            )
+
+        user = User.objects.create_user('9000000005', 'secret123')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/income/export/')
+
+        baseline = peak = anonymous_rss()
+        lines = 0
+        for chunk in response.streaming_content:
+            lines += chunk.count(b'\n')
+            if lines % 50_000 == 0:
+                peak = max(peak, anonymous_rss())
+        peak = max(peak, anonymous_rss())
+
+        self.assertEqual(lines, self.rows + 1)
+        self.assertLess(peak - baseline, self.max_rss_growth)
+
+
+# ==========================================
+# Bulk import
+# ==========================================
+
+PRODUCT_HEADER = 'id,product_name,category_name,purchase_price,sell_price,quantity\n'
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000093', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rice = make_product(quantity=10)
+
+    def upload(self, path, content):
+        upload = io.BytesIO(content)
+        upload.name = 'masters.csv'
+        response = self.client.post(path, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def movements(self, product_id):
+        return list(StockMovement.objects.filter(product_id=product_id).order_by('id').values_list('reason', 'quantity'))
+
+    def test_products_are_upserted_with_a_per_row_report(self):
+        report = self.upload('/api/products/bulk_import/?chunk_size=2', (
+            PRODUCT_HEADER
+            + f'{self.rice.id},Rice 1kg,Grocery,40,55,25\n'
+            + ',Oil 1L,Grocery,100,120,8\n'
+            + ',Salt,Grocery,abc,10,3\n'
+            + 'x,Sugar,Grocery,30,35,1\n'
+        ).encode())
+        self.assertEqual((report['imported'], report['failed']), (2, 2))
+        self.assertEqual([(error['row'], set(error['errors'])) for error in report['errors']],
+                         [(4, {'purchase_price'}), (5, {'id'})])
+
+        self.rice.refresh_from_db()
+        self.assertEqual((self.rice.sell_price, self.rice.quantity), (Decimal('55.00'), 25))
+        self.assertEqual(self.movements(self.rice.id), [('ADJUSTMENT', 15)])
+        oil = Product.objects.get(product_name='Oil 1L')
+        self.assertEqual(self.movements(oil.id), [('OPENING', 8)])
+
+    def test_json_lines_parties(self):
+        response = self.client.post(
+            '/api/customers/bulk_import/?fmt=jsonl',
+            b'{"customer_name": "Asha", "mobile_number": "9000000094", "city": "Pune"}\n'
+            b'\n'
+            b'["not", "an", "object"]\n'
+            b'{"customer_name": "Ravi"\n',
+            content_type='application/x-ndjson',
+        )
+        self.assertEqual((response.data['imported'], response.data['failed']), (1, 2))
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4])
+        self.assertTrue(Customer.objects.filter(customer_name='Asha').exists())
+
+    def test_repeated_ids_apply_in_file_order(self):
+        report = self.upload('/api/products/bulk_import/', (
+            PRODUCT_HEADER
+            + f'{self.rice.id},Rice 1kg,Grocery,40,50,15\n'
+            + '9001,Dal,Grocery,80,95,5\n'
+            + f'{self.rice.id},Rice 1kg,Grocery,40,50,12\n'
+            + '9001,Dal,Grocery,80,95,7\n'
+        ).encode())
+        self.assertEqual((report['imported'], report['failed']), (4, 0))
+        # One movement per row, adding up to the final quantity
+        self.assertEqual(self.movements(self.rice.id), [('ADJUSTMENT', 5), ('ADJUSTMENT', -3)])
+        self.assertEqual(self.movements(9001), [('OPENING', 5), ('ADJUSTMENT', 2)])
+        self.assertEqual(Product.objects.get(pk=self.rice.id).quantity, 12)
+        self.assertEqual(Product.objects.get(pk=9001).quantity, 7)
+
+    def test_bad_ids_and_unreadable_files_are_row_errors(self):
+        report = self.upload('/api/products/bulk_import/', (
+            PRODUCT_HEADER
+            + ',Oil 1L,Grocery,100,120,8\n'
+            + '99999999999999999999,Dal,Grocery,80,95,5\n'
+            + '-4,Dal,Grocery,80,95,5\n'
+        ).encode() + b'\xff\xfe,Salt,Grocery,5,10,1\n')
+        self.assertEqual((report['imported'], report['failed']), (1, 3))
+        self.assertEqual([(error['row'], set(error['errors'])) for error in report['errors']],
+                         [(3, {'id'}), (4, {'id'}), (5, {'non_field_errors'})])
+        self.assertTrue(Product.objects.filter(product_name='Oil 1L').exists())
+
+    def test_import_masters_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path, errors = os.path.join(directory, 'vendors.csv'), os.path.join(directory, 'errors.json')
+            with open(path, 'w') as out:
+                out.write('vendor_name,company_name,mobile_number,city\nMills,Mills & Co,9000000095,Pune\n,X,9000000096,Pune\n')
+            out = io.StringIO()
+            call_command('import_masters', 'vendors', path, '--errors', errors, stdout=out)
+            with open(errors) as report:
+                self.assertEqual([error['row'] for error in json.load(report)], [3])
+        self.assertIn('Imported 1 vendors', out.getvalue())
+        self.assertTrue(Vendor.objects.filter(vendor_name='Mills').exists())
+
+    def test_rows_are_written_in_bulk(self):
+        rows = ((n, {'product_name': f'Item {n}', 'category_name': 'Grocery', 'purchase_price': '1',
+                     'sell_price': '2'}) for n in range(2, 502))
+        with CaptureQueriesContext(connection) as ctx:
+            report = importers.import_rows('products', rows, chunk_size=250)
+        self.assertEqual(report['imported'], 500)
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "core_product"')]
+        # A few statements per chunk (SQLite caps the parameters per statement), not one per row
+        self.assertLess(len(inserts), 10)
+
+
+# ==========================================
+# Benchmarks
+# ==========================================
+
+class BenchmarkTests(TestCase):
+    def test_benchmark_user_is_removed_afterwards(self):
+        results = benchmarks.run(iterations=2, warmup=0, routes=[
+            ('Dashboard', '/api/dashboard/'), ('Metrics', '/api/metrics/'),
+        ])
+        self.assertEqual([result['status'] for result in results.values()], [200, 200])
+        self.assertFalse(User.objects.filter(mobile_number__startswith=benchmarks.BENCHMARK_USER_PREFIX).exists())
+        self.assertFalse(Token.objects.exists())
+
+    def test_event_stream_ends_after_one_poll(self):
+        with self.settings(STOCK_ALERT_STREAM_SECONDS=60):
+            started = time.monotonic()
+            results = benchmarks.run(iterations=1, warmup=0, routes=[('Stream', '/api/stock-alerts/stream/')])
+        self.assertEqual(results['/api/stock-alerts/stream/']['status'], 200)
+        self.assertLess(time.monotonic() - started, 10)
+
+    def test_required_parameters_are_filled(self):
+        make_product()
+        Customer.objects.create(customer_name='Asha Stores', mobile_number='9000000093', city='Pune')
+        self.assertEqual(benchmarks.resolve_placeholders('/api/parties/lookup/'), '/api/parties/lookup/?mobile_number=9000000093')
+        results = benchmarks.run(iterations=1, warmup=0, routes=[
+            ('Product Search', '/api/products/search/'), ('Party Lookup', '/api/parties/lookup/'),
+            ('Party Autocomplete', '/api/parties/autocomplete/'),
+        ])
+        self.assertEqual([result['status'] for result in results.values()], [200, 200, 200])
+
+    def test_seed_dates_do_not_depend_on_today(self):
+        call_command(
+            'seed_benchmark', '--scale', '0', '--invoices', '5', '--income', '5', '--expenses', '5',
+            '--days', '10', stdout=io.StringIO(),
+        )
+        dates = set(Invoice.objects.values_list('date', flat=True))
+        self.assertEqual((min(dates), max(dates)), (date(2022, 1, 1), date(2022, 1, 9)))
+
+
+# ==========================================
+# Request metrics
+# ==========================================
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        self.staff = User.objects.create_user('9000000097', 'secret123', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def scrape(self):
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return response.content.decode()
+
+    def sample(self, text, name, path, method='GET', **labels):
+        """Value of one sample line for the route serving `path`."""
+        label_text = f'route="{resolve(path).view_name}",method="{method}"'
+        label_text += ''.join(f',{key}="{value}"' for key, value in labels.items())
+        prefix = f'{name}{{{label_text}}} '
+        values = [line[len(prefix):] for line in text.splitlines() if line.startswith(prefix)]
+        self.assertEqual(len(values), 1, prefix)
+        return float(values[0])
+
+    def test_staff_only(self):
+        self.assertEqual(APIClient().get('/api/metrics/').status_code, 401)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('9000000098', 'secret123'))
+        self.assertEqual(client.get('/api/metrics/').status_code, 403)
+
+    def test_counters_in_prometheus_format(self):
+        for _ in range(2):
+            self.client.get('/api/dashboard/', {'fresh': 1})
+        text = self.scrape()
+        self.assertIn('# TYPE ebilling_http_requests_total counter\n', text)
+        self.assertIn('# TYPE ebilling_http_request_duration_seconds histogram\n', text)
+        self.assertEqual(self.sample(text, 'ebilling_http_requests_total', '/api/dashboard/'), 2)
+        self.assertEqual(self.sample(text, 'ebilling_http_request_duration_seconds_bucket', '/api/dashboard/',
+                                     le='+Inf'), 2)
+        self.assertEqual(self.sample(text, 'ebilling_http_request_duration_seconds_count', '/api/dashboard/'), 2)
+        self.assertEqual(self.sample(text, 'ebilling_db_queries_total', '/api/dashboard/'),
+                         2 * len(dashboard.SNAPSHOT_QUERIES))
+
+    def test_streamed_queries_are_counted_once_the_body_is_sent(self):
+        Income.objects.create(name='Sale', amount=5, payment_type='Cash')
+        response = self.client.get('/api/income/export/')
+        self.assertNotIn('export', self.scrape())
+        b''.join(response.streaming_content)
+        self.assertEqual(self.sample(self.scrape(), 'ebilling_http_requests_total', '/api/income/export/'), 1)
+        self.assertGreater(self.sample(self.scrape(), 'ebilling_db_queries_total', '/api/income/export/'), 0)
+
+    def test_slow_requests_are_logged_with_their_queries(self):
+        with override_settings(METRICS_SLOW_REQUEST_MS=0), self.assertLogs('core.metrics', 'WARNING') as logs:
+            client = APIClient()
+            client.force_authenticate(self.staff)
+            client.get('/api/dashboard/', {'fresh': 1})
+        self.assertIn('Slow request GET /api/dashboard/', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+# ==========================================
+# Cached token authentication
+# ==========================================
+
+class CachingTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000006', 'secret123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        # Warm both the token cache and the dashboard snapshot
+        self.assertEqual(self.client.get('/api/dashboard/').status_code, 200)
+
+    def test_warm_request_skips_the_token_query(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_password_change_invalidates(self):
+        response = self.client.post('/api/change-password/', {
+            'current_password': 'secret123', 'new_password': 'secret456', 'confirm_password': 'secret456',
+        })
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(1):
+            self.client.get('/api/dashboard/')
+
+    def test_deactivated_user_is_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/dashboard/').status_code, 401)
+
+    def test_deleted_token_is_rejected(self):
+        self.token.delete()
+        self.assertEqual(self.client.get('/api/dashboard/').status_code, 401)
+
+    def test_invalidation_reaches_other_workers(self):
+        # Another worker's LRU, warmed before this one deactivates the user
+        other = authentication.LocalTokenCache(max_entries=10, ttl=300)
+        version = other.version()
+        other.set(self.token.key, self.user, self.token, version)
+        self.assertIsNotNone(other.get(self.token.key, other.version()))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(other.get(self.token.key, other.version()))
+
+
+# ==========================================
+# Product search
+# ==========================================
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000008', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        make_product(product_name='Basmati Rice 5kg', category_name='Grocery')
+        make_product(product_name='Rice Bran Oil', category_name='Oils')
+        make_product(product_name='Sunflower Oil', category_name='Oils')
+        make_product(product_name='Brown Sugar', category_name='Rice Products')
+
+    def names(self, **params):
+        response = self.client.get('/api/products/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return [p['product_name'] for p in response.data]
+
+    def test_prefix_match_ranks_names_above_categories(self):
+        names = self.names(q='ric')
+        self.assertEqual(set(names[:2]), {'Basmati Rice 5kg', 'Rice Bran Oil'})
+        self.assertEqual(names[2], 'Brown Sugar')
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.names(q='rice oi'), ['Rice Bran Oil'])
+
+    def test_limit_and_blank_query(self):
+        self.assertEqual(len(self.names(q='oil', limit=1)), 1)
+        self.assertEqual(self.names(q='  '), [])
+        self.assertEqual(self.names(q='"*('), [])
+
+    def test_index_follows_renames_and_deletes(self):
+        product = Product.objects.get(product_name='Sunflower Oil')
+        product.product_name = 'Mustard Oil'
+        product.save()
+        Product.objects.filter(product_name='Rice Bran Oil').delete()
+        self.assertEqual(self.names(q='sunflower'), [])
+        self.assertEqual(self.names(q='oil'), ['Mustard Oil'])
+
+    def test_fallback_matches_fts(self):
+        from . import search
+        if not search.fts_available():
+            self.skipTest('FTS5 is not available on this database')
+        for query in ('ric', 'oil', 'rice oi', 'grocery'):
+            self.assertEqual(
+                {p.id for p in search.search_products(query, use_fts=True)},
+                {p.id for p in search.search_products(query, use_fts=False)},
+            )
+
+
+# ==========================================
+# Party lookup & autocomplete
+# ==========================================
+
+class PartyLookupTests(TestCase):
+    def setUp(self):
+        from .autocomplete import party_index
+        self.index = party_index
+        self.index.reset()
+        self.addCleanup(self.index.reset)
+        self.user = User.objects.create_user('9000000009', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.asha = Customer.objects.create(
+            customer_name='Asha Patel', shop_name='Asha General Stores', mobile_number='9100000001', city='Pune',
+        )
+        Vendor.objects.create(
+            vendor_name='Ravi Kumar', company_name='General Traders', mobile_number='9100000001', city='Pune',
+        )
+
+    def autocomplete(self, q, **params):
+        response = self.client.get('/api/parties/autocomplete/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(p['type'], p['name']) for p in response.data]
+
+    def test_lookup_by_mobile_number(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/parties/lookup/', {'mobile_number': ' 9100000001 '})
+        self.assertEqual([c['customer_name'] for c in response.data['customers']], ['Asha Patel'])
+        self.assertEqual([v['vendor_name'] for v in response.data['vendors']], ['Ravi Kumar'])
+        self.assertEqual(self.client.get('/api/parties/lookup/').status_code, 400)
+
+    def test_autocomplete_matches_word_starts(self):
+        self.assertEqual(self.autocomplete('ASHA'), [('customer', 'Asha Patel')])
+        self.assertEqual(
+            sorted(self.autocomplete('gen')), [('customer', 'Asha Patel'), ('vendor', 'Ravi Kumar')],
+        )
+        self.assertEqual(self.autocomplete('tel'), [])
+        self.assertEqual(len(self.autocomplete('gen', limit=1)), 1)
+
+    def test_warm_autocomplete_skips_the_database(self):
+        self.autocomplete('asha')
+        with self.assertNumQueries(0):
+            self.index.search('ravi')
+
+    def test_index_follows_saves_and_deletes(self):
+        self.autocomplete('asha')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.asha.customer_name = 'Meera Shah'
+            self.asha.shop_name = ''
+            self.asha.save()
+            Customer.objects.create(customer_name='Ashok Rao', mobile_number='9100000002', city='Pune')
+        self.assertEqual(self.autocomplete('ash'), [('customer', 'Ashok Rao')])
+        self.assertEqual(self.autocomplete('meera'), [('customer', 'Meera Shah')])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.asha.delete()
+        self.assertEqual(self.autocomplete('meera'), [])
+
+    def test_bounded_index_tops_up_from_the_database(self):
+        from .autocomplete import PartyIndex
+        index = PartyIndex(max_parties=1, rebuild_seconds=300)
+        index.build()
+        self.assertFalse(index.complete)
+        self.assertEqual(len(index._parties), 1)
+        self.assertEqual({p['name'] for p in index.search('asha')}, {'Asha Patel'})
+        self.assertEqual({p['name'] for p in index.search('ravi')}, {'Ravi Kumar'})
+
+
+# ==========================================
+# Low-stock alerts
+# ==========================================
+
+class StockAlertTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000010', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = make_product(quantity=12, stock_alert=10)
+
+    def events(self, since=0):
+        response = self.client.get('/api/stock-alerts/events/', {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_sale_crossing_opens_and_purchase_clears(self):
+        self.client.post('/api/invoices/', sale_payload(self.product, quantity=1), format='json')
+        self.assertEqual(self.events()['events'], [])
+
+        self.client.post('/api/invoices/', sale_payload(self.product, quantity=2), format='json')
+        feed = self.events()
+        self.assertEqual([(e['event_type'], e['quantity']) for e in feed['events']], [('LOW', 9)])
+        self.assertTrue(StockAlert.objects.filter(product=self.product).exists())
+
+        self.client.post('/api/invoices/', sale_payload(self.product, quantity=5, invoice_type='PURCHASE'), format='json')
+        newer = self.events(since=feed['last_id'])
+        self.assertEqual([(e['event_type'], e['quantity']) for e in newer['events']], [('CLEARED', 14)])
+        self.assertEqual(self.events(since=newer['last_id']), {'events': [], 'last_id': newer['last_id']})
+
+    def test_product_update_and_delete(self):
+        response = self.client.patch(f'/api/products/{self.product.id}/', {'stock_alert': 20}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['id'] for p in self.client.get('/api/products/stock_alerts/').data], [self.product.id])
+        self.client.delete(f'/api/products/{self.product.id}/')
+        self.assertEqual([e['event_type'] for e in self.events()['events']], ['LOW', 'CLEARED'])
+        self.assertFalse(StockAlert.objects.exists())
+
+    def test_stock_alerts_and_dashboard_read_open_alerts(self):
+        Product.objects.filter(pk=self.product.pk).update(quantity=0)
+        self.assertEqual(self.client.get('/api/products/stock_alerts/').data, [])
+        self.assertEqual(inventory.reconcile_stock_alerts(), (1, 0))
+        self.assertEqual(len(self.client.get('/api/products/stock_alerts/').data), 1)
+        self.assertEqual(self.client.get('/api/dashboard/', {'fresh': 1}).data['low_stock_products'], 1)
+        self.assertEqual(inventory.reconcile_stock_alerts(), (0, 0))
+
+    def test_event_stream(self):
+        make_product(product_name='Salt', quantity=1, stock_alert=5)
+        with self.settings(STOCK_ALERT_STREAM_SECONDS=0):
+            response = self.client.get('/api/stock-alerts/stream/', HTTP_ACCEPT='text/event-stream')
+            body = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('event: low\n', body)
+        self.assertIn('"product_name": "Salt"', body)
+
+        last_id = StockAlertEvent.objects.latest('id').id
+        with self.settings(STOCK_ALERT_STREAM_SECONDS=0):
+            response = self.client.get('/api/stock-alerts/stream/', HTTP_LAST_EVENT_ID=str(last_id))
+            self.assertNotIn('event:', b''.join(response.streaming_content).decode())
+
+
+# ==========================================
+# Stock ledger
+# ==========================================
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000012', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/products/', {
+            'product_name': 'Rice 1kg', 'category_name': 'Grocery',
+            'purchase_price': 40, 'sell_price': 50, 'quantity': 100,
+        }, format='json')
+        self.product = Product.objects.get(pk=response.data['id'])
+
+    def movements(self):
+        return list(StockMovement.objects.filter(product=self.product).order_by('id').values_list('reason', 'quantity'))
+
+    def quantity(self):
+        self.product.refresh_from_db()
+        return self.product.quantity
+
+    def test_invoice_writes_record_movements(self):
+        invoice_id = self.client.post('/api/invoices/', sale_payload(self.product, quantity=3), format='json').data['id']
+        response = self.client.patch(f'/api/invoices/{invoice_id}/', {
+            'items': [{'product': self.product.id, 'quantity': 5, 'price': '50.00'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.quantity(), 95)
+        self.client.delete(f'/api/invoices/{invoice_id}/')
+        self.assertEqual(self.quantity(), 100)
+        self.assertEqual(self.movements(), [('OPENING', 100), ('SALE', -3), ('INVOICE_EDIT', -2), ('INVOICE_DELETE', 5)])
+        self.assertEqual(list(inventory.ledger_drift()), [])
+
+    def test_adjust_stock_and_product_edit(self):
+        response = self.client.post(f'/api/products/{self.product.id}/adjust_stock/', {'quantity': -4, 'note': 'Damaged'})
+        self.assertEqual(response.data['quantity'], 96)
+        self.assertEqual(self.client.post(f'/api/products/{self.product.id}/adjust_stock/', {'quantity': 'x'}).status_code, 400)
+        self.client.patch(f'/api/products/{self.product.id}/', {'quantity': 90}, format='json')
+        self.assertEqual(self.movements(), [('OPENING', 100), ('ADJUSTMENT', -4), ('ADJUSTMENT', -6)])
+
+    def test_stock_at_past_dates(self):
+        self.client.post('/api/invoices/', sale_payload(self.product, quantity=10), format='json')
+        opening, sale = StockMovement.objects.order_by('id')
+        StockMovement.objects.filter(pk=opening.pk).update(created_at=timezone.make_aware(datetime(2024, 1, 1, 9)))
+        StockMovement.objects.filter(pk=sale.pk).update(created_at=timezone.make_aware(datetime(2024, 1, 3, 9)))
+        self.assertEqual(inventory.take_snapshots(), 1)
+        self.assertEqual(inventory.take_snapshots(), 0)
+        self.client.post('/api/invoices/', sale_payload(self.product, quantity=5), format='json')
+
+        def stock_at(at):
+            response = self.client.get(f'/api/products/{self.product.id}/stock_at/', {'at': at})
+            self.assertEqual(response.status_code, 200)
+            return response.data['quantity'], response.data['movements_after_snapshot']
+
+        self.assertEqual(stock_at('2023-12-31'), (0, 0))
+        self.assertEqual(stock_at('2024-01-02'), (100, 1))
+        self.assertEqual(stock_at('2024-01-01T08:00:00'), (0, 0))
+        self.assertEqual(stock_at(timezone.now().date().isoformat()), (85, 1))
+
+    def test_reconcile_finds_and_fixes_drift(self):
+        Product.objects.filter(pk=self.product.pk).update(quantity=F('quantity') + 7)
+        self.assertEqual(list(inventory.ledger_drift(chunk_size=1)), [(self.product.pk, 107, 100)])
+        with self.assertRaises(CommandError):
+            call_command('reconcile_stock', stdout=io.StringIO())
+        call_command('reconcile_stock', '--fix', stdout=io.StringIO())
+        self.assertEqual(self.movements()[-1], ('RECONCILE', 7))
+        self.assertEqual(list(inventory.ledger_drift()), [])
+
+
+# ==========================================
+# Invoice PDFs
+# ==========================================
+
+class InvoicePdfTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000013', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        settings = self.settings(INVOICE_PDF_DIR=self.cache_dir.name, INVOICE_PDF_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        customer = Customer.objects.create(customer_name='Asha (Main)', mobile_number='9800000001')
+        payload = sale_payload(make_product(), quantity=2, customer=customer.id, paid_amount='0.00')
+        self.invoice_id = self.client.post('/api/invoices/', payload, format='json').data['id']
+
+    def cached_files(self):
+        return [name for _dirs, _subdirs, names in os.walk(self.cache_dir.name) for name in names]
+
+    def test_pdf_is_rendered_once_per_version(self):
+        response = self.client.get(f'/api/invoices/{self.invoice_id}/pdf/', HTTP_ACCEPT='application/pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        body = b''.join(response.streaming_content)
+        self.assertTrue(body.startswith(b'%PDF-1.4') and body.endswith(b'%%EOF\n'))
+
+        with mock.patch('core.pdf.write_invoice') as write:
+            self.assertEqual(self.client.get(f'/api/invoices/{self.invoice_id}/pdf/').status_code, 200)
+        write.assert_not_called()
+
+        # Paying changes the document; the new version replaces the old file
+        first = self.cached_files()
+        self.client.post(f'/api/invoices/{self.invoice_id}/pay/', {'amount': '10.00'}, format='json')
+        self.assertEqual(self.client.get(f'/api/invoices/{self.invoice_id}/pdf/').status_code, 200)
+        self.assertEqual(len(self.cached_files()), 1)
+        self.assertNotEqual(self.cached_files(), first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/invoices/{self.invoice_id}/')
+        self.assertEqual(self.cached_files(), [])
+
+    def test_render_pool_answers_202_until_ready(self):
+        with self.settings(INVOICE_PDF_WORKERS=1):
+            response = self.client.get(f'/api/invoices/{self.invoice_id}/whatsapp_share/')
+            self.assertTrue(response.data['pdf_url'].endswith(f'/api/invoices/{self.invoice_id}/pdf/'))
+            response = self.client.get(f'/api/invoices/{self.invoice_id}/pdf/')
+            if response.status_code == 202:
+                self.assertEqual(response['Location'], response.data['poll_url'])
+                invoice = invoice_pdf.document_invoices().get(pk=self.invoice_id)
+                pending = invoice_pdf.pending_render(invoice)
+                if pending:
+                    pending.result(timeout=30)
+                response = self.client.get(f'/api/invoices/{self.invoice_id}/pdf/')
+            self.assertEqual(response.status_code, 200)
+
+    def test_prerender_command(self):
+        out = io.StringIO()
+        call_command('prerender_invoice_pdfs', '--date-from', '2000-01-01', '--date-to', '2100-01-01', stdout=out)
+        self.assertIn('1 rendered, 0 already cached', out.getvalue())
+        call_command('prerender_invoice_pdfs', '--date-from', '2000-01-01', '--date-to', '2100-01-01', stdout=out)
+        self.assertIn('0 rendered, 1 already cached', out.getvalue())
+
+
+# ==========================================
+# Background jobs
+# ==========================================
+
+class JobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000014', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        files_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(files_dir.cleanup)
+        settings = self.settings(JOB_FILES_DIR=files_dir.name, JOB_RETRY_BASE_SECONDS=30)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # Workers recycle connections between jobs; that would close the test transaction
+        patcher = mock.patch('core.jobs.close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def enqueue(self, kind, payload=None):
+        response = self.client.post('/api/jobs/', {'kind': kind, 'payload': payload or {}}, format='json')
+        self.assertEqual(response.status_code, 202, response.data)
+        self.assertEqual(response['Location'], response.data['poll_url'])
+        return response.data['id']
+
+    def poll(self, job_id):
+        return self.client.get(f'/api/jobs/{job_id}/').data
+
+    def test_export_job_runs_and_serves_its_file(self):
+        make_product()
+        for amount in (10, 20):
+            self.client.post('/api/income/', {'name': 'Rent', 'amount': amount, 'payment_type': 'Cash'})
+        job_id = self.enqueue('export', {'dataset': 'income', 'fmt': 'ndjson'})
+        self.assertEqual(self.poll(job_id)['status'], 'QUEUED')
+
+        self.assertEqual(jobs.work(burst=True), 1)
+        job = self.poll(job_id)
+        self.assertEqual((job['status'], job['progress'], job['result']['rows']), ('SUCCEEDED', 100, 2))
+        response = self.client.get(f'/api/jobs/{job_id}/download/')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['amount'] for line in lines], ['10.00', '20.00'])
+
+    def test_invoice_export_counts_item_lines(self):
+        rice, salt = make_product(), make_product(product_name='Salt')
+        self.client.post('/api/invoices/', sale_payload(rice, total_amount='90.00', paid_amount='90.00', items=[
+            {'product': rice.id, 'quantity': 1, 'price': '50.00'},
+            {'product': salt.id, 'quantity': 2, 'price': '20.00'},
+        ]), format='json')
+        job_id = self.enqueue('export', {'dataset': 'invoices', 'fmt': 'csv'})
+        jobs.work(burst=True)
+        self.assertEqual(self.poll(job_id)['result']['rows'], 2)
+        response = self.client.get(f'/api/jobs/{job_id}/download/')
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 3)
+
+    def test_payload_is_validated(self):
+        response = self.client.post('/api/jobs/', {'kind': 'export', 'payload': {'dataset': 'nope'}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('payload', response.data)
+        self.assertEqual(self.client.post('/api/jobs/', {'kind': 'rm -rf'}, format='json').status_code, 400)
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        job_id = self.enqueue('reconcile_stock_alerts')
+        failing = mock.Mock(side_effect=RuntimeError('boom'))
+        with mock.patch.dict(jobs.HANDLERS, reconcile_stock_alerts=failing), self.assertLogs('core.jobs', 'WARNING'):
+            self.assertEqual(jobs.work(burst=True), 1)
+            job = Job.objects.get(pk=job_id)
+            self.assertEqual((job.status, job.attempts), ('QUEUED', 1))
+            self.assertIn('RuntimeError: boom', job.error)
+            self.assertGreater(job.run_after, timezone.now())
+            # Not due yet
+            self.assertEqual(jobs.work(burst=True), 0)
+
+            Job.objects.filter(pk=job_id).update(run_after=timezone.now(), attempts=2)
+            jobs.work(burst=True)
+        job = Job.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.attempts), ('FAILED', 3))
+        self.assertEqual(jobs.retry_delay(1), 30)
+        self.assertEqual(jobs.retry_delay(3), 120)
+
+    def test_claims_are_exclusive_and_expired_leases_are_reclaimed(self):
+        job_id = self.enqueue('rebuild_balances')
+        first = jobs.claim('worker-a')
+        self.assertEqual(first.pk, job_id)
+        self.assertIsNone(jobs.claim('worker-b'))
+
+        # worker-a died: once its lease runs out, worker-b takes over
+        Job.objects.filter(pk=job_id).update(locked_at=timezone.now() - timedelta(hours=1))
+        second = jobs.claim('worker-b')
+        self.assertEqual((second.pk, second.attempts), (job_id, 2))
+        jobs.run(first)  # the stale worker's outcome is ignored
+        self.assertEqual(Job.objects.get(pk=job_id).worker, 'worker-b')
+        self.assertTrue(jobs.run(second))
+        self.assertEqual(self.poll(job_id)['status'], 'SUCCEEDED')
+
+    def test_cancel(self):
+        job_id = self.enqueue('rebuild_rollups')
+        self.assertEqual(self.client.post(f'/api/jobs/{job_id}/cancel/').data['status'], 'CANCELLED')
+        self.assertEqual(self.client.post(f'/api/jobs/{job_id}/cancel/').status_code, 409)
+        self.assertEqual(jobs.work(burst=True), 0)
+
+
+# ==========================================
+# Period rollups & reports
+# ==========================================
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000011', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = make_product()
+
+    def totals(self, **params):
+        response = self.client.get('/api/reports/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['totals']
+
+    def test_writes_update_rollups(self):
+        response = self.client.post('/api/invoices/', sale_payload(self.product, paid_amount='20.00'), format='json')
+        invoice_id = response.data['id']
+        self.client.post(f'/api/invoices/{invoice_id}/pay/', {'amount': '10.00'}, format='json')
+        self.client.patch(f'/api/invoices/{invoice_id}/', {'total_amount': '80.00'}, format='json')
+        income = self.client.post('/api/income/', {'name': 'Rent', 'amount': '100.00', 'payment_type': 'Cash'}).data
+        self.client.post('/api/expenses/', {'name': 'Tea', 'amount': '15.00', 'payment_type': 'Cash'})
+        self.client.patch(f"/api/income/{income['id']}/", {'amount': '120.00'})
+
+        for period in ('day', 'month'):
+            totals = self.totals(period=period)
+            self.assertEqual(totals['sale_total'], Decimal('80.00'))
+            self.assertEqual(totals['sale_paid'], Decimal('30.00'))
+            self.assertEqual(totals['sale_count'], 1)
+            self.assertEqual(totals['income_total'], Decimal('120.00'))
+            self.assertEqual(totals['expense_total'], Decimal('15.00'))
+            self.assertEqual(totals['net'], Decimal('185.00'))
+
+        self.client.delete(f'/api/invoices/{invoice_id}/')
+        self.client.delete(f"/api/income/{income['id']}/")
+        totals = self.totals()
+        self.assertEqual((totals['sale_total'], totals['sale_count'], totals['income_total']), (0, 0, 0))
+
+    def test_report_reads_only_rollups(self):
+        self.client.post('/api/invoices/', sale_payload(self.product), format='json')
+        with self.assertNumQueries(1):
+            self.client.get('/api/reports/', {'period': 'month', 'date_from': '2020-01-15', 'date_to': '2030-01-01'})
+
+    def test_ranges_split_into_month_and_day_rows(self):
+        for day, amount in ((date(2024, 1, 10), 1), (date(2024, 1, 31), 2), (date(2024, 2, 15), 4), (date(2024, 3, 1), 8)):
+            income = Income.objects.create(name='x', amount=amount, payment_type='Cash')
+            Income.objects.filter(pk=income.pk).update(date=day)
+        list(rollups.rebuild(date(2024, 1, 1), date(2024, 3, 31)))
+
+        def income(date_from, date_to, period='month'):
+            report = self.client.get('/api/reports/', {'period': period, 'date_from': date_from, 'date_to': date_to}).data
+            return report['totals']['income_total'], [row['income_total'] for row in report['rows']]
+
+        self.assertEqual(income('2024-01-01', '2024-03-31'), (15, [3, 4, 8]))
+        self.assertEqual(income('2024-01-15', '2024-03-01'), (14, [2, 4, 8]))
+        self.assertEqual(income('2024-01-31', '2024-02-01'), (2, [2]))
+        self.assertEqual(income('2024-01-01', '2024-01-31', period='day'), (3, [1, 2]))
+        self.assertEqual(self.client.get('/api/reports/', {'date_from': '2024-02-01', 'date_to': '2024-01-01'}).status_code, 400)
+
+    def test_rebuild_matches_incremental_rows(self):
+        self.client.post('/api/invoices/', sale_payload(self.product), format='json')
+        self.client.post('/api/expenses/', {'name': 'Tea', 'amount': '15.00', 'payment_type': 'Cash'})
+        before = sorted(PeriodRollup.objects.values_list('period', 'period_start', 'kind', 'total', 'paid', 'count'))
+        list(rollups.rebuild(*rollups.data_range()))
+        after = sorted(PeriodRollup.objects.values_list('period', 'period_start', 'kind', 'total', 'paid', 'count'))
+        self.assertEqual(before, after)
+
+
+# ==========================================
+# Async views (ASGI)
+# ==========================================
+
+class AsyncViewTests(TransactionTestCase):
+    # Worker threads use their own connections, so the data must be committed
+    databases = {'default', 'reads'}
+
+    def setUp(self):
+        self.user = User.objects.create_user('9000000007', 'secret123')
+        self.token = Token.objects.create(user=self.user)
+        self.headers = {'Authorization': f'Token {self.token.key}'}
+        self.customer = Customer.objects.create(customer_name='Asha', mobile_number='9100000001')
+        Invoice.objects.create(invoice_type='SALE', customer=self.customer, total_amount=500, paid_amount=200)
+        Income.objects.create(name='Sale', amount=300, payment_type='Cash')
+        make_product(product_name='Salt', quantity=2, stock_alert=5)
+        make_product(product_name='Sugar', quantity=50, stock_alert=5)
+
+    async def test_dashboard_matches_sync_view(self):
+        response = await self.async_client.get('/api/async/dashboard/', {'fresh': '1'}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+        expected = (await sync_to_async(client.get)('/api/dashboard/?fresh=1')).json()
+        self.assertEqual(json.loads(response.content), expected)
+
+    async def test_customer_outstanding(self):
+        response = await self.async_client.get(
+            f'/api/async/customers/{self.customer.id}/outstanding/', headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'customer': 'Asha', 'outstanding_amount': 300.0})
+
+        response = await self.async_client.get('/api/async/customers/999999/outstanding/', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_stock_alerts(self):
+        response = await self.async_client.get('/api/async/products/stock_alerts/', headers=self.headers)
+        self.assertEqual([p['product_name'] for p in json.loads(response.content)], ['Salt'])
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get('/api/async/dashboard/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_served_by_the_project_asgi_application(self):
+        from config.asgi import application
+
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http', 'method': 'GET', 'path': '/api/async/dashboard/', 'query_string': b'',
+            'headers': [(b'host', b'testserver'), (b'authorization', self.headers['Authorization'].encode())],
+        })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output(5)
+        body = await communicator.receive_output(5)
+        self.assertEqual(start['status'], 200)
+        self.assertEqual(json.loads(body['body'])['total_customers'], 1)
+
+    async def test_sql_metrics_are_recorded(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        # A sync DRF viewset on the thread-sensitive executor, and an async
+        # view fanning out to worker threads
+        await self.async_client.get('/api/products/', headers=self.headers)
+        await self.async_client.get('/api/async/dashboard/', {'fresh': '1'}, headers=self.headers)
+        routes = metrics.registry.snapshot()
+        _, _, _, queries, query_time = routes[(resolve('/api/products/').view_name, 'GET')]
+        self.assertGreater(queries, 0)
+        self.assertGreater(query_time, 0)
+        _, _, _, queries, _ = routes[(resolve('/api/async/dashboard/').view_name, 'GET')]
+        self.assertGreaterEqual(queries, len(dashboard.SNAPSHOT_QUERIES))
+
+
+# ==========================================
+# Conditional GET
+# ==========================================
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000030', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = make_product()
+        self.customer = Customer.objects.create(customer_name='Asha', mobile_number='9000000031')
+
+    def get(self, url, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(url, headers=headers)
+
+    def test_unchanged_list_and_detail_answer_304_in_one_query(self):
+        for url in ('/api/products/', f'/api/products/{self.product.id}/', '/api/invoices/'):
+            response = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['ETag'].startswith('W/"'))
+            self.assertIn('Last-Modified', response)
+            with self.assertNumQueries(1):
+                response = self.get(url, response['ETag'])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+
+    def test_if_modified_since(self):
+        response = self.get('/api/customers/')
+        response = self.client.get('/api/customers/', headers={'If-Modified-Since': response['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_the_etag(self):
+        etag = self.get('/api/products/')['ETag']
+        self.client.patch(f'/api/products/{self.product.id}/', {'sell_price': '55.00'}, format='json')
+        response = self.get('/api/products/', etag)
+        self.assertEqual(response.status_code, 200)
+
+        # Bulk and queryset writes bypass save() but still bump the counter
+        etag = response['ETag']
+        Product.objects.filter(pk=self.product.pk).update(quantity=F('quantity') - 1)
+        self.assertEqual(self.get('/api/products/', etag).status_code, 200)
+
+    def test_invoice_etag_follows_the_tables_it_prints(self):
+        etag = self.get('/api/invoices/')['ETag']
+        Customer.objects.filter(pk=self.customer.pk).update(customer_name='Asha Traders')
+        self.assertEqual(self.get('/api/invoices/', etag).status_code, 200)
+        # Other tables don't affect it
+        etag = self.get('/api/invoices/')['ETag']
+        Employee.objects.create(employee_name='Ravi', mobile_number='9000000032', city='Pune')
+        self.assertEqual(self.get('/api/invoices/', etag).status_code, 304)
+
+    def test_query_string_is_part_of_the_etag(self):
+        etag = self.get('/api/products/')['ETag']
+        self.assertEqual(self.get('/api/products/?page_size=1', etag).status_code, 200)
+
+
+# ==========================================
+# Delta sync
+# ==========================================
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000040', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(customer_name='Asha', mobile_number='9000000041', city='Pune')
+        self.products = [make_product(product_name=f'Item {i}') for i in range(3)]
+
+    def sync(self, cursor=None, **params):
+        if cursor:
+            params['since'] = cursor
+        # Changes are served once their (millisecond) stamp has passed
+        time.sleep(0.002)
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def drain(self, cursor=None, limit=2):
+        changed, deleted = [], []
+        while True:
+            page = self.sync(cursor, limit=limit)
+            changed += [(name, row['id']) for name, rows in page['changed'].items() for row in rows]
+            deleted += [(name, pk) for name, ids in page['deleted'].items() for pk in ids]
+            cursor = page['cursor']
+            if not page['has_more']:
+                return changed, deleted, cursor
+
+    def test_full_sync_in_bounded_pages(self):
+        page = self.sync(limit=2)
+        self.assertEqual(sum(len(rows) for rows in page['changed'].values()), 2)
+        self.assertTrue(page['has_more'])
+
+        changed, deleted, cursor = self.drain()
+        self.assertCountEqual(changed, [('customer', self.customer.id)] + [('product', p.id) for p in self.products])
+        self.assertEqual(deleted, [])
+        self.assertEqual(self.drain(cursor), ([], [], cursor))
+
+    def test_changes_and_deletions_after_a_cursor(self):
+        *_, cursor = self.drain()
+        invoice = Invoice.objects.create(invoice_type='SALE', total_amount=50, customer=self.customer)
+        item = InvoiceItem.objects.create(invoice=invoice, product=self.products[0], quantity=1, price=50)
+        *_, cursor = self.drain(cursor)
+
+        # update(), an item edit and a delete, none of which go through save()
+        Product.objects.filter(pk=self.products[1].pk).update(quantity=F('quantity') - 5)
+        InvoiceItem.objects.filter(pk=item.pk).update(quantity=2)
+        Customer.objects.filter(pk=self.customer.pk).delete()
+        changed, deleted, _ = self.drain(cursor, limit=100)
+        # Deleting the customer also cleared invoice.customer
+        self.assertCountEqual(changed, [('product', self.products[1].id), ('invoice', invoice.id)])
+        self.assertEqual(deleted, [('customer', self.customer.id)])
+
+    def test_bulk_item_insert_touches_the_invoice_once(self):
+        invoice = Invoice.objects.create(invoice_type='SALE', total_amount=50, customer=self.customer)
+        stamped = Invoice.objects.get(pk=invoice.pk).updated_at
+        version = ModelVersion.objects.get(name='core_invoice').version
+        time.sleep(0.002)
+        InvoiceItem.objects.bulk_create(
+            InvoiceItem(invoice=invoice, product=self.products[n % 3], quantity=1, price=10) for n in range(20)
+        )
+        self.assertGreater(Invoice.objects.get(pk=invoice.pk).updated_at, stamped)
+        # The item trigger's UPDATE plus the invoice's own touch, not two per item
+        self.assertEqual(ModelVersion.objects.get(name='core_invoice').version - version, 2)
+
+    def test_invoices_carry_their_items(self):
+        invoice = Invoice.objects.create(invoice_type='SALE', total_amount=50, customer=self.customer)
+        InvoiceItem.objects.create(invoice=invoice, product=self.products[0], quantity=1, price=50)
+        rows = self.sync(limit=100)['changed']['invoice']
+        self.assertEqual([item['product_name'] for item in rows[0]['items']], ['Item 0'])
+
+    @override_settings(SYNC_SETTLE_SECONDS=60)
+    def test_recent_changes_wait_for_the_settle_window(self):
+        self.assertEqual(self.sync(), {
+            'changed': {name: [] for name, _, _ in sync.SYNCED_MODELS},
+            'deleted': {name: [] for name, _, _ in sync.SYNCED_MODELS},
+            'cursor': None, 'has_more': False,
+        })
+
+    def test_invalid_and_expired_cursors(self):
+        response = self.client.get('/api/sync/', {'since': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        old = sync.encode_cursor((timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS + 1), 0, 1))
+        response = self.client.get('/api/sync/', {'since': old})
+        self.assertEqual(response.status_code, 410)
+
+    def test_prune_tombstones(self):
+        Product.objects.filter(pk=self.products[0].pk).delete()
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS + 1))
+        Product.objects.filter(pk=self.products[1].pk).delete()
+        call_command('prune_tombstones', stdout=io.StringIO())
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [self.products[1].id])
+
+
+# ==========================================
+# Batch requests
+# ==========================================
+
+class BatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000050', 'secret123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.customer = Customer.objects.create(customer_name='Asha', mobile_number='9000000051', city='Pune')
+        self.product = make_product()
+
+    def batch(self, requests, **options):
+        response = self.client.post('/api/batch/', {'requests': requests, **options}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_reads_run_in_order_as_the_caller(self):
+        result = self.batch([
+            {'path': '/api/dashboard/'},
+            {'path': '/api/products/?page_size=1'},
+            {'path': f'/api/customers/{self.customer.id}/outstanding/'},
+            {'path': '/api/nothing-here/'},
+        ])
+        responses = result['responses']
+        self.assertEqual([r['status'] for r in responses], [200, 200, 200, 404])
+        self.assertEqual(responses[0]['body']['total_customers'], 1)
+        self.assertEqual(responses[1]['body']['results'][0]['id'], self.product.id)
+        self.assertEqual(responses[2]['body'], {'customer': 'Asha', 'outstanding_amount': 0.0})
+        self.assertNotIn('committed', result)
+
+    def test_conditional_get_inside_a_batch(self):
+        etag = self.batch([{'path': '/api/products/'}])['responses'][0]['headers']['ETag']
+        response = self.batch([{'path': '/api/products/', 'headers': {'If-None-Match': etag}}])['responses'][0]
+        self.assertEqual((response['status'], response['body']), (304, None))
+
+    def test_outer_conditional_headers_do_not_reach_sub_requests(self):
+        first = self.batch([{'path': '/api/products/'}])['responses'][0]
+        response = self.client.post(
+            '/api/batch/', {'requests': [{'path': '/api/products/'}]}, format='json',
+            HTTP_IF_NONE_MATCH=first['headers']['ETag'], HTTP_IF_MODIFIED_SINCE=first['headers']['Last-Modified'],
+        )
+        sub = response.data['responses'][0]
+        self.assertEqual(sub['status'], 200)
+        self.assertEqual(sub['body']['results'][0]['id'], self.product.id)
+
+    def test_outer_idempotency_key_does_not_reach_sub_requests(self):
+        response = self.client.post('/api/batch/', {'requests': [
+            {'method': 'POST', 'path': '/api/income/', 'body': {'name': 'Sale', 'amount': '10.00', 'payment_type': 'Cash'}},
+            {'method': 'POST', 'path': '/api/expenses/', 'body': {'name': 'Tea', 'amount': '5.00', 'payment_type': 'Cash'}},
+        ]}, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual([r['status'] for r in response.data['responses']], [201, 201])
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        # A key given per sub-request still applies to that one
+        retry = [{'method': 'POST', 'path': '/api/income/', 'headers': {'Idempotency-Key': 'k2'},
+                  'body': {'name': 'Sale', 'amount': '10.00', 'payment_type': 'Cash'}}]
+        self.batch(retry)
+        replayed = self.batch(retry)['responses'][0]
+        self.assertEqual(replayed['status'], 201)
+        self.assertEqual(Income.objects.count(), 2)
+
+    def test_writes_without_atomic_commit_one_by_one(self):
+        responses = self.batch([
+            {'method': 'POST', 'path': '/api/customers/', 'body': {'customer_name': 'Ravi', 'mobile_number': '9000000052', 'city': 'Pune'}},
+            {'method': 'POST', 'path': '/api/customers/', 'body': {'customer_name': 'No mobile'}},
+            {'method': 'PATCH', 'path': f'/api/products/{self.product.id}/', 'body': {'sell_price': '60.00'}},
+        ])['responses']
+        self.assertEqual([r['status'] for r in responses], [201, 400, 200])
+        self.assertTrue(Customer.objects.filter(customer_name='Ravi').exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.sell_price, Decimal('60.00'))
+
+    def test_atomic_batch_rolls_back_on_failure(self):
+        result = self.batch([
+            {'method': 'POST', 'path': '/api/customers/', 'body': {'customer_name': 'Ravi', 'mobile_number': '9000000052', 'city': 'Pune'}},
+            {'method': 'DELETE', 'path': '/api/customers/999999/'},
+            {'method': 'DELETE', 'path': f'/api/customers/{self.customer.id}/'},
+        ], atomic=True)
+        self.assertEqual([r['status'] for r in result['responses']], [201, 404, 424])
+        self.assertFalse(result['committed'])
+        self.assertEqual(list(Customer.objects.values_list('customer_name', flat=True)), ['Asha'])
+
+        result = self.batch([{'method': 'DELETE', 'path': f'/api/customers/{self.customer.id}/'}], atomic=True)
+        self.assertTrue(result['committed'])
+        self.assertFalse(Customer.objects.exists())
+
+    def test_limits(self):
+        too_many = [{'path': '/api/dashboard/'}] * (settings.BATCH_MAX_REQUESTS + 1)
+        self.assertEqual(self.client.post('/api/batch/', {'requests': too_many}, format='json').status_code, 400)
+        # The clock passes the limit after the first sub-request
+        with mock.patch('core.batch.time') as clock:
+            clock.monotonic.side_effect = [0, 0, settings.BATCH_MAX_SECONDS + 1]
+            responses = self.batch([{'path': '/api/products/'}, {'path': '/api/customers/'}])['responses']
+        self.assertEqual([r['status'] for r in responses], [200, 504])
+
+    def test_rejected_sub_requests(self):
+        responses = self.batch([
+            {'path': '/api/batch/'},
+            {'path': '/api/invoices/export/'},
+            {'path': '/api/async/dashboard/'},
+        ])['responses']
+        self.assertEqual([r['status'] for r in responses], [400, 400, 400])
+
+    def test_requires_authentication(self):
+        response = APIClient().post('/api/batch/', {'requests': [{'path': '/api/dashboard/'}]}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+
+# ==========================================
+# Bulk invoice creation
+# ==========================================
+
+class BulkInvoiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000060', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(customer_name='Asha', mobile_number='9000000061', city='Pune')
+        self.rice = make_product(quantity=100)
+        self.oil = make_product(product_name='Oil 1L', quantity=20)
+
+    def bulk(self, invoices):
+        response = self.client.post('/api/invoices/bulk_create/', {'invoices': invoices}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def sale(self, quantity=1, **kwargs):
+        return sale_payload(self.rice, quantity, customer=self.customer.id, paid_amount='20.00', **kwargs)
+
+    def test_each_invoice_gets_its_own_result(self):
+        report = self.bulk([
+            self.sale(2),
+            sale_payload(self.rice, items=[{'product': 999999, 'quantity': 1, 'price': '50.00'}]),
+            {'invoice_type': 'SALE', 'items': []},
+            self.sale(3, items=[
+                {'product': self.rice.id, 'quantity': 3, 'price': '50.00'},
+                {'product': self.oil.id, 'quantity': 1, 'price': '120.00'},
+            ]),
+            sale_payload(self.rice, customer=999999),
+        ])
+        self.assertEqual((report['created'], report['failed']), (2, 3))
+        results = report['results']
+        self.assertEqual([r['index'] for r in results], [0, 1, 2, 3, 4])
+        self.assertEqual(set(results[1]['errors']), {'items'})
+        self.assertEqual(set(results[2]['errors']), {'total_amount'})
+        self.assertEqual(set(results[4]['errors']), {'customer'})
+
+        invoices = Invoice.objects.filter(pk__in=[results[0]['id'], results[3]['id']])
+        self.assertEqual(invoices.count(), 2)
+        self.assertEqual(InvoiceItem.objects.filter(invoice__in=invoices).count(), 3)
+        self.rice.refresh_from_db()
+        self.oil.refresh_from_db()
+        self.assertEqual((self.rice.quantity, self.oil.quantity), (95, 19))
+        # One movement per invoice and product, attributed to its invoice
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(reason='SALE').values_list('invoice_id', 'product_id', 'quantity')),
+            sorted([(results[0]['id'], self.rice.id, -2), (results[3]['id'], self.rice.id, -3),
+                    (results[3]['id'], self.oil.id, -1)]),
+        )
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.outstanding_balance, Decimal('60.00'))
+        self.assertEqual(ledger.party_outstanding(customer=self.customer), Decimal('60.00'))
+        totals = rollups.report(timezone.localdate(), timezone.localdate(), 'DAY')['totals']
+        self.assertEqual((totals['sale_total'], totals['sale_paid'], totals['sale_count']),
+                         (Decimal('100.00'), Decimal('40.00'), 2))
+
+    def test_writes_do_not_grow_with_the_batch(self):
+        def writes(count):
+            with CaptureQueriesContext(connection) as ctx:
+                self.bulk([self.sale() for _ in range(count)])
+            return len([q for q in ctx.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE'))])
+
+        writes(1)  # Creates the day's rollup rows
+        self.assertEqual(writes(2), writes(40))
+        self.rice.refresh_from_db()
+        self.assertEqual(self.rice.quantity, 100 - 43)
+
+    def test_limits(self):
+        response = self.client.post('/api/invoices/bulk_create/', {'invoices': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+        too_many = [self.sale()] * (bulk_invoices.MAX_INVOICES + 1)
+        response = self.client.post('/api/invoices/bulk_create/', {'invoices': too_many}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+# ==========================================
+# Idempotency keys
+# ==========================================
+
+RENT = {'name': 'Rent', 'amount': '10.00', 'payment_type': 'Cash'}
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('9000000070', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = make_product(quantity=100)
+
+    def post(self, path, data, key='key-1'):
+        return self.client.post(path, data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post('/api/invoices/', sale_payload(self.product, quantity=3))
+        retry = self.post('/api/invoices/', sale_payload(self.product, quantity=3))
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.data), (201, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+        self.assertEqual(Invoice.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 97)
+
+    def test_keys_are_per_user_and_optional(self):
+        self.post('/api/income/', RENT)
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('9000000071', 'secret123'))
+        response = other.post('/api/income/', RENT, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        self.assertEqual(response.status_code, 201)
+        self.client.post('/api/income/', RENT, format='json')
+        self.assertEqual(Income.objects.count(), 3)
+
+    def test_key_reused_for_another_request_is_refused(self):
+        self.post('/api/income/', RENT)
+        response = self.post('/api/income/', {**RENT, 'amount': '99.00'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.post('/api/expenses/', RENT).status_code, 422)
+        self.assertEqual(self.post('/api/income/', {}, key='x' * 256).status_code, 400)
+        self.assertEqual(Income.objects.count(), 1)
+
+    def test_failed_requests_are_not_stored(self):
+        employee = Employee.objects.create(employee_name='Ravi', mobile_number='9000000072', city='Pune')
+        self.assertEqual(self.post('/api/income/', {'name': 'Rent'}).status_code, 400)
+        self.assertEqual(self.post('/api/income/', RENT).status_code, 201)
+
+        with mock.patch('core.views.ledger.adjust_cash_balance', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.post('/api/expenses/pay_salary/', {'employee_id': employee.id, 'amount': '500'}, key='key-2')
+        self.assertFalse(Expense.objects.exists())
+        response = self.post('/api/expenses/pay_salary/', {'employee_id': employee.id, 'amount': '500'}, key='key-2')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Expense.objects.count(), 1)
+
+    def test_duplicate_of_a_running_request_waits_then_conflicts(self):
+        self.post('/api/income/', RENT)
+        # As if the first request were still running
+        IdempotencyKey.objects.update(response_status=None)
+        with override_settings(IDEMPOTENCY_WAIT_SECONDS=0):
+            response = self.post('/api/income/', RENT)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+
+        # Until its claim is old enough to be taken over
+        IdempotencyKey.objects.update(locked_at=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS))
+        self.assertEqual(self.post('/api/income/', RENT).status_code, 201)
+        self.assertEqual(Income.objects.count(), 2)
+
+    def test_expired_keys_run_again_and_are_swept(self):
+        self.post('/api/income/', RENT)
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        response = self.post('/api/income/', RENT)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Income.objects.count(), 2)
+
+        self.post('/api/income/', RENT, key='key-2')
+        IdempotencyKey.objects.filter(pk=idempotency._digest(self.user.pk, 'key-2')).update(expires_at=timezone.now())
+        self.assertEqual(idempotency.sweep(), 1)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+
+class ConcurrentIdempotencyTests(TransactionTestCase):
+    threads = 6
+
+    def fire(self, path, data):
+        """Send the same request with the same key from parallel clients; returns the responses."""
+        user = User.objects.create_user('9000000073', 'secret123')
+        barrier = threading.Barrier(self.threads)
+        responses, errors = [], []
+
+        def send():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                responses.append(client.post(path, data, format='json', HTTP_IDEMPOTENCY_KEY='retry-1'))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=send) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+        return responses
+
+    def assert_ran_once(self, responses):
+        self.assertEqual([r.status_code for r in responses], [201] * self.threads)
+        self.assertEqual(len({r.data['id'] for r in responses}), 1)
+        self.assertEqual(sum(not r.has_header('Idempotent-Replayed') for r in responses), 1)
+
+    def test_parallel_duplicate_sales_create_one_invoice(self):
+        product = make_product(quantity=100)
+        self.assert_ran_once(self.fire('/api/invoices/', sale_payload(product, quantity=5)))
+        self.assertEqual(Invoice.objects.count(), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 95)
+
+    def test_parallel_duplicate_salary_payments_pay_once(self):
+        employee = Employee.objects.create(employee_name='Ravi', mobile_number='9000000074', city='Pune')
+        self.assert_ran_once(self.fire('/api/expenses/pay_salary/', {'employee_id': employee.id, 'amount': '500'}))
+        self.assertEqual(Expense.objects.count(), 1)
+        self.assertEqual(ledger.get_cash_balance().total_expense, Decimal('500'))
@@ -2,20 +2,34 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import *
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'vendors', VendorViewSet,basename="vendors")
 router.register(r'customers', CustomerViewSet)
 router.register(r'employees', EmployeeViewSet)
+router.register(r'parties', PartyViewSet, basename='parties')
 router.register(r'products', ProductViewSet)
+router.register(r'stock-alerts', StockAlertViewSet, basename='stock-alerts')
 router.register(r'income', IncomeViewSet)
 router.register(r'expenses', ExpenseViewSet)
 router.register(r'invoices', InvoiceViewSet)
 router.register(r'bank-accounts', BankAccountViewSet)
 router.register(r'auth', AuthViewSet, basename='auth')
+router.register(r'jobs', JobViewSet, basename='job')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('dashboard/', DashboardView.as_view()),
+    path('reports/', ReportView.as_view()),
+    path('sync/', SyncView.as_view()),
+    path('batch/', BatchView.as_view()),
     path('change-password/', ChangePasswordView.as_view()),
+    path('metrics/', MetricsView.as_view()),
+
+    # Async variants for the ASGI deployment (config/asgi.py)
+    path('async/dashboard/', async_views.dashboard_view),
+    path('async/customers/<int:pk>/outstanding/', async_views.customer_outstanding_view),
+    path('async/vendors/<int:pk>/outstanding/', async_views.vendor_outstanding_view),
+    path('async/products/stock_alerts/', async_views.stock_alerts_view),
 ]
\ No newline at end of file
@@ -0,0 +1,43 @@
+# core/versions.py
+"""
+Table version counters for conditional GETs. SQLite triggers bump a
+ModelVersion row on every write (migration 0011_model_versions); a
+migration that rebuilds a tracked table must re-run that trigger SQL.
+"""
+import hashlib
+
+from django.db import connection
+
+from .models import ModelVersion
+
+TRIGGER_SUFFIXES = ('_version_insert', '_version_update', '_version_delete')
+
+_trigger_databases = {}
+
+
+def versions_available(tables):
+    """True when the version triggers of `tables` exist on the default database (checked once per database)."""
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _trigger_databases:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%_version_%'")
+            _trigger_databases[name] = {row[0] for row in cursor.fetchall()}
+    triggers = _trigger_databases[name]
+    return all(table + suffix in triggers for table in tables for suffix in TRIGGER_SUFFIXES)
+
+def validators(tables, *vary):
+    """
+    (etag, last_modified) of a response built from `tables`, or None when
+    they aren't versioned. `vary` is anything else the body depends on
+    (path and query string, media type).
+    """
+    if not versions_available(tables):
+        return None
+    rows = sorted(ModelVersion.objects.filter(name__in=tables).values_list('name', 'version', 'updated_at'))
+    if len(rows) != len(tables):
+        return None
+    payload = repr([(name, version) for name, version, _ in rows] + list(vary))
+    etag = 'W/"%s"' % hashlib.sha1(payload.encode()).hexdigest()[:20]
+    return etag, max(updated_at for _, _, updated_at in rows)
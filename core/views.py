@@ -1,16 +1,31 @@
 # core/views.py
 
-from rest_framework import viewsets, views, status
+from rest_framework import viewsets, views, status, mixins
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.authtoken.models import Token
-from rest_framework.permissions import IsAuthenticated, AllowAny
-
-from django.db.models import Sum, Count, F
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.reverse import reverse
+
+import os
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.db.models import Sum, Count, F, Prefetch
 from django.contrib.auth import authenticate
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.dateparse import parse_date, parse_datetime
 
 from .models import *
 from .serializers import *
+from . import ledger, dashboard, exports, importers, metrics, search, autocomplete, stock_feed, rollups, inventory, invoice_pdf, jobs, db_router, versions, sync, batch, bulk_invoices, idempotency
+from .pagination import PartyBalancePagination
 
 # ==========================================
 # 1. Authentication & User Management
@@ -79,61 +94,192 @@ class ChangePasswordView(views.APIView):
 
 
 # ==========================================
-# 2. Dashboard
+# 2. Dashboard & Reports
 # ==========================================
 
 class DashboardView(views.APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Aggregating data for the dashboard cards
-        total_income = Income.objects.aggregate(Sum('amount'))['amount__sum'] or 0
-        total_expense = Expense.objects.aggregate(Sum('amount'))['amount__sum'] or 0
-        
-        data = {
-            'total_vendors': Vendor.objects.count(),
-            'total_customers': Customer.objects.count(),
-            'total_employees': Employee.objects.count(),
-            'total_income': total_income,
-            'total_expense': total_expense,
-            'net_balance': total_income - total_expense,
-            'total_invoices': Invoice.objects.count(),
-            # Products where current quantity is less than or equal to the alert level
-            'low_stock_products': Product.objects.filter(quantity__lte=F('stock_alert')).count()
-        }
-        return Response(data)
+        # Counters are served from the cached snapshot; ?fresh=1 forces a recompute
+        fresh = request.query_params.get('fresh') in ('1', 'true')
+        with db_router.reporting():
+            return Response(dashboard.get_snapshot(fresh=fresh))
+
+def parse_date_param(params, name, default):
+    if not params.get(name):
+        return default
+    try:
+        value = parse_date(params[name])
+    except ValueError:
+        value = None
+    if value is None:
+        raise ValidationError({name: 'Use the YYYY-MM-DD format.'})
+    return value
+
+class ReportView(views.APIView):
+    """
+    Sales, purchase, income and expense totals per day or month, read from
+    the period rollups only:
+    GET /api/reports/?period=day|month&date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+    (defaults: month, from 1 January / the 1st of the month of date_to, to today)
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        period = params.get('period', 'month').upper()
+        if period not in ('DAY', 'MONTH'):
+            raise ValidationError({'period': 'Choose day or month.'})
+        date_to = parse_date_param(params, 'date_to', timezone.localdate())
+        default_from = date_to.replace(day=1) if period == 'DAY' else date_to.replace(month=1, day=1)
+        date_from = parse_date_param(params, 'date_from', default_from)
+        if date_from > date_to:
+            raise ValidationError({'date_from': 'Must not be after date_to.'})
+        with db_router.reporting():
+            report = rollups.report(date_from, date_to, period)
+        return Response({'period': period.lower(), 'date_from': date_from, 'date_to': date_to, **report})
 
 
 # ==========================================
 # 3. Master Entities (Vendor, Customer, Employee)
 # ==========================================
 
-class VendorViewSet(viewsets.ModelViewSet):
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified on list and detail GETs from the version counters of
+    `version_tables` (default: the model's own table), see core.versions.
+    A client sending them back gets a 304 after one query on the counters.
+    """
+    version_tables = None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_get(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_get(super().retrieve, request, *args, **kwargs)
+
+    def conditional_get(self, handler, request, *args, **kwargs):
+        tables = self.version_tables or [self.queryset.model._meta.db_table]
+        # Read before the body is built: a write in between only makes the ETag stale, never wrong
+        current = versions.validators(tables, request.get_full_path(), request.accepted_media_type)
+        if current is None:
+            return handler(request, *args, **kwargs)
+        etag, last_modified = current
+        response = get_conditional_response(request._request, etag=etag, last_modified=int(last_modified.timestamp()))
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+        # Clients may keep the body but must revalidate before using it
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+def bulk_import_response(request, target):
+    """
+    Upsert master rows from an uploaded file (multipart field `file`) or the
+    raw request body. ?fmt=csv|jsonl (default: guessed from the file name,
+    else csv), ?chunk_size= rows per bulk write.
+    """
+    upload = request.FILES.get('file') if request.content_type.startswith('multipart/') else None
+    stream = upload if upload is not None else request.stream
+    if stream is None:
+        raise ValidationError({'file': 'Upload a CSV or JSON Lines file.'})
+
+    default_fmt = 'jsonl' if upload is not None and upload.name.endswith(('.jsonl', '.ndjson')) else 'csv'
+    fmt = request.query_params.get('fmt', default_fmt)
+    if fmt not in importers.IMPORT_FORMATS:
+        raise ValidationError({'fmt': f"Choose one of: {', '.join(importers.IMPORT_FORMATS)}."})
+    try:
+        chunk_size = int(request.query_params.get('chunk_size', importers.DEFAULT_CHUNK_SIZE))
+    except ValueError:
+        chunk_size = 0
+    if chunk_size < 1:
+        raise ValidationError({'chunk_size': 'Must be a positive integer.'})
+
+    report = importers.import_rows(target, importers.parse_rows(stream, fmt), chunk_size=chunk_size)
+    return Response(report)
+
+def paginated_values(viewset, rows):
+    """Return a values() queryset through the party balance paginator."""
+    paginator = PartyBalancePagination()
+    page = paginator.paginate_queryset(rows, viewset.request, view=viewset)
+    return paginator.get_paginated_response(page)
+
+class VendorViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Vendor.objects.all()
     serializer_class = VendorSerializer
+
+    # Feature: Bulk upsert from CSV / JSON Lines
+    @action(detail=False, methods=['post'])
+    def bulk_import(self, request):
+        return bulk_import_response(request, 'vendors')
     
     # Feature: Check outstanding amount for a specific vendor
     @action(detail=True, methods=['get'])
     def outstanding(self, request, pk=None):
         vendor = self.get_object()
-        invoices = Invoice.objects.filter(vendor=vendor)
-        # Summing up outstanding amounts from all invoices related to this vendor
-        total_due = sum([inv.outstanding_amount for inv in invoices])
+        # Summing up outstanding amounts from all invoices related to this vendor (in SQL)
+        total_due = ledger.party_outstanding(vendor=vendor)
         return Response({'vendor': vendor.vendor_name, 'outstanding_amount': total_due})
 
-class CustomerViewSet(viewsets.ModelViewSet):
+    # Feature: Denormalized outstanding balance of every vendor, one query per page
+    @action(detail=False, methods=['get'])
+    def balances(self, request):
+        rows = Vendor.objects.values('id', 'vendor_name', 'company_name', 'mobile_number', 'outstanding_balance')
+        return paginated_values(self, rows)
+
+class CustomerViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+
+    # Feature: Bulk upsert from CSV / JSON Lines
+    @action(detail=False, methods=['post'])
+    def bulk_import(self, request):
+        return bulk_import_response(request, 'customers')
     
     # Feature: Check outstanding amount for a specific customer
     @action(detail=True, methods=['get'])
     def outstanding(self, request, pk=None):
         customer = self.get_object()
-        invoices = Invoice.objects.filter(customer=customer)
-        total_due = sum([inv.outstanding_amount for inv in invoices])
+        total_due = ledger.party_outstanding(customer=customer)
         return Response({'customer': customer.customer_name, 'outstanding_amount': total_due})
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+    # Feature: Denormalized outstanding balance of every customer, one query per page
+    @action(detail=False, methods=['get'])
+    def balances(self, request):
+        rows = Customer.objects.values('id', 'customer_name', 'shop_name', 'mobile_number', 'outstanding_balance')
+        return paginated_values(self, rows)
+
+class PartyViewSet(viewsets.ViewSet):
+    """
+    Counter lookups across customers and vendors:
+    1. Exact mobile number (GET /api/parties/lookup/?mobile_number=)
+    2. Name / shop / company prefix (GET /api/parties/autocomplete/?q=&limit=)
+    """
+
+    @action(detail=False, methods=['get'])
+    def lookup(self, request):
+        mobile_number = request.query_params.get('mobile_number', '').strip()
+        if not mobile_number:
+            raise ValidationError({'mobile_number': 'This parameter is required.'})
+        return Response({
+            'customers': CustomerSerializer(Customer.objects.filter(mobile_number=mobile_number), many=True).data,
+            'vendors': VendorSerializer(Vendor.objects.filter(mobile_number=mobile_number), many=True).data,
+        })
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        try:
+            limit = int(request.query_params.get('limit', autocomplete.DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer.'})
+        limit = min(max(limit, 1), autocomplete.MAX_LIMIT)
+        return Response(autocomplete.party_index.search(request.query_params.get('q', ''), limit))
+
+class EmployeeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
 
@@ -142,77 +288,238 @@ class EmployeeViewSet(viewsets.ModelViewSet):
 # 4. Product Management
 # ==========================================
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
 
-    # Feature: Get list of products hitting low stock
+    # Direct quantity edits go into the stock ledger as opening stock / adjustments
+    @transaction.atomic
+    def perform_create(self, serializer):
+        product = serializer.save()
+        inventory.record_movements({product.pk: product.quantity}, 'OPENING')
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old_quantity = Product.objects.select_for_update().values_list('quantity', flat=True).get(
+            pk=serializer.instance.pk,
+        )
+        product = serializer.save()
+        inventory.record_movements({product.pk: product.quantity - old_quantity}, 'ADJUSTMENT', note='Product edited')
+
+    # Feature: Add or remove stock without an invoice (POST quantity=<signed int>, note=)
+    @action(detail=True, methods=['post'])
+    def adjust_stock(self, request, pk=None):
+        product = self.get_object()
+        try:
+            quantity = int(request.data.get('quantity'))
+        except (TypeError, ValueError):
+            raise ValidationError({'quantity': 'Must be a signed integer.'})
+        if not quantity:
+            raise ValidationError({'quantity': 'Must not be zero.'})
+        with transaction.atomic():
+            inventory.apply_stock_deltas({product.pk: quantity}, 'ADJUSTMENT', note=str(request.data.get('note', ''))[:200])
+        product.refresh_from_db()
+        return Response(self.get_serializer(product).data)
+
+    # Feature: Stock on a past date (?at=YYYY-MM-DD for end of day, or an ISO datetime)
+    @action(detail=True, methods=['get'])
+    def stock_at(self, request, pk=None):
+        product = self.get_object()
+        value = request.query_params.get('at', '')
+        at = parse_datetime(value) if 'T' in value else None
+        if at is None:
+            day = parse_date_param(request.query_params, 'at', timezone.localdate())
+            at = datetime.combine(day, datetime.max.time())
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        return Response({'product': product.pk, 'at': at, **inventory.stock_at(product.pk, at)})
+
+    # Feature: Bulk upsert from CSV / JSON Lines
+    @action(detail=False, methods=['post'])
+    def bulk_import(self, request):
+        return bulk_import_response(request, 'products')
+
+    # Feature: Typeahead search by product or category name (?q=&limit=)
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        try:
+            limit = int(request.query_params.get('limit', search.DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer.'})
+        limit = min(max(limit, 1), search.MAX_LIMIT)
+        products = search.search_products(request.query_params.get('q', ''), limit)
+        serializer = self.get_serializer(products, many=True)
+        return Response(serializer.data)
+
+    # Feature: Get list of products hitting low stock (open alerts, no table scan)
     @action(detail=False, methods=['get'])
     def stock_alerts(self, request):
-        low_stock = Product.objects.filter(quantity__lte=F('stock_alert'))
+        low_stock = Product.objects.filter(open_alert__isnull=False)
         serializer = self.get_serializer(low_stock, many=True)
         return Response(serializer.data)
 
+class StockAlertViewSet(viewsets.ViewSet):
+    """
+    Low-stock threshold crossings, for clients that used to poll stock_alerts:
+    1. Incremental feed (GET /api/stock-alerts/events/?since=<id>&limit=)
+    2. Server-Sent Events (GET /api/stock-alerts/stream/, resumes from Last-Event-ID or ?since=)
+    """
+
+    @staticmethod
+    def last_seen(request):
+        value = request.META.get('HTTP_LAST_EVENT_ID') or request.query_params.get('since', 0)
+        try:
+            return max(int(value), 0)
+        except ValueError:
+            raise ValidationError({'since': 'Must be an event id.'})
+
+    @action(detail=False, methods=['get'])
+    def events(self, request):
+        since = self.last_seen(request)
+        try:
+            limit = int(request.query_params.get('limit', stock_feed.DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer.'})
+        events = stock_feed.events_since(since, min(max(limit, 1), stock_feed.MAX_LIMIT))
+        return Response({'events': events, 'last_id': events[-1]['id'] if events else since})
+
+    @action(detail=False, methods=['get'], renderer_classes=[stock_feed.EventStreamRenderer, JSONRenderer])
+    def stream(self, request):
+        response = StreamingHttpResponse(
+            stock_feed.event_stream(self.last_seen(request)), content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
 
 # ==========================================
 # 5. Financial Management (Income & Expense)
 # ==========================================
 
-class IncomeViewSet(viewsets.ModelViewSet):
+def filter_date_range(queryset, params):
+    """Apply ?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD to a dated queryset."""
+    for param, lookup in (('date_from', 'date__gte'), ('date_to', 'date__lte')):
+        value = parse_date_param(params, param, None)
+        if value is not None:
+            queryset = queryset.filter(**{lookup: value})
+    return queryset
+
+def export_response(request, queryset, fields, filename):
+    """Stream `queryset` as ?fmt=csv (default) or ?fmt=ndjson."""
+    fmt = request.query_params.get('fmt', 'csv')
+    if fmt not in exports.EXPORT_FORMATS:
+        raise ValidationError({'fmt': f"Choose one of: {', '.join(exports.EXPORT_FORMATS)}."})
+    return exports.streaming_export(queryset, fields, fmt, filename)
+
+class IncomeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Income.objects.all()
     serializer_class = IncomeSerializer
 
+    # Feature: Idempotency-Key header, so a retried income isn't recorded twice
+    @idempotency.idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """
         Auto-calculate Previous Balance before saving new Income.
-        Previous Balance = Total Income - Total Expense (Before this transaction)
+        Previous Balance = Total Income - Total Expense (Before this transaction),
+        read from the locked cash ledger instead of summing both tables.
         """
-        total_income = Income.objects.aggregate(Sum('amount'))['amount__sum'] or 0
-        total_expense = Expense.objects.aggregate(Sum('amount'))['amount__sum'] or 0
-        current_balance = total_income - total_expense
-        
-        serializer.save(previous_balance=current_balance)
+        with transaction.atomic():
+            cash = ledger.lock_cash_balance()
+            income = serializer.save(previous_balance=cash.balance)
+            ledger.adjust_cash_balance(income=income.amount)
+            rollups.record_cash('INCOME', income)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            ledger.lock_cash_balance()
+            old_amount = Income.objects.values_list('amount', flat=True).get(pk=serializer.instance.pk)
+            income = serializer.save()
+            ledger.adjust_cash_balance(income=income.amount - old_amount)
+            rollups.adjust('INCOME', income.date, income.amount - old_amount)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            ledger.lock_cash_balance()
+            old_amount = Income.objects.values_list('amount', flat=True).get(pk=instance.pk)
+            instance.delete()
+            ledger.adjust_cash_balance(income=-old_amount)
+            rollups.adjust('INCOME', instance.date, -old_amount, count=-1)
+
+    # Feature: Full export streamed as CSV/NDJSON
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        queryset = filter_date_range(Income.objects.order_by('id'), request.query_params)
+        return export_response(request, queryset, exports.CASH_EXPORT_FIELDS, 'income')
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+class ExpenseViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
 
+    # Feature: Idempotency-Key header, so a retried expense isn't recorded twice
+    @idempotency.idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """
         Auto-calculate Previous Balance before saving new Expense.
         """
-        total_income = Income.objects.aggregate(Sum('amount'))['amount__sum'] or 0
-        total_expense = Expense.objects.aggregate(Sum('amount'))['amount__sum'] or 0
-        current_balance = total_income - total_expense
-        
-        serializer.save(previous_balance=current_balance)
+        with transaction.atomic():
+            cash = ledger.lock_cash_balance()
+            expense = serializer.save(previous_balance=cash.balance)
+            ledger.adjust_cash_balance(expense=expense.amount)
+            rollups.record_cash('EXPENSE', expense)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            ledger.lock_cash_balance()
+            old_amount = Expense.objects.values_list('amount', flat=True).get(pk=serializer.instance.pk)
+            expense = serializer.save()
+            ledger.adjust_cash_balance(expense=expense.amount - old_amount)
+            rollups.adjust('EXPENSE', expense.date, expense.amount - old_amount)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            ledger.lock_cash_balance()
+            old_amount = Expense.objects.values_list('amount', flat=True).get(pk=instance.pk)
+            instance.delete()
+            ledger.adjust_cash_balance(expense=-old_amount)
+            rollups.adjust('EXPENSE', instance.date, -old_amount, count=-1)
+
+    # Feature: Full export streamed as CSV/NDJSON
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        queryset = filter_date_range(Expense.objects.order_by('id'), request.query_params)
+        return export_response(request, queryset, exports.EXPENSE_EXPORT_FIELDS, 'expenses')
 
     # Feature: Pay Employee Salary (creates Expense + links Employee)
     @action(detail=False, methods=['post'])
+    @idempotency.idempotent
     def pay_salary(self, request):
-        data = request.data
-        employee_id = data.get('employee_id')
-        amount = data.get('amount')
-        
-        if not employee_id or not amount:
-            return Response({'error': 'employee_id and amount are required'}, status=400)
+        payment = SalaryPaymentSerializer(data=request.data)
+        payment.is_valid(raise_exception=True)
+        amount = payment.validated_data['amount']
 
         try:
-            employee = Employee.objects.get(id=employee_id)
+            employee = Employee.objects.get(id=payment.validated_data['employee_id'])
             
-            # --- Logic for Previous Balance Auto-calculation ---
-            total_income = Income.objects.aggregate(Sum('amount'))['amount__sum'] or 0
-            total_expense = Expense.objects.aggregate(Sum('amount'))['amount__sum'] or 0
-            current_balance = total_income - total_expense
-            # ---------------------------------------------------
-
-            expense = Expense.objects.create(
-                name=f"Salary for {employee.employee_name}",
-                amount=amount,
-                previous_balance=current_balance,
-                payment_type="Salary",
-                employee=employee
-            )
+            # --- Previous Balance comes from the locked cash ledger ---
+            with transaction.atomic():
+                cash = ledger.lock_cash_balance()
+                expense = Expense.objects.create(
+                    name=f"Salary for {employee.employee_name}",
+                    amount=amount,
+                    previous_balance=cash.balance,
+                    payment_type="Salary",
+                    employee=employee
+                )
+                ledger.adjust_cash_balance(expense=amount)
+                rollups.record_cash('EXPENSE', expense)
+            # ----------------------------------------------------------
             
             # Optional: If you track 'paid salary' on the employee model, update it here.
             # employee.salary_balance += float(amount)
@@ -227,9 +534,108 @@ class ExpenseViewSet(viewsets.ModelViewSet):
 # 6. Invoicing & Banking
 # ==========================================
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
+    # Invoices print party and product names
+    version_tables = ['core_invoice', 'core_invoiceitem', 'core_customer', 'core_vendor', 'core_product']
+
+    def is_summary(self):
+        return self.action == 'list' and self.request.query_params.get('view') == 'summary'
+
+    def get_queryset(self):
+        # Join the parties and prefetch items+products so a page of invoices
+        # costs a fixed number of queries instead of ~3 per invoice.
+        if self.action in ('pdf', 'whatsapp_share'):
+            return invoice_pdf.document_invoices()
+        queryset = Invoice.objects.select_related('customer', 'vendor')
+        if self.action == 'list':
+            queryset = self.filter_invoices(queryset)
+        if self.is_summary():
+            return queryset.annotate(item_count=Count('items'))
+        return queryset.prefetch_related(
+            Prefetch('items', queryset=InvoiceItem.objects.select_related('product'))
+        )
+
+    def filter_invoices(self, queryset):
+        """
+        Server-side filters, each backed by a composite (column, date) index:
+        ?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD&invoice_type=SALE&customer=<id>&vendor=<id>
+        ?outstanding=1 then keeps the unpaid ones among the rows those select.
+        """
+        params = self.request.query_params
+        queryset = filter_date_range(queryset, params)
+        if params.get('invoice_type'):
+            queryset = queryset.filter(invoice_type=params['invoice_type'].upper())
+        for param in ('customer', 'vendor'):
+            if params.get(param):
+                if not params[param].isdigit():
+                    raise ValidationError({param: 'Must be an id.'})
+                queryset = queryset.filter(**{f'{param}_id': params[param]})
+        if params.get('outstanding') in ('1', 'true'):
+            queryset = queryset.filter(paid_amount__lt=F('total_amount'))
+        return queryset
+
+    def get_serializer_class(self):
+        if self.is_summary():
+            return InvoiceSummarySerializer
+        return InvoiceSerializer
+
+    # Feature: Idempotency-Key header, so a retried sale or purchase isn't recorded twice
+    @idempotency.idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        # Re-read with the same query shaping so the response isn't N+1
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance = Invoice.objects.select_for_update().get(pk=instance.pk)
+            ledger.record_invoice(instance, sign=-1)
+            rollups.record_invoice(instance, sign=-1)
+            inventory.reverse_invoice_stock(instance)
+            invoice_id = instance.pk
+            instance.delete()
+            transaction.on_commit(lambda: invoice_pdf.discard(invoice_id))
+
+    # Feature: Create many invoices at once (POS coming back online); one result per invoice
+    @action(detail=False, methods=['post'])
+    @idempotency.idempotent
+    def bulk_create(self, request):
+        rows = request.data.get('invoices') if isinstance(request.data, dict) else None
+        if not isinstance(rows, list) or not rows:
+            raise ValidationError({'invoices': 'Send a non-empty list of invoices.'})
+        if len(rows) > bulk_invoices.MAX_INVOICES:
+            raise ValidationError({'invoices': f'At most {bulk_invoices.MAX_INVOICES} invoices per request.'})
+        return Response(bulk_invoices.create_invoices(rows))
+
+    # Feature: Full export streamed as CSV/NDJSON, one line per invoice item
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        queryset = self.filter_invoices(Invoice.objects.order_by('id', 'items__id'))
+        return export_response(request, queryset, exports.INVOICE_EXPORT_FIELDS, 'invoices')
+
+    # Feature: Record a payment against an invoice
+    @action(detail=True, methods=['post'])
+    @idempotency.idempotent
+    def pay(self, request, pk=None):
+        invoice = self.get_object()
+        payment = PaymentSerializer(data=request.data)
+        payment.is_valid(raise_exception=True)
+        amount = payment.validated_data['amount']
+
+        with transaction.atomic():
+            invoice = Invoice.objects.select_for_update().get(pk=invoice.pk)
+            if amount > invoice.outstanding_amount:
+                raise ValidationError({'amount': f'Must not exceed the outstanding {invoice.outstanding_amount}.'})
+            invoice.paid_amount += amount
+            invoice.save(update_fields=['paid_amount'])
+            ledger.adjust_party_balance(invoice.customer_id, invoice.vendor_id, -amount)
+            rollups.adjust(invoice.invoice_type, invoice.date, paid=amount)
+        return Response(self.get_serializer(self.get_queryset().get(pk=invoice.pk)).data)
 
     # Feature: Generate WhatsApp Share Link
     @action(detail=True, methods=['get'])
@@ -262,8 +668,132 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         # WhatsApp API URL format
         url = f"https://wa.me/{mobile}?text={encoded_details}"
         
-        return Response({'whatsapp_url': url})
+        # Start rendering the PDF now so it is ready by the time it is attached
+        pdf_url = reverse('invoice-pdf', args=[invoice.pk], request=request)
+        document = invoice_pdf.open_document(invoice)
+        if document:
+            document.close()
+
+        return Response({'whatsapp_url': url, 'pdf_url': pdf_url})
+
+    # Feature: Invoice PDF from the on-disk cache, or 202 + poll URL while it renders
+    @action(detail=True, methods=['get'], renderer_classes=[JSONRenderer, invoice_pdf.PDFRenderer])
+    def pdf(self, request, pk=None):
+        invoice = self.get_object()
+        document = invoice_pdf.open_document(invoice)
+        if document is None:
+            poll_url = request.build_absolute_uri()
+            return Response(
+                {'status': 'rendering', 'poll_url': poll_url},
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Location': poll_url, 'Retry-After': '1'},
+            )
+        return FileResponse(document, content_type='application/pdf', filename=f'invoice-{invoice.pk}.pdf')
 
-class BankAccountViewSet(viewsets.ModelViewSet):
+class BankAccountViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = BankAccount.objects.all()
-    serializer_class = BankAccountSerializer
\ No newline at end of file
+    serializer_class = BankAccountSerializer
+
+
+# ==========================================
+# 7. Mobile clients (offline sync, batching)
+# ==========================================
+
+class SyncView(views.APIView):
+    """
+    Everything that changed or was deleted after a cursor, oldest first:
+    GET /api/sync/?since=<cursor>&limit= (no cursor: every row). Call again
+    with the returned cursor while has_more is true.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        cursor = None
+        if params.get('since'):
+            cursor = sync.decode_cursor(params['since'])
+            if cursor is None:
+                raise ValidationError({'since': 'Not a sync cursor.'})
+            if sync.cursor_expired(cursor):
+                return Response({'error': 'Cursor expired; sync again without since.'}, status=status.HTTP_410_GONE)
+        try:
+            limit = int(params.get('limit', sync.DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer.'})
+        return Response(sync.changes_since(cursor, min(max(limit, 1), sync.MAX_LIMIT)))
+
+class BatchView(views.APIView):
+    """
+    Several API calls in one round trip (core.batch):
+    POST /api/batch/ {"requests": [{"method", "path", "body", "headers"}, ...], "atomic": false}
+    Answers {"responses": [{"status", "headers", "body"}, ...]} in request order,
+    plus "committed" for an atomic batch.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(batch.run(request, **serializer.validated_data))
+
+
+# ==========================================
+# 8. Operations
+# ==========================================
+
+class MetricsView(views.APIView):
+    """Per-route request/SQL metrics of this worker, in Prometheus text format (staff only)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+class JobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Background jobs (core.jobs). POST {kind, payload} queues one and answers
+    202 with a poll URL; run `manage.py run_workers` to process the queue.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+
+    def get_queryset(self):
+        queryset = Job.objects.all()
+        for param in ('status', 'kind'):
+            if self.request.query_params.get(param):
+                queryset = queryset.filter(**{param: self.request.query_params[param]})
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = jobs.enqueue(serializer.validated_data['kind'], serializer.validated_data['payload'], request.user)
+        poll_url = reverse('job-detail', args=[job.pk], request=request)
+        return Response(
+            {**self.get_serializer(job).data, 'poll_url': poll_url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': poll_url},
+        )
+
+    # Feature: Cancel a job that hasn't started
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        job = self.get_object()
+        if not jobs.cancel(job):
+            return Response({'error': f'Job is {job.status.lower()}; only queued jobs can be cancelled.'},
+                            status=status.HTTP_409_CONFLICT)
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data)
+
+    # Feature: Download the file written by a finished export job
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        filename = (job.result or {}).get('file') if job.status == 'SUCCEEDED' else None
+        if not filename:
+            return Response({'error': 'This job has no file to download.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            handle = open(os.path.join(settings.JOB_FILES_DIR, os.path.basename(filename)), 'rb')
+        except FileNotFoundError:
+            return Response({'error': 'The file has been removed.'}, status=status.HTTP_410_GONE)
+        fmt = filename.rsplit('.', 1)[-1]
+        return FileResponse(handle, as_attachment=True, filename=filename, content_type=exports.EXPORT_FORMATS[fmt])